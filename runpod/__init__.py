@@ -1,52 +1,110 @@
-""" Allows runpod to be imported as a module. """
+""" Allows runpod to be imported as a module.
 
+Submodules and the public API are loaded lazily on first attribute access (PEP 562),
+so that `import runpod` in a serverless worker does not pull in the API client, the
+CLI or the FastAPI stack unless they are used.
+"""
+
+import importlib
 import logging
 import os
+from typing import TYPE_CHECKING, Any
 
-from . import serverless
-from .api.ctl_commands import (
-    create_container_registry_auth,
-    create_endpoint,
-    create_pod,
-    create_template,
-    delete_container_registry_auth,
-    get_endpoints,
-    get_gpu,
-    get_gpus,
-    get_pod,
-    get_pods,
-    get_user,
-    resume_pod,
-    stop_pod,
-    terminate_pod,
-    update_container_registry_auth,
-    update_endpoint_template,
-    update_user_settings,
-)
-from .cli.groups.config.functions import (
-    check_credentials,
-    get_credentials,
-    set_credentials,
-)
-from .endpoint import AsyncioEndpoint, AsyncioJob, Endpoint
-from .serverless.modules.rp_logger import RunPodLogger
+from .cli.groups.config.functions import get_credentials
 from .version import __version__
 
+if TYPE_CHECKING:  # pragma: no cover
+    from . import serverless
+    from .api.ctl_commands import (
+        create_container_registry_auth,
+        create_endpoint,
+        create_pod,
+        create_template,
+        delete_container_registry_auth,
+        get_endpoints,
+        get_gpu,
+        get_gpus,
+        get_pod,
+        get_pods,
+        get_user,
+        resume_pod,
+        stop_pod,
+        terminate_pod,
+        update_container_registry_auth,
+        update_endpoint_template,
+        update_user_settings,
+    )
+    from .cli.groups.config.functions import check_credentials, set_credentials
+    from .endpoint import AsyncioEndpoint, AsyncioJob, Endpoint
+    from .serverless.modules.rp_logger import RunPodLogger
+
+# Public attribute -> module it is loaded from.
+_LAZY_ATTRIBUTES = {
+    # API
+    "create_container_registry_auth": ".api.ctl_commands",
+    "create_endpoint": ".api.ctl_commands",
+    "create_pod": ".api.ctl_commands",
+    "create_template": ".api.ctl_commands",
+    "delete_container_registry_auth": ".api.ctl_commands",
+    "get_endpoints": ".api.ctl_commands",
+    "get_gpu": ".api.ctl_commands",
+    "get_gpus": ".api.ctl_commands",
+    "get_pod": ".api.ctl_commands",
+    "get_pods": ".api.ctl_commands",
+    "get_user": ".api.ctl_commands",
+    "resume_pod": ".api.ctl_commands",
+    "stop_pod": ".api.ctl_commands",
+    "terminate_pod": ".api.ctl_commands",
+    "update_container_registry_auth": ".api.ctl_commands",
+    "update_endpoint_template": ".api.ctl_commands",
+    "update_user_settings": ".api.ctl_commands",
+    # Credentials
+    "check_credentials": ".cli.groups.config.functions",
+    "set_credentials": ".cli.groups.config.functions",
+    # Endpoints
+    "AsyncioEndpoint": ".endpoint",
+    "AsyncioJob": ".endpoint",
+    "Endpoint": ".endpoint",
+    # Serverless
+    "RunPodLogger": ".serverless.modules.rp_logger",
+}
+
+_LAZY_SUBMODULES = {"api", "cli", "endpoint", "error", "http_client", "serverless"}
+
 # ------------------------------- Config Paths ------------------------------- #
 SSH_KEY_PATH = os.path.expanduser("~/.runpod/ssh")
 
 
 profile = "default"  # pylint: disable=invalid-name
 
+endpoint_url_base = os.environ.get(
+    "RUNPOD_ENDPOINT_BASE_URL", "https://api.runpod.ai/v2"
+)  # pylint: disable=invalid-name
+
+
+# The credentials functions only need tomli, the rest of the CLI is not imported.
 _credentials = get_credentials(profile)
 if _credentials is not None:
     api_key = _credentials["api_key"]  # pylint: disable=invalid-name
 else:
     api_key = None  # pylint: disable=invalid-name
 
-endpoint_url_base = os.environ.get(
-    "RUNPOD_ENDPOINT_BASE_URL", "https://api.runpod.ai/v2"
-)  # pylint: disable=invalid-name
+
+def __getattr__(name: str) -> Any:
+    """Loads submodules and the public API on first access."""
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    elif name in _LAZY_SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | _LAZY_SUBMODULES)
 
 
 # --------------------------- Force Logging Levels --------------------------- #
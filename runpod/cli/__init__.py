@@ -1,12 +1,22 @@
 """ Allows the CLI to be imported as a module. """
 
+import importlib
 import threading
 
-from .groups import config, ssh
-
 STOP_EVENT = threading.Event()
 
 
+def __getattr__(name: str):
+    """
+    The command groups are loaded on first access, ssh imports paramiko and
+    runpod.cli.groups.config.functions is used by the worker's HTTP client.
+    """
+    if name in ("config", "ssh"):
+        return importlib.import_module(f".groups.{name}", __name__)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # --------------------------- runpod.toml Defaults --------------------------- #
 BASE_DOCKER_IMAGE = "runpod/base:0.4.3-cuda{cuda_version}"
 GPU_TYPES = [
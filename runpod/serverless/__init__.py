@@ -17,13 +17,27 @@ from runpod.serverless import core
 
 from ..version import __version__ as runpod_version
 from . import worker
-from .modules import rp_fastapi
+from .modules.rp_cancel import JobCancelled, cancel_job, get_cancellation_token
+from .modules.rp_init import run_init
 from .modules.rp_logger import RunPodLogger
 from .modules.rp_progress import progress_update
 
 log = RunPodLogger()
 
 
+def __getattr__(name: str):
+    """
+    rp_fastapi pulls in FastAPI, uvicorn and pydantic, it is only loaded when the
+    API server is started.
+    """
+    if name == "rp_fastapi":
+        from .modules import rp_fastapi  # pylint: disable=import-outside-toplevel
+
+        return rp_fastapi
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def handle_uncaught_exception(exc_type, exc_value, exc_traceback):
     log.error(f"Uncaught exception | {exc_type}; {exc_value}; {exc_traceback};")
 
@@ -51,6 +65,12 @@ parser.add_argument(
     default=None,
     help="Flag to enable the Debugger.",
 )
+parser.add_argument(
+    "--rp_debugger_tracemalloc",
+    type=int,
+    default=None,
+    help="Number of tracemalloc allocation diffs to include in the Debugger output.",
+)
 
 # Hosted API
 parser.add_argument(
@@ -66,7 +86,7 @@ parser.add_argument(
     "--rp_api_concurrency",
     type=int,
     default=1,
-    help="Number of concurrent FastAPI workers.",
+    help="Number of API server processes, forked from the worker.",
 )
 parser.add_argument(
     "--rp_api_host",
@@ -144,6 +164,8 @@ def start(config: Dict[str, Any]):
 
     config["handler"] (Callable): The handler function to run.
 
+    config["init"] (Callable | List[Callable]): Optional init stage, run before any job is taken.
+
     config["rp_args"] (Dict[str, Any]): Arguments for the worker, populated by runtime arguments.
     """
     print(f"--- Starting Serverless Worker |  Version {runpod_version} ---")
@@ -153,11 +175,16 @@ def start(config: Dict[str, Any]):
     config["reference_counter_start"] = time.perf_counter()
     config = _set_config_args(config)
 
+    # Gate readiness on the init stage, no job is taken before it completes.
+    run_init(config)
+
     realtime_port = _get_realtime_port()
     realtime_concurrency = _get_realtime_concurrency()
 
     if config["rp_args"]["rp_serve_api"]:
         log.info("Starting API server.")
+        from .modules import rp_fastapi  # pylint: disable=import-outside-toplevel
+
         api_server = rp_fastapi.WorkerAPI(config)
 
         api_server.start_uvicorn(
@@ -169,6 +196,8 @@ def start(config: Dict[str, Any]):
 
     if realtime_port:
         log.info(f"Starting API server for realtime on port {realtime_port}.")
+        from .modules import rp_fastapi  # pylint: disable=import-outside-toplevel
+
         api_server = rp_fastapi.WorkerAPI(config)
 
         api_server.start_uvicorn(
@@ -2,16 +2,16 @@
 
 import asyncio
 import ctypes
-import inspect
 import json
 import os
 import pathlib
-import typing
+from concurrent.futures import ThreadPoolExecutor
 from ctypes import CDLL, byref, c_char_p, c_int
 from typing import Any, Callable, Dict, List, Optional
 
-from runpod.serverless.modules import rp_job
 from runpod.serverless.modules.rp_logger import RunPodLogger
+from runpod.serverless.modules.rp_scale import JobScaler
+from runpod.serverless.modules.rp_transport import RELEASED_JOB_ERROR, Transport
 from runpod.version import __version__ as runpod_version
 
 log = RunPodLogger()
@@ -22,6 +22,13 @@ OK = 1
 ERROR_FROM_SERVER = 2
 ERROR_BUFFER_TOO_SMALL = 3
 
+# Size of the buffer _runpod_sls_get_jobs writes jobs to, grown when it is too small.
+JOBS_BUFFER_SIZE = 1024 * 1024 * 20  # 20 MB
+MAX_JOBS_BUFFER_SIZE = 1024 * 1024 * 1024  # 1 GB
+
+# Seconds between polls while sls_core has no jobs.
+SLS_POLL_INTERVAL = 0.05
+
 class CGetJobResult(ctypes.Structure):  # pylint: disable=too-few-public-methods
     """
      result of _runpod_sls_get_jobs.
@@ -56,6 +63,9 @@ class Hook:  # pylint: disable=too-many-instance-attributes
     _post_output: Callable = notregistered
     _finish_stream: Callable = notregistered
 
+    # Reused by every get_jobs call.
+    _jobs_buffer: Optional[ctypes.Array] = None
+
     def __new__(cls):
         if Hook._instance is None:
             log.debug("SLS Core | Initializing Hook.")
@@ -139,36 +149,55 @@ class Hook:  # pylint: disable=too-many-instance-attributes
 
     def get_jobs(self, max_concurrency: int, max_jobs: int) -> List[Dict[str, Any]]:
         """Get a job or jobs from the queue. The jobs are returned as a list of Job objects."""
-        buf = ctypes.create_string_buffer(
-            1024 * 1024 * 20
-        )  # 20MB buffer to store jobs in
-        destination_length = len(buf.raw)
-        res: CGetJobResult = self._get_jobs(
-            c_int(max_concurrency),
-            c_int(max_jobs),
-            byref(buf),
-            c_int(destination_length),
-        )
+        if self._jobs_buffer is None:
+            self._jobs_buffer = ctypes.create_string_buffer(JOBS_BUFFER_SIZE)
+
+        while True:
+            buf = self._jobs_buffer
+            res: CGetJobResult = self._get_jobs(
+                c_int(max_concurrency),
+                c_int(max_jobs),
+                byref(buf),
+                c_int(len(buf)),
+            )
+            if res.status_code != ERROR_BUFFER_TOO_SMALL:
+                break
+            self._grow_jobs_buffer(res.res_len)
+
         n = res.res_len
         code = res.status_code
         if code == STILL_WAITING:
             return []  # still waiting for jobs
-        elif code == OK:  # success! the job was stored bytes 0..res_len of buf.raw
+        elif code == OK:  # success! the job was stored bytes 0..res_len of buf
             log.trace(f"decoding {n} bytes of JSON")
-            return list(json.loads(buf.raw[:n].decode("utf-8")))
+            # string_at is the only copy, json.loads decodes the UTF-8 bytes itself.
+            return list(json.loads(ctypes.string_at(buf, n)))
         elif code == ERROR_FROM_SERVER:
             try:
-                b = buf.raw[: res.res_len].decode("utf-8")
+                b = ctypes.string_at(buf, n).decode("utf-8")
             except Exception:
                 b = "<failed to decode buffer>"
             if b == "":
                 b = "<unknown error or buffer too small>"
             raise SlsCoreError(f"_runpod_sls_get_jobs: status code 2: error from server: {b}")
-        elif code == ERROR_BUFFER_TOO_SMALL:  # buffer too small
-            raise SlsCoreError("_runpod_sls_get_jobs: status code 3: buffer too small")
         else:
             raise ValueError(f"_runpod_sls_get_jobs: unknown status code {code}")
 
+    def _grow_jobs_buffer(self, required: int) -> None:
+        """
+        Replaces the jobs buffer with one twice as large, or of the `required` size if
+        sls_core reported a larger one. Raises SlsCoreError once the maximum size is reached.
+        """
+        size = len(self._jobs_buffer)
+        if size >= MAX_JOBS_BUFFER_SIZE:
+            raise SlsCoreError(
+                f"_runpod_sls_get_jobs: status code 3: buffer too small, the jobs need "
+                f"{required} bytes and the buffer is at its maximum of {size} bytes"
+            )
+
+        new_size = min(max(size * 2, required), MAX_JOBS_BUFFER_SIZE)
+        log.debug(f"SLS Core | Growing the jobs buffer to {new_size} bytes.")
+        self._jobs_buffer = ctypes.create_string_buffer(new_size)
 
     def progress_update(self, job_id: str, json_data: bytes) -> bool:
         """
@@ -185,6 +214,13 @@ class Hook:  # pylint: disable=too-many-instance-attributes
         )
 
     async def stream_output(self, job_id: str, job_output: bytes) -> bool:
+        """
+        send part of a streaming result to AI-API.
+        blocks the event loop, see AsyncHook.
+        """
+        return self.send_stream_output(job_id, job_output)
+
+    def send_stream_output(self, job_id: str, job_output: bytes) -> bool:
         """
         send part of a streaming result to AI-API.
         """
@@ -223,94 +259,189 @@ class Hook:  # pylint: disable=too-many-instance-attributes
         return bool(self._finish_stream(c_char_p(id_bytes), c_int(len(id_bytes))))
 
 
-# -------------------------------- Process Job ------------------------------- #
-async def _process_job(
-    config: Dict[str, Any], job: Dict[str, Any], hook
-) -> Dict[str, Any]:
-    """Process a single job."""
-    handler = config["handler"]
+class AsyncHook:
+    """
+    Async bridge to the Hook, its ctypes calls block until sls_core returns.
 
-    result = {}
-    try:
-        if inspect.isgeneratorfunction(handler) or inspect.isasyncgenfunction(handler):
-            log.debug("SLS Core | Running job as a generator.")
-            generator_output = rp_job.run_job_generator(handler, job)
-            aggregated_output: dict[str, typing.Any] = {"output": []}
+    get_jobs runs in one dedicated thread, the outputs in another, so that neither
+    the event loop nor the output of finished jobs waits for a job poll. Each
+    executor has a single thread, so the calls run in the order they were made and
+    the stream output of a job stays in order.
+    """
+
+    def __init__(self, hook: Optional[Hook] = None) -> None:
+        self.hook = hook if hook is not None else Hook()
+        self._jobs_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sls-jobs")
+        self._output_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sls-output"
+        )
 
-            async for part in generator_output:
-                log.trace(f"SLS Core | Streaming output: {part}", job["id"])
+    async def _call(self, executor: ThreadPoolExecutor, function: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
 
-                if "error" in part:
-                    aggregated_output = part
-                    break
-                if config.get("return_aggregate_stream", False):
-                    aggregated_output["output"].append(part["output"])
+    async def get_jobs(self, max_concurrency: int, max_jobs: int) -> List[Dict[str, Any]]:
+        return await self._call(self._jobs_executor, self.hook.get_jobs, max_concurrency, max_jobs)
 
-                await hook.stream_output(job["id"], part)
+    async def stream_output(self, job_id: str, job_output: Any) -> bool:
+        return await self._call(
+            self._output_executor, self.hook.send_stream_output, job_id, job_output
+        )
 
-            log.debug("SLS Core | Finished streaming output.", job["id"])
-            hook.finish_stream(job["id"])
-            result = aggregated_output
+    async def post_output(self, job_id: str, job_output: Any) -> bool:
+        return await self._call(self._output_executor, self.hook.post_output, job_id, job_output)
 
-        else:
-            log.debug("SLS Core | Running job as a standard function.")
-            result = await rp_job.run_job(handler, job)
-            result = result.get("output", result)
+    async def finish_stream(self, job_id: str) -> bool:
+        return await self._call(self._output_executor, self.hook.finish_stream, job_id)
 
-    except Exception as err:  # pylint: disable=broad-except
-        log.error(f"SLS Core | Error running job: {err}", job["id"])
-        result = {"error": str(err)}
+    async def progress_update(self, job_id: str, progress: Any) -> bool:
+        json_data = self.hook._json_serialize_job_data(progress)
+        return await self._call(
+            self._output_executor, self.hook.progress_update, job_id, json_data
+        )
 
-    finally:
+    def shutdown(self) -> None:
+        self._jobs_executor.shutdown(wait=False)
+        self._output_executor.shutdown(wait=False)
+
+
+# --------------------------------- Transport -------------------------------- #
+class SlsTransport(Transport):
+    """
+    Takes jobs from and sends results to sls_core, through an AsyncHook.
+
+    Args:
+        hook: The AsyncHook.
+        max_jobs: Most jobs taken at a time.
+        poll_interval: Seconds the next poll waits when sls_core has no jobs.
+    """
+
+    def __init__(
+        self, hook: AsyncHook, max_jobs: int = 1, poll_interval: float = SLS_POLL_INTERVAL
+    ) -> None:
+        self.hook = hook
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+
+        # Jobs from get_jobs whose output has not been posted yet.
+        self._in_progress = set()
+
+        # The get_jobs call in flight, and the jobs it returned that no acquire took.
+        self._poll: Optional[asyncio.Future] = None
+        self._jobs: List[Dict[str, Any]] = []
+
+    async def acquire(self, session, num_jobs, on_job=None) -> List[Dict[str, Any]]:
+        if not self._jobs:
+            if self._poll is None:
+                # The JobScaler asks for as many jobs as it has free slots.
+                max_concurrency = len(self._in_progress) + num_jobs
+                self._poll = asyncio.ensure_future(
+                    self.hook.get_jobs(max_concurrency, min(num_jobs, self.max_jobs))
+                )
+                self._poll.add_done_callback(self._poll_done)
+
+            # An acquire that times out or is cancelled leaves the call running in its
+            # thread, the jobs it returns are taken by the next acquire.
+            await asyncio.shield(self._poll)
+
+        jobs, self._jobs = self._jobs[:num_jobs], self._jobs[num_jobs:]
+        if not jobs:
+            await asyncio.sleep(self.poll_interval)
+        return jobs
+
+    def _poll_done(self, poll: asyncio.Future) -> None:
+        self._poll = None
+        if not poll.cancelled() and poll.exception() is None:
+            jobs = poll.result()
+            self._in_progress.update(job["id"] for job in jobs)
+            self._jobs.extend(jobs)
+
+    async def stream(self, session, job, output) -> None:
+        log.trace(f"SLS Core | Streaming output: {output}", job["id"])
+        await self.hook.stream_output(job["id"], output)
+
+    async def finish_stream(self, session, job) -> None:
+        log.debug("SLS Core | Finished streaming output.", job["id"])
+        await self.hook.finish_stream(job["id"])
+
+    async def post(self, session, job, result, is_stream=False) -> None:
+        # sls_core takes the output itself, the aggregated {"output": [...]} of a stream.
+        if not is_stream:
+            result = result.get("output", result)
         log.debug(f"SLS Core | Posting output: {result}", job["id"])
-        hook.post_output(job["id"], result)
-        return result
+        try:
+            await self.hook.post_output(job["id"], result)
+        finally:
+            self._in_progress.discard(job["id"])
+
+    async def progress(self, session, job, progress) -> None:
+        await self.hook.progress_update(job["id"], progress)
+
+    async def release(self, session, job) -> None:
+        # sls_core holds the job until it gets an output for it.
+        await self.post(session, job, {"error": RELEASED_JOB_ERROR})
+
+    def close(self) -> None:
+        # Jobs returned after the last acquire are released before sls_core is shut down.
+        for job in self._jobs:
+            log.info("Released job, the worker is shutting down.", job["id"])
+            self.hook.hook.post_output(job["id"], {"error": RELEASED_JOB_ERROR})
+            self._in_progress.discard(job["id"])
+        self._jobs = []
+        self.hook.shutdown()
 
 
 # ---------------------------------------------------------------------------- #
 #                                  Run Worker                                  #
 # ---------------------------------------------------------------------------- #
-async def run(config: Dict[str, Any]) -> None:
+def _job_scaler(config: Dict[str, Any], hook: AsyncHook) -> JobScaler:
+    """
+    A JobScaler that takes jobs from and returns results to sls_core.
+
+    The concurrency is `max_concurrency`, or set by a `concurrency_modifier` like in the
+    standard worker, and at most `max_jobs` jobs are taken at a time. When sls_core has
+    no jobs the next poll waits for `sls_poll_interval` seconds.
+    """
+    max_concurrency = config.get("max_concurrency", 1)
+    transport = SlsTransport(
+        hook,
+        max_jobs=config.get("max_jobs", 1),
+        poll_interval=config.get("sls_poll_interval", SLS_POLL_INTERVAL),
+    )
+
+    scaler_config = {
+        **config,
+        "concurrency_modifier": config.get("concurrency_modifier")
+        or (lambda current: max_concurrency),
+    }
+    return JobScaler(scaler_config, transport)
+
+
+async def run(config: Dict[str, Any], hook: Optional[Hook] = None) -> None:
     """Run the worker.
 
     Args:
         config: A dictionary containing the following keys:
             handler: A function that takes a job and returns a result.
+        hook: The Hook to use instead of sls_core.so, see rp_sls_local.
     """
-    max_concurrency = config.get("max_concurrency", 1)
-    max_jobs = config.get("max_jobs", 1)
-
-    serverless_hook = Hook()
-    while True:
-        try:
-            jobs = serverless_hook.get_jobs(max_concurrency, max_jobs)
-        except SlsCoreError as err:
-            log.error(f"SLS Core | Error getting jobs: {err}")
-            await asyncio.sleep(0.2) # sleep for a bit before trying again
-            continue
-
-        if len(jobs) == 0 or jobs is None:
-            await asyncio.sleep(0)
-            continue
-
-        for job in jobs:
-            asyncio.create_task(
-                _process_job(config, job, serverless_hook), name=job["id"]
-            )
-            await asyncio.sleep(0)
+    scaler = _job_scaler(config, AsyncHook(hook))
+    try:
+        await scaler.run()
+    finally:
+        scaler.transport.close()
 
-        await asyncio.sleep(0)
 
+def main(config: Dict[str, Any], hook: Optional[Hook] = None) -> None:
+    """Run the worker in an asyncio event loop, until it is signalled to shut down.
 
-def main(config: Dict[str, Any]) -> None:
-    """Run the worker in an asyncio event loop."""
+    `hook` replaces sls_core.so, see rp_sls_local.
+    """
     if config.get("handler") is None:
         log.error("SLS Core | config must contain a handler function")
         raise ValueError("config must contain a handler function")
 
+    scaler = _job_scaler(config, AsyncHook(hook))
     try:
-        work_loop = asyncio.new_event_loop()
-        asyncio.ensure_future(run(config), loop=work_loop)
-        work_loop.run_forever()
+        scaler.start()
     finally:
-        work_loop.close()
+        scaler.transport.close()
@@ -0,0 +1,196 @@
+"""
+runpod | serverless | rp_admission.py
+Admission control for the realtime endpoint.
+
+At most `max_in_flight` requests run the handler at a time, up to `max_queue` more wait
+for a slot in arrival order and the rest are turned away with a Retry-After, so that a
+burst of requests does not slow every one of them down.
+"""
+
+import asyncio
+import contextlib
+import math
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+def _setting(config: Dict[str, Any], key: str, env: str, default: str) -> Any:
+    value = config.get(key)
+    if value is None:
+        value = os.environ.get(env, default)
+    return value
+
+
+def get_admission_settings(config: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Returns the admission limits of the realtime endpoint.
+        - max_in_flight: config["realtime_max_in_flight"] or RUNPOD_REALTIME_MAX_IN_FLIGHT,
+          no limit by default.
+        - max_queue: config["realtime_max_queue"] or RUNPOD_REALTIME_MAX_QUEUE, 0 by default.
+        - queue_timeout: config["realtime_queue_timeout"] or RUNPOD_REALTIME_QUEUE_TIMEOUT,
+          10 seconds by default.
+    """
+    max_in_flight = _setting(
+        config, "realtime_max_in_flight", "RUNPOD_REALTIME_MAX_IN_FLIGHT", "0"
+    )
+    max_queue = _setting(config, "realtime_max_queue", "RUNPOD_REALTIME_MAX_QUEUE", "0")
+    queue_timeout = _setting(
+        config, "realtime_queue_timeout", "RUNPOD_REALTIME_QUEUE_TIMEOUT", "10"
+    )
+    return {
+        "max_in_flight": max(0, int(max_in_flight)),
+        "max_queue": max(0, int(max_queue)),
+        "queue_timeout": float(queue_timeout),
+    }
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted.
+    429 when the wait queue is full, 503 when the request waited `queue_timeout` seconds.
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the requests in flight, with a bounded FIFO wait queue in front.
+
+    Args:
+        max_in_flight (int): Most requests admitted at a time, 0 for no limit.
+        max_queue (int): Most requests waiting for a slot.
+        queue_timeout (float): Seconds a request waits for a slot before it is rejected.
+    """
+
+    def __init__(
+        self, max_in_flight: int = 0, max_queue: int = 0, queue_timeout: float = 10.0
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self._waiters = deque()  # Futures of the queued requests, resolved with a slot.
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+        self._duration_avg: Optional[float] = None  # Moving average of the request durations.
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _has_slot(self) -> bool:
+        return not self.max_in_flight or self.in_flight < self.max_in_flight
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a slot is likely free, from the average request duration.
+        """
+        if self._duration_avg is None or not self.max_in_flight:
+            return 1
+        rounds = (self.queued + 1) / self.max_in_flight
+        return min(60, max(1, math.ceil(self._duration_avg * rounds)))
+
+    async def acquire(self) -> float:
+        """
+        Takes a slot, waiting in the queue if there is none. Returns the seconds waited.
+        """
+        if self._has_slot() and not self._waiters:
+            self.in_flight += 1
+            self._record_admitted(0.0)
+            return 0.0
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(429, "Too many requests in queue.", self.retry_after())
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # Unless the slot was handed over as the wait timed out.
+            if not waiter.done() or waiter.cancelled():
+                self.timed_out += 1
+                raise AdmissionRejected(
+                    503, "Timed out waiting for a free slot.", self.retry_after()
+                ) from None
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            # The slot may have been handed over just before the request was cancelled.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            with contextlib.suppress(ValueError):
+                self._waiters.remove(waiter)
+
+        queue_time = time.perf_counter() - start
+        self._record_admitted(queue_time)
+        return queue_time
+
+    def release(self, duration: Optional[float] = None) -> None:
+        """
+        Gives a slot back, to the first request in the queue if there is one.
+        """
+        if duration is not None:
+            self._duration_avg = (
+                duration
+                if self._duration_avg is None
+                else 0.8 * self._duration_avg + 0.2 * duration
+            )
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # The slot passes on, in_flight is unchanged.
+                return
+        self.in_flight -= 1
+
+    @contextlib.asynccontextmanager
+    async def admit(self) -> AsyncIterator[float]:
+        """
+        Holds a slot for the duration of the block, yields the seconds waited for it.
+        """
+        queue_time = await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield queue_time
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def _record_admitted(self, queue_time: float) -> None:
+        self.admitted += 1
+        self._queue_time_total += queue_time
+        self._queue_time_max = max(self._queue_time_max, queue_time)
+
+    def metrics(self) -> Dict[str, Any]:
+        queue_time_avg = self._queue_time_total / self.admitted if self.admitted else 0.0
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "queue_time_avg_ms": round(queue_time_avg * 1000, 3),
+            "queue_time_max_ms": round(self._queue_time_max * 1000, 3),
+        }
@@ -0,0 +1,112 @@
+"""
+runpod | serverless | rp_backoff.py
+Backoff policy for retrying job acquisition after throttling and errors.
+"""
+
+import email.utils
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header, given in seconds or as an HTTP date.
+    Returns the number of seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+    if retry_at is None:
+        return None
+
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter.
+
+    The n-th consecutive failure waits between half and all of
+    `min(max_delay, base * factor ** (n - 1))` seconds. A Retry-After given by the server
+    is honoured up to `max_retry_after` seconds, with a little jitter on top so that
+    workers throttled at the same time do not all come back at once.
+
+    Args:
+        base (float): Delay in seconds after the first failure.
+        factor (float): Growth of the delay per consecutive failure.
+        max_delay (float): Ceiling of the exponential delay in seconds.
+        max_retry_after (float): Ceiling of a server provided Retry-After in seconds.
+    """
+
+    def __init__(
+        self,
+        base: float = 1.0,
+        factor: float = 2.0,
+        max_delay: float = 30.0,
+        max_retry_after: float = 60.0,
+    ):
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.attempts = 0
+
+    def reset(self) -> None:
+        """
+        Called after a successful request, the next failure starts from the base delay.
+        """
+        self.attempts = 0
+
+    def next_delay(self, retry_after: Optional[float] = None) -> float:
+        """
+        Records a failure and returns the number of seconds to wait before retrying.
+
+        Args:
+            retry_after (float): Seconds the server asked to wait, if any.
+        """
+        self.attempts += 1
+
+        if retry_after is not None:
+            retry_after = min(retry_after, self.max_retry_after)
+            return retry_after + random.uniform(0, min(1.0, retry_after * 0.1))
+
+        delay = min(self.max_delay, self.base * self.factor ** (self.attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+def get_backoff(config: Dict[str, Any]) -> Backoff:
+    """
+    Returns the job acquisition backoff policy.
+
+    Uses config["jobs_fetcher_backoff"] if set, otherwise a Backoff configured with
+    RUNPOD_BACKOFF_BASE, RUNPOD_BACKOFF_MAX and RUNPOD_BACKOFF_MAX_RETRY_AFTER (seconds).
+    """
+    if backoff := config.get("jobs_fetcher_backoff"):
+        return backoff
+
+    return Backoff(
+        base=float(os.environ.get("RUNPOD_BACKOFF_BASE", 1.0)),
+        max_delay=float(os.environ.get("RUNPOD_BACKOFF_MAX", 30.0)),
+        max_retry_after=float(os.environ.get("RUNPOD_BACKOFF_MAX_RETRY_AFTER", 60.0)),
+    )
+
+
+def get_jobs_fetcher_timeout(config: Dict[str, Any]) -> float:
+    """
+    Returns the timeout in seconds of a job-take long poll.
+    Set with config["jobs_fetcher_timeout"] or RUNPOD_JOBS_FETCHER_TIMEOUT, 90 by default.
+    """
+    timeout = config.get("jobs_fetcher_timeout") or os.environ.get("RUNPOD_JOBS_FETCHER_TIMEOUT")
+    return float(timeout) if timeout else 90
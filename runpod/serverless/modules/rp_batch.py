@@ -0,0 +1,119 @@
+"""
+runpod | serverless | rp_batch.py
+Micro-batching for the realtime endpoint.
+
+Requests that arrive within `max_wait` seconds of each other are run with one call of
+the batch handler, up to `max_batch_size` at a time, and each request gets back the
+result of its own job.
+"""
+
+import asyncio
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .rp_job import run_batch
+
+
+def get_batch_settings(config: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Returns the batching settings of the realtime endpoint.
+        - max_batch_size: config["realtime_max_batch_size"] or RUNPOD_REALTIME_MAX_BATCH_SIZE,
+          8 by default.
+        - max_wait: config["realtime_batch_wait_ms"] or RUNPOD_REALTIME_BATCH_WAIT_MS,
+          5 milliseconds by default, returned in seconds.
+    """
+    max_batch_size = config.get("realtime_max_batch_size")
+    if max_batch_size is None:
+        max_batch_size = os.environ.get("RUNPOD_REALTIME_MAX_BATCH_SIZE", "8")
+
+    wait_ms = config.get("realtime_batch_wait_ms")
+    if wait_ms is None:
+        wait_ms = os.environ.get("RUNPOD_REALTIME_BATCH_WAIT_MS", "5")
+
+    return {
+        "max_batch_size": max(1, int(max_batch_size)),
+        "max_wait": max(0.0, float(wait_ms)) / 1000,
+    }
+
+
+class MicroBatcher:
+    """
+    Collects jobs into batches for a batch handler.
+
+    A batch is run once it holds `max_batch_size` jobs, or `max_wait` seconds after its
+    first job arrived. Batches run concurrently with the next one being collected.
+
+    Args:
+        batch_handler (Callable): Called with a list of jobs, returns one output per job.
+        max_batch_size (int): Most jobs in a batch.
+        max_wait (float): Seconds the first job of a batch waits for more.
+    """
+
+    def __init__(
+        self, batch_handler: Callable, max_batch_size: int = 8, max_wait: float = 0.005
+    ) -> None:
+        self.batch_handler = batch_handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches = set()  # Tasks of the batches running.
+
+        self.batches = 0
+        self.jobs = 0
+
+    async def submit(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Adds a job to the batch being collected and returns its result.
+        """
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+        self._pending.append((job, result))
+
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+
+        # A cancelled request is left out of its batch, or its result is dropped.
+        return await result
+
+    def flush(self) -> None:
+        """
+        Runs the batch collected so far.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, []
+        pending = [(job, result) for job, result in pending if not result.done()]
+        if not pending:
+            return
+
+        task = asyncio.ensure_future(self._run(pending))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run(self, pending: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        self.batches += 1
+        self.jobs += len(pending)
+
+        try:
+            run_results = await run_batch(self.batch_handler, [job for job, _ in pending])
+            for (_, result), run_result in zip(pending, run_results):
+                if not result.done():
+                    result.set_result(run_result)
+        finally:
+            # The batch itself was cancelled, so are the requests still waiting on it.
+            for _, result in pending:
+                if not result.done():
+                    result.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "batch_size_avg": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+        }
@@ -0,0 +1,149 @@
+"""
+runpod | serverless | rp_cancel.py
+Cooperative cancellation and execution deadlines for jobs.
+"""
+
+import asyncio
+import inspect
+import os
+import time
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+DEADLINE_EXCEEDED = "Execution timeout exceeded."
+
+
+class JobCancelled(Exception):
+    """
+    Raised when a job was cancelled or its execution deadline has passed.
+    """
+
+
+class CancellationToken:
+    """
+    Signals that a job should stop.
+
+    A token is cancelled by `cancel()` or once its deadline has passed. Synchronous
+    handlers block the event loop and can only stop cooperatively, by checking
+    `cancelled` or calling `raise_if_cancelled()` between steps. Async handlers are
+    also cancelled at their next `await`, with asyncio.CancelledError.
+
+    Args:
+        deadline (float): time.monotonic() after which the job is cancelled.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.reason: Optional[str] = None
+        self._task: Optional[asyncio.Future] = None
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is None and self.remaining() == 0:
+            self.cancel(DEADLINE_EXCEEDED)
+        return self.reason is not None
+
+    def cancel(self, reason: str = "Job was cancelled.") -> None:
+        if self.reason is None:
+            self.reason = reason
+        if self._task is not None:
+            self._task.cancel()
+
+    def remaining(self) -> Optional[float]:
+        """
+        Seconds until the deadline, None without a deadline.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise JobCancelled(self.reason)
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """
+        Runs `awaitable` until it is done or the token is cancelled.
+        Raises JobCancelled if the token was cancelled first, after cancelling the task.
+        """
+        if self.cancelled:
+            if inspect.iscoroutine(awaitable):
+                awaitable.close()  # Never started.
+            raise JobCancelled(self.reason)
+
+        loop = asyncio.get_running_loop()
+        self._task = asyncio.ensure_future(awaitable)
+
+        timer = None
+        if self.deadline is not None:
+            timer = loop.call_later(self.remaining(), self.cancel, DEADLINE_EXCEEDED)
+
+        try:
+            return await self._task
+        except asyncio.CancelledError:
+            if self.reason is None or not self._task.cancelled():
+                raise
+            raise JobCancelled(self.reason) from None
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self._task = None
+
+
+_tokens: Dict[str, CancellationToken] = {}
+
+
+def get_execution_timeout(config: Dict[str, Any], job: Dict[str, Any]) -> Optional[float]:
+    """
+    Returns the seconds a job may take, from the job policy "executionTimeout" (ms),
+    config["execution_timeout"] or RUNPOD_EXECUTION_TIMEOUT (s). None or 0 disables it.
+    """
+    policy = job.get("policy")
+    if isinstance(policy, dict) and policy.get("executionTimeout"):
+        return float(policy["executionTimeout"]) / 1000
+
+    timeout = config.get("execution_timeout") or os.environ.get("RUNPOD_EXECUTION_TIMEOUT")
+    return float(timeout) if timeout and float(timeout) > 0 else None
+
+
+def start_deadline(job: Dict[str, Any], config: Dict[str, Any]) -> CancellationToken:
+    """
+    Creates the token of a job taken by the worker, its deadline counts from now.
+    """
+    timeout = get_execution_timeout(config, job)
+    deadline = time.monotonic() + timeout if timeout else None
+    token = _tokens[job["id"]] = CancellationToken(deadline)
+    return token
+
+
+def get_cancellation_token(job_id: str) -> CancellationToken:
+    """
+    Returns the cancellation token of a job, for use in handlers.
+
+    Usage:
+        def handler(job):
+            token = get_cancellation_token(job["id"])
+            for step in steps:
+                token.raise_if_cancelled()
+                ...
+    """
+    token = _tokens.get(job_id)
+    if token is None:
+        token = _tokens[job_id] = CancellationToken()
+    return token
+
+
+def cancel_job(job_id: str, reason: str = "Job was cancelled.") -> bool:
+    """
+    Cancels a job taken by the worker. Returns False if the job is unknown.
+    """
+    token = _tokens.get(job_id)
+    if token is None:
+        return False
+    token.cancel(reason)
+    return True
+
+
+def release_token(job_id: str) -> None:
+    _tokens.pop(job_id, None)
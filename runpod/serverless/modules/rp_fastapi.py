@@ -1,22 +1,35 @@
 """ Used to launch the FastAPI web server when worker is running in API mode. """
 
+import asyncio
+import contextlib
+import json
 import os
+import signal
+import socket
 import threading
 import uuid
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Union
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Optional, Union
 
 import requests
 import uvicorn
-from fastapi import APIRouter, FastAPI
+from fastapi import APIRouter, FastAPI, HTTPException, Request
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 
 from ...http_client import SyncClientSession
 from ...version import __version__ as runpod_version
+from . import rp_loop
+from .rp_admission import AdmissionController, AdmissionRejected, get_admission_settings
+from .rp_batch import MicroBatcher, get_batch_settings
+from .rp_fork import ForkServer
 from .rp_handler import is_generator
-from .rp_job import run_job, run_job_generator
+from .rp_job import handle_job, run_job, run_job_generator
+from .rp_job_store import FAILED, JobStore, JobStoreFull, JobStoreTransport, StoredJob
+from .rp_logger import RunPodLogger
 from .rp_ping import Heartbeat
+from .rp_scale import JobScaler
 from .worker_state import Job, JobsProgress
 
 RUNPOD_ENDPOINT_ID = os.environ.get("RUNPOD_ENDPOINT_ID", None)
@@ -77,6 +90,9 @@ This endpoint is especially useful for jobs where the complete output needs to b
 
 **Returns:**
 - **output** (Any): The aggregated output from the job, returned as a single entity once the job has concluded. The format of the output will depend on the nature of the job and how its results are structured.
+
+**Incremental Streaming:**
+With `Accept: text/event-stream` each output is sent as a Server-Sent Event as soon as the handler yields it, followed by a `done` or `error` event with the status of the job. `Last-Event-ID` resumes after the given event. With `Accept: application/x-ndjson` the outputs and the final status are sent as lines of JSON. Any number of clients can follow the same job, a client that connects late first receives the outputs it missed.
 """
 
 STATUS_DESCRIPTION = """
@@ -96,6 +112,7 @@ This endpoint is invaluable for monitoring the progress of a job and obtaining t
 
 
 # ------------------------------ Initializations ----------------------------- #
+log = RunPodLogger()
 job_list = JobsProgress()
 heartbeat = Heartbeat()
 
@@ -149,6 +166,120 @@ class StreamOutput:
     error: Optional[str] = None
 
 
+# ------------------------------ Stream Formats ------------------------------ #
+SSE = "text/event-stream"
+NDJSON = "application/x-ndjson"
+
+
+def _stream_media_type(request: Optional[Request]) -> Optional[str]:
+    """
+    The incremental stream format asked for with the Accept header, None for JSON.
+    """
+    if request is None:
+        return None
+    accept = request.headers.get("accept", "")
+    for media_type in (SSE, NDJSON):
+        if media_type in accept:
+            return media_type
+    return None
+
+
+def _final_status(job: StoredJob) -> Dict[str, Any]:
+    final = {"id": job.id, "status": job.status}
+    if job.status == FAILED:
+        final["error"] = job.error
+    return final
+
+
+async def _sse_events(job: StoredJob, start: int) -> AsyncIterator[str]:
+    """
+    The outputs of a job as Server-Sent Events, numbered so that a client can resume.
+    """
+    index = start
+    async for output in job.follow(start):
+        yield f"id: {index}\ndata: {json.dumps(jsonable_encoder(output))}\n\n"
+        index += 1
+
+    event = "error" if job.status == FAILED else "done"
+    yield f"event: {event}\ndata: {json.dumps(_final_status(job))}\n\n"
+
+
+async def _ndjson_lines(job: StoredJob) -> AsyncIterator[str]:
+    """
+    The outputs of a job as lines of JSON, the last line is the status of the job.
+    """
+    async for output in job.follow():
+        yield json.dumps(jsonable_encoder(output)) + "\n"
+    yield json.dumps(_final_status(job)) + "\n"
+
+
+def _last_event_index(request: Request) -> int:
+    """
+    Index of the first event to send, after the Last-Event-ID a client reconnects with.
+    """
+    try:
+        return int(request.headers.get("last-event-id", "")) + 1
+    except ValueError:
+        return 0
+
+
+# ----------------------------- Client Disconnect ---------------------------- #
+# Seconds between checks whether the client of a realtime request is still connected.
+DISCONNECT_POLL_INTERVAL = 0.1
+
+
+async def _wait_disconnected(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def _cancel_on_disconnect(request: Optional[Request], coro) -> Any:
+    """
+    Runs `coro`, cancelled when the client goes away. Raises CancelledError then.
+    Without a request `coro` is awaited as is.
+    """
+    if request is None:
+        return await coro
+
+    task = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(_wait_disconnected(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+
+    if not task.done():
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        raise asyncio.CancelledError()
+    return task.result()
+
+
+# ---------------------------- Multi-Process Serving --------------------------- #
+def _reuse_port() -> bool:
+    """
+    Whether each API server process binds its own socket with SO_REUSEPORT, so that the
+    kernel balances the connections. Set with RUNPOD_API_REUSE_PORT, off by default.
+    """
+    enabled = os.environ.get("RUNPOD_API_REUSE_PORT", "false").lower() in ("1", "true")
+    if enabled and not hasattr(socket, "SO_REUSEPORT"):
+        log.warn("RUNPOD_API_REUSE_PORT is set but SO_REUSEPORT is not supported here.")
+        return False
+    return enabled
+
+
+def _bind_socket(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family=family)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
 # ------------------------------ Webhook Sender ------------------------------ #
 def _send_webhook(url: str, payload: Dict[str, Any]) -> bool:
     """
@@ -171,6 +302,14 @@ def _send_webhook(url: str, payload: Dict[str, Any]) -> bool:
             return False
 
 
+async def _handle_job(session, config: Dict[str, Any], job, transport=None) -> bool:
+    """
+    Runs a job submitted to /run, the API server is never refreshed.
+    """
+    await handle_job(session, config, job, transport)
+    return False
+
+
 # ---------------------------------------------------------------------------- #
 #                                  API Worker                                  #
 # ---------------------------------------------------------------------------- #
@@ -180,15 +319,25 @@ class WorkerAPI:
     def __init__(self, config: Dict[str, Any]):
         """
         Initializes the WorkerAPI class.
-        1. Starts the heartbeat thread.
-        2. Initializes the FastAPI web server.
-        3. Sets the handler for processing jobs.
+        1. Initializes the FastAPI web server.
+        2. Sets the handler for processing jobs.
         """
-        # Start the heartbeat thread.
-        heartbeat.start_ping()
-
         self.config = config
 
+        # Jobs submitted to /run are stored and run in the background by a JobScaler.
+        self.job_store = JobStore()
+        self.job_transport = JobStoreTransport(self.job_store, on_finished=self._job_finished)
+        self.job_scaler: Optional[JobScaler] = None
+        self._job_worker: Optional[asyncio.Task] = None
+
+        # Bounds the realtime requests running the handler at a time.
+        self.admission = AdmissionController(**get_admission_settings(config))
+
+        # With a batch handler, realtime requests that arrive together are run as a batch.
+        self.batcher: Optional[MicroBatcher] = None
+        if config.get("batch_handler"):
+            self.batcher = MicroBatcher(config["batch_handler"], **get_batch_settings(config))
+
         tags_metadata = [
             {
                 "name": "Synchronously Submit Request & Get Job Results",
@@ -211,6 +360,7 @@ class WorkerAPI:
             version=runpod_version,
             docs_url="/",
             openapi_tags=tags_metadata,
+            lifespan=self._lifespan,
         )
 
         # Create an APIRouter and add the route for processing jobs.
@@ -225,6 +375,11 @@ class WorkerAPI:
             api_router.add_api_route(
                 f"/{RUNPOD_ENDPOINT_ID}/realtime", self._realtime, methods=["POST"]
             )
+            api_router.add_api_route(
+                f"/{RUNPOD_ENDPOINT_ID}/realtime/metrics",
+                self._realtime_metrics,
+                methods=["GET"],
+            )
 
         # Simulation endpoints.
         api_router.add_api_route(
@@ -270,32 +425,162 @@ class WorkerAPI:
     def start_uvicorn(self, api_host="localhost", api_port=8000, api_concurrency=1):
         """
         Starts the Uvicorn server.
+
+        With `api_concurrency` above 1 the server runs in that many processes forked
+        from this one, the handler is loaded once and shared by all of them.
         """
+        api_port, api_concurrency = int(api_port), int(api_concurrency)
+        if api_concurrency > 1 and hasattr(os, "fork"):
+            self._start_processes(api_host, api_port, api_concurrency)
+            return
+
+        if api_concurrency > 1:
+            log.warn("Multiple API server processes need os.fork, running one process.")
+
+        # Start the heartbeat thread.
+        heartbeat.start_ping()
+
         uvicorn.run(
             self.rp_app,
             host=api_host,
-            port=int(api_port),
-            workers=int(api_concurrency),
-            log_level=os.environ.get("UVICORN_LOG_LEVEL", "info"),
-            access_log=False,
+            port=api_port,
+            **self._uvicorn_settings(),
         )
 
+    @staticmethod
+    def _uvicorn_settings() -> Dict[str, Any]:
+        return {
+            "loop": rp_loop.uvicorn_loop(),
+            "log_level": os.environ.get("UVICORN_LOG_LEVEL", "info"),
+            "access_log": False,
+        }
+
+    def _start_processes(self, api_host: str, api_port: int, processes: int) -> None:
+        """
+        Serves the API from `processes` forked processes until signalled to shut down.
+
+        The processes accept connections from one socket bound here, or each binds its
+        own with SO_REUSEPORT when RUNPOD_API_REUSE_PORT is set. A process that crashes
+        is replaced by a new fork.
+
+        Each process pings for the jobs it is running, the parent starts no heartbeat
+        thread so that no thread is running when it forks.
+        """
+        reuse_port = _reuse_port()
+        shared_socket = None if reuse_port else _bind_socket(api_host, api_port)
+
+        def serve() -> None:
+            # Uvicorn handles the shutdown signals and raises them again once it has shut
+            # down, ignored here so that the process exits cleanly.
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+            heartbeat.start_ping()
+
+            sock = shared_socket or _bind_socket(api_host, api_port, reuse_port=True)
+            config = uvicorn.Config(self.rp_app, **self._uvicorn_settings())
+            uvicorn.Server(config).run(sockets=[sock])
+
+        log.info(f"Starting {processes} API server processes on {api_host}:{api_port}.")
+        try:
+            ForkServer(serve, processes=processes).start()
+        finally:
+            if shared_socket is not None:
+                shared_socket.close()
+
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, _app):
+        yield
+        await self.stop_job_worker()
+
+    # -------------------------------- Job Worker -------------------------------- #
+    def _start_job_worker(self) -> None:
+        """
+        Starts the JobScaler that runs the jobs submitted to /run, on first use.
+        """
+        if self._job_worker is not None and not self._job_worker.done():
+            return
+
+        scaler_config = {
+            "rp_args": {},
+            **self.config,
+            # Results are aggregated for /status, like the API server always did.
+            "return_aggregate_stream": True,
+            "refresh_worker": False,
+        }
+        self.job_scaler = JobScaler(scaler_config, self.job_transport)
+        self.job_scaler.jobs_handler = partial(_handle_job, transport=self.job_transport)
+        self._job_worker = asyncio.ensure_future(self.job_scaler.run())
+
+    async def stop_job_worker(self) -> None:
+        """
+        Stops the JobScaler once the jobs it has taken are done.
+        """
+        if self._job_worker is None:
+            return
+        self.job_scaler.kill_worker()
+        await self._job_worker
+        self._job_worker = None
+
+    def _job_finished(self, job: StoredJob) -> None:
+        if job.webhook and job.status != FAILED:
+            thread = threading.Thread(
+                target=_send_webhook, args=(job.webhook, {"output": job.output}), daemon=True
+            )
+            thread.start()
+
     # ----------------------------- Realtime Endpoint ---------------------------- #
-    async def _realtime(self, job: Job):
+    async def _realtime(self, job: Job, request: Request = None):
         """
         Performs model inference on the input data using the provided handler.
         If handler is not provided, returns an error message.
-        """
-        job_list.add(job.id)
-
-        # Process the job using the provided handler, passing in the job input.
-        job_results = await run_job(self.config["handler"], job.__dict__)
 
-        job_list.remove(job.id)
+        Requests over the in-flight limit wait in a bounded queue, once it is full or the
+        wait times out they get a 429 or 503 with a Retry-After. With a limit set, a
+        request whose client disconnects is cancelled, so that it frees its slot. A sync
+        handler cannot be interrupted, the request is cancelled once it returns.
+        """
+        # Watching for disconnects costs a task per request, only worth it under a limit.
+        watched = request if self.admission.max_in_flight else None
+        try:
+            job_results = await _cancel_on_disconnect(watched, self._realtime_job(job))
+        except AdmissionRejected as rejected:
+            raise HTTPException(
+                status_code=rejected.status_code,
+                detail=rejected.reason,
+                headers={"Retry-After": str(rejected.retry_after)},
+            ) from None
+        except asyncio.CancelledError:
+            if request is None or not await request.is_disconnected():
+                raise
+            # Nobody reads the response, 499 is what proxies log for a closed client.
+            return Response(status_code=499)
 
         # Return the results of the job processing.
         return jsonable_encoder(job_results)
 
+    async def _realtime_job(self, job: Job) -> Dict[str, Any]:
+        async with self.admission.admit():
+            job_list.add(job.id)
+            try:
+                if self.batcher is not None:
+                    return await self.batcher.submit(job.__dict__)
+
+                # Process the job using the provided handler, passing in the job input.
+                return await run_job(self.config["handler"], job.__dict__)
+            finally:
+                job_list.remove(job.id)
+
+    async def _realtime_metrics(self) -> Dict[str, Any]:
+        """
+        In-flight, queue and rejection counts of the realtime endpoint, and the batch
+        sizes when requests are batched.
+        """
+        metrics = self.admission.metrics()
+        if self.batcher is not None:
+            metrics.update(self.batcher.metrics())
+        return metrics
+
     # ---------------------------------------------------------------------------- #
     #                             Simulation Endpoints                             #
     # ---------------------------------------------------------------------------- #
@@ -304,11 +589,12 @@ class WorkerAPI:
     async def _sim_run(self, job_request: DefaultRequest) -> JobOutput:
         """Development endpoint to simulate run behavior."""
         assigned_job_id = f"test-{uuid.uuid4()}"
-        job_list.add({
-            "id": assigned_job_id,
-            "input": job_request.input,
-            "webhook": job_request.webhook
-        })
+        try:
+            self.job_store.add(assigned_job_id, job_request.input, job_request.webhook)
+        except JobStoreFull as err:
+            raise HTTPException(status_code=429, detail=str(err)) from err
+
+        self._start_job_worker()
         return jsonable_encoder({"id": assigned_job_id, "status": "IN_PROGRESS"})
 
     # ---------------------------------- runsync --------------------------------- #
@@ -343,22 +629,18 @@ class WorkerAPI:
         )
 
     # ---------------------------------- stream ---------------------------------- #
-    async def _sim_stream(self, job_id: str) -> StreamOutput:
-        """Development endpoint to simulate stream behavior."""
-        stashed_job = job_list.get(job_id)
-        if stashed_job is None:
+    async def _sim_stream(self, job_id: str, request: Request = None) -> StreamOutput:
+        """
+        Development endpoint to simulate stream behavior.
+        Streams the outputs as they are produced when the Accept header asks for it.
+        """
+        stored_job = self.job_store.get(job_id)
+        if stored_job is None:
             return jsonable_encoder(
                 {"id": job_id, "status": "FAILED", "error": "Job ID not found"}
             )
 
-        job = TestJob(id=job_id, input=stashed_job.input)
-
-        if is_generator(self.config["handler"]):
-            generator_output = run_job_generator(self.config["handler"], job.__dict__)
-            stream_accumulator = []
-            async for stream_output in generator_output:
-                stream_accumulator.append({"output": stream_output["output"]})
-        else:
+        if not is_generator(self.config["handler"]):
             return jsonable_encoder(
                 {
                     "id": job_id,
@@ -367,54 +649,44 @@ class WorkerAPI:
                 }
             )
 
-        job_list.remove(job.id)
+        media_type = _stream_media_type(request)
+        if media_type == SSE:
+            return StreamingResponse(
+                _sse_events(stored_job, _last_event_index(request)),
+                media_type=SSE,
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        if media_type == NDJSON:
+            return StreamingResponse(_ndjson_lines(stored_job), media_type=NDJSON)
 
-        if stashed_job.webhook:
-            thread = threading.Thread(
-                target=_send_webhook,
-                args=(stashed_job.webhook, stream_accumulator),
-                daemon=True,
+        await stored_job.done.wait()
+
+        if stored_job.status == FAILED:
+            return jsonable_encoder(
+                {"id": job_id, "status": "FAILED", "error": stored_job.error}
             )
-            thread.start()
 
         return jsonable_encoder(
-            {"id": job_id, "status": "COMPLETED", "stream": stream_accumulator}
+            {"id": job_id, "status": stored_job.status, "stream": stored_job.stream}
         )
 
     # ---------------------------------- status ---------------------------------- #
     async def _sim_status(self, job_id: str) -> JobOutput:
         """Development endpoint to simulate status behavior."""
-        stashed_job = job_list.get(job_id)
-        if stashed_job is None:
+        stored_job = self.job_store.get(job_id)
+        if stored_job is None:
             return jsonable_encoder(
                 {"id": job_id, "status": "FAILED", "error": "Job ID not found"}
             )
 
-        job = TestJob(id=stashed_job.id, input=stashed_job.input)
+        if not stored_job.finished:
+            return jsonable_encoder({"id": job_id, "status": stored_job.status})
 
-        if is_generator(self.config["handler"]):
-            generator_output = run_job_generator(self.config["handler"], job.__dict__)
-            job_output = {"output": []}
-            async for stream_output in generator_output:
-                job_output["output"].append(stream_output["output"])
-        else:
-            job_output = await run_job(self.config["handler"], job.__dict__)
-
-        job_list.remove(job.id)
-
-        if job_output.get("error", None):
+        if stored_job.status == FAILED:
             return jsonable_encoder(
-                {"id": job_id, "status": "FAILED", "error": job_output["error"]}
+                {"id": job_id, "status": "FAILED", "error": stored_job.error}
             )
 
-        if stashed_job.webhook:
-            thread = threading.Thread(
-                target=_send_webhook,
-                args=(stashed_job.webhook, job_output),
-                daemon=True,
-            )
-            thread.start()
-
         return jsonable_encoder(
-            {"id": job_id, "status": "COMPLETED", "output": job_output["output"]}
+            {"id": job_id, "status": stored_job.status, "output": stored_job.output}
         )
@@ -0,0 +1,189 @@
+"""
+runpod | serverless | rp_fork.py
+Fork-server used to recycle the worker process instead of restarting the pod.
+
+The parent process is warmed up once (handler module and model weights loaded) and then
+forks fresh children that do the work. When a child is recycled, or crashes, the parent
+forks a new one at the cost of a fork instead of a container cold start.
+"""
+
+import ctypes
+import os
+import signal
+import sys
+import time
+from typing import Any, Callable, Dict
+
+from .rp_logger import RunPodLogger
+
+log = RunPodLogger()
+
+FORK_MODE = "fork"
+POD_MODE = "pod"
+
+# Minimum lifetime of a child before it is restarted right away after a crash.
+MIN_CHILD_LIFETIME = 1
+
+# Signals the fork-server forwards to its children.
+FORWARDED_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+# From <linux/prctl.h>, the signal a process gets when its parent exits.
+PR_SET_PDEATHSIG = 1
+
+
+def get_refresh_worker_mode(config: Dict[str, Any]) -> str:
+    """
+    Returns how the worker is refreshed, either "pod" (default) or "fork".
+    Set with config["refresh_worker_mode"] or RUNPOD_REFRESH_WORKER_MODE.
+    """
+    mode = config.get(
+        "refresh_worker_mode", os.environ.get("RUNPOD_REFRESH_WORKER_MODE", POD_MODE)
+    )
+    return str(mode).lower()
+
+
+def is_fork_mode(config: Dict[str, Any]) -> bool:
+    """Returns True if the worker process is recycled with the fork-server."""
+    if get_refresh_worker_mode(config) != FORK_MODE:
+        return False
+
+    if not hasattr(os, "fork"):
+        log.warn("refresh_worker_mode 'fork' is not supported on this platform.")
+        return False
+
+    return True
+
+
+def _exit_with_parent(parent_pid: int) -> None:
+    """
+    Has the calling child sent SIGTERM when the fork-server exits, on Linux. A child is
+    in a process group of its own and would otherwise keep running without its parent.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            if libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM, 0, 0, 0) != 0:
+                raise OSError(ctypes.get_errno(), "prctl(PR_SET_PDEATHSIG) failed")
+        except (OSError, AttributeError) as err:
+            log.warn(f"ForkServer | Worker process will not follow the parent: {err}")
+
+    # The parent may have exited before the signal was set.
+    if os.getppid() != parent_pid:
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def _exit_code(status: int) -> int:
+    """Converts a waitpid status to an exit code, negative if killed by a signal."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class ForkServer:
+    """
+    Keeps `processes` forked children running `target` until signalled to shut down.
+
+    A child that exits is replaced by a new fork of the warm parent, crashes of a child
+    are contained and logged.
+    """
+
+    def __init__(self, target: Callable[[], None], processes: int = 1):
+        self.target = target
+        self.processes = processes
+        self.children: Dict[int, float] = {}  # pid -> start time
+        self._shutdown = False
+        self._pid = os.getpid()
+
+    def is_alive(self) -> bool:
+        """Returns whether the fork-server is still forking new children."""
+        return not self._shutdown
+
+    def start(self) -> None:
+        """
+        Runs the fork loop until the server is signalled to shut down and all children exit.
+        """
+        for signum in FORWARDED_SIGNALS:
+            signal.signal(signum, self.handle_shutdown)
+
+        while self.is_alive() or self.children:
+            while self.is_alive() and len(self.children) < self.processes:
+                self._fork()
+
+            pid, exit_code = self._wait_child()
+            if pid is None:
+                break
+
+            started_at = self.children.pop(pid, time.monotonic())
+
+            if exit_code == 0:
+                log.debug(f"ForkServer | Worker process {pid} recycled.")
+                continue
+
+            log.error(f"ForkServer | Worker process {pid} exited with code {exit_code}.")
+            if self.is_alive() and time.monotonic() - started_at < MIN_CHILD_LIFETIME:
+                time.sleep(MIN_CHILD_LIFETIME)  # avoid a tight crash loop
+
+    def handle_shutdown(self, signum, frame):
+        """
+        Stops forking new children and forwards the signal to the running children.
+        """
+        del frame
+        log.debug(f"ForkServer | Received shutdown signal: {signum}.")
+        self._shutdown = True
+
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _fork(self) -> None:
+        """Forks a new child, the child runs the target and never returns."""
+        # Blocked until the child is registered, a signal handled in between would not
+        # be forwarded to it.
+        mask = signal.pthread_sigmask(signal.SIG_BLOCK, FORWARDED_SIGNALS)
+        try:
+            pid = os.fork()
+
+            if pid == 0:
+                self._run_child()
+
+            self.children[pid] = time.monotonic()
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+
+        log.debug(f"ForkServer | Started worker process {pid}.")
+
+    def _wait_child(self):
+        """Waits for any child to exit and returns its pid and exit code."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, 0)
+                return pid, _exit_code(status)
+            except ChildProcessError:
+                self.children.clear()
+                return None, 0
+            except InterruptedError:
+                continue
+
+    def _run_child(self) -> None:
+        """
+        Entry point of a child process, never returns.
+        """
+        exit_code = 0
+        try:
+            # In a process group of its own, a Ctrl-C in the terminal reaches only the
+            # parent, which forwards it. Otherwise the child would get it twice.
+            os.setpgid(0, 0)
+            for signum in FORWARDED_SIGNALS:
+                signal.signal(signum, signal.SIG_DFL)
+            _exit_with_parent(self._pid)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, FORWARDED_SIGNALS)
+            self.target()
+        except BaseException as err:  # pylint: disable=broad-except
+            log.error(f"ForkServer | Worker process failed: {err}")
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)  # pylint: disable=protected-access
@@ -0,0 +1,76 @@
+"""
+runpod | serverless | rp_init.py
+Runs the worker's init stage (e.g. model loading) before any job is taken.
+"""
+
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Dict, Sequence, Union
+
+from . import rp_loop
+from .rp_logger import RunPodLogger
+
+log = RunPodLogger()
+
+InitStep = Callable[[], Any]
+
+
+def _is_async(step: InitStep) -> bool:
+    return inspect.iscoroutinefunction(step)
+
+
+async def _run_parallel(steps: Sequence[InitStep]) -> None:
+    """
+    Runs the init sub-steps concurrently.
+    Async steps run on the event loop, sync steps in the default executor.
+    """
+    loop = asyncio.get_running_loop()
+
+    await asyncio.gather(
+        *[
+            step() if _is_async(step) else loop.run_in_executor(None, step)
+            for step in steps
+        ]
+    )
+
+
+def run_init(config: Dict[str, Any]) -> Union[float, None]:
+    """
+    Runs config["init"] and records its duration in config["init_duration_ms"].
+
+    config["init"] can be a sync or async callable, or a list of callables that are
+    run in parallel. Exceptions are logged and re-raised so that a worker that failed
+    to initialize never takes a job.
+
+    Async steps run on an event loop of the kind selected with RUNPOD_EVENT_LOOP, that
+    is closed once init is done. Objects bound to a loop (aiohttp sessions, asyncio
+    locks, queues and events) must not be created in init, they are not usable from
+    the worker's loop.
+
+    Returns:
+        float: The duration of the init stage in milliseconds, None if there is no init.
+    """
+    init = config.get("init")
+    if init is None:
+        return None
+
+    log.info("Running init stage.")
+    init_start = time.perf_counter()
+
+    try:
+        if isinstance(init, (list, tuple)):
+            rp_loop.run(_run_parallel(init))
+        elif _is_async(init):
+            rp_loop.run(init())
+        else:
+            init()
+    except Exception as err:
+        log.error(f"Init stage failed. | {type(err).__name__}: {err}")
+        raise
+
+    init_duration_ms = (time.perf_counter() - init_start) * 1000
+    config["init_duration_ms"] = init_duration_ms
+
+    log.info(f"Init stage completed in {init_duration_ms:.2f} ms.")
+    return init_duration_ms
@@ -5,8 +5,9 @@ Job related helpers.
 import inspect
 import json
 import os
+import time
 import traceback
-from typing import Any, AsyncGenerator, Callable, Dict, Optional, Union, List
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Optional, Union, List
 
 import aiohttp
 
@@ -15,15 +16,24 @@ from runpod.serverless.modules.rp_logger import RunPodLogger
 
 from ...version import __version__ as runpod_version
 from ..utils import rp_debugger
+from .rp_cancel import JobCancelled, get_cancellation_token
 from .rp_handler import is_generator
 from .rp_http import send_result, stream_result
+from .rp_json import JobArrayDecoder
+from .rp_fork import is_fork_mode
+from .rp_memory import MemoryTracker, get_memory_threshold
+from .rp_progress import release_transport, set_transport
+from .rp_telemetry import JobTelemetry
 from .rp_tips import check_return_size
+from .rp_transport import OnJob, Transport
 from .worker_state import WORKER_ID, REF_COUNT_ZERO, JobsProgress
 
 JOB_GET_URL = str(os.environ.get("RUNPOD_WEBHOOK_GET_JOB")).replace("$ID", WORKER_ID)
 
 log = RunPodLogger()
 job_progress = JobsProgress()
+memory_tracker = MemoryTracker()
+job_telemetry = JobTelemetry()
 
 
 def _job_get_url(batch_size: int = 1):
@@ -51,7 +61,9 @@ def _job_get_url(batch_size: int = 1):
 
 
 async def get_job(
-    session: ClientSession, num_jobs: int = 1
+    session: ClientSession,
+    num_jobs: int = 1,
+    on_job: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
 ) -> Optional[List[Dict[str, Any]]]:
     """
     Get a job from the job-take API.
@@ -63,6 +75,8 @@ async def get_job(
     Args:
         session (ClientSession): The aiohttp ClientSession to use for the request.
         num_jobs (int): The number of jobs to get.
+        on_job (Callable): Awaited with each job of a batch as soon as it has been received,
+            jobs passed to it are not included in the returned list.
     """
     async with session.get(_job_get_url(num_jobs)) as response:
         log.debug(f"rp_job | Response: {type(response).__name__} {response.status}")
@@ -80,7 +94,8 @@ async def get_job(
                 response.request_info,
                 response.history,
                 status=response.status,
-                message=response.reason
+                message=response.reason,
+                headers=response.headers,
             )
 
         # All other errors should raise an exception
@@ -96,6 +111,10 @@ async def get_job(
             log.debug("rp_job | No content to parse.")
             return
 
+        # batch job-take API, jobs are handed over while the rest of the batch is received
+        if on_job is not None and num_jobs > 1:
+            return await _stream_jobs(response, on_job)
+
         try:
             jobs = await response.json()
             log.debug("rp_job | Received Job(s)")
@@ -117,35 +136,123 @@ async def get_job(
             return jobs
 
 
-async def handle_job(session: ClientSession, config: Dict[str, Any], job) -> dict:
-    if is_generator(config["handler"]):
-        is_stream = True
-        generator_output = run_job_generator(config["handler"], job)
-        log.debug("Handler is a generator, streaming results.", job["id"])
+async def _stream_jobs(
+    response: aiohttp.ClientResponse, on_job: Callable[[Dict[str, Any]], Awaitable[Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Decodes the batch job-take response incrementally and passes each job to `on_job`
+    as soon as its JSON object is complete.
+    """
+    decoder = JobArrayDecoder()
+
+    try:
+        async for chunk in response.content.iter_any():
+            for job in decoder.feed(chunk):
+                if not isinstance(job, dict) or "id" not in job:
+                    log.debug(f"rp_job | Skipping invalid job: {job}")
+                    continue
 
-        job_result = {"output": []}
-        async for stream_output in generator_output:
-            log.debug(f"Stream output: {stream_output}", job["id"])
+                log.debug("rp_job | Received Job", job["id"])
+                await on_job(job)
 
-            if type(stream_output.get("output")) == dict:
-                if stream_output["output"].get("error"):
-                    stream_output = {"error": str(stream_output["output"]["error"])}
+        decoder.close()
+    except ValueError as json_error:
+        log.debug(f"rp_job | Failed to parse JSON response: {json_error}")
 
-            if stream_output.get("error"):
-                job_result = stream_output
-                break
+    return []
 
-            if config.get("return_aggregate_stream", False):
-                job_result["output"].append(stream_output["output"])
 
-            await stream_result(session, stream_output, job)
-    else:
-        is_stream = False
-        job_result = await run_job(config["handler"], job)
+class HTTPTransport(Transport):
+    """
+    The job API, jobs are taken with get_job and results sent with rp_http.
+    """
+
+    streams_jobs = True
+
+    async def acquire(
+        self, session: ClientSession, num_jobs: int, on_job: Optional[OnJob] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        return await get_job(session, num_jobs, on_job=on_job)
+
+    async def stream(self, session: ClientSession, job: Dict[str, Any], output: Any) -> None:
+        await stream_result(session, output, job)
 
-    # If refresh_worker is set, pod will be reset after job is complete.
+    async def post(
+        self,
+        session: ClientSession,
+        job: Dict[str, Any],
+        result: Dict[str, Any],
+        is_stream: bool = False,
+    ) -> None:
+        await send_result(session, result, job, is_stream=is_stream)
+
+    async def progress(self, session: ClientSession, job: Dict[str, Any], progress: Any) -> None:
+        await send_result(session, {"status": "IN_PROGRESS", "output": progress}, job)
+
+
+http_transport = HTTPTransport()
+
+
+async def handle_job(
+    session: ClientSession,
+    config: Dict[str, Any],
+    job,
+    transport: Optional[Transport] = None,
+) -> bool:
+    """
+    Run the job and send its result back.
+
+    Args:
+        transport (Transport): Where the output is sent to, the job API by default.
+
+    Returns:
+        bool: True if the worker should be refreshed after this job.
+    """
+    started = time.perf_counter()
+    transport = transport or http_transport
+    memory_tracker.start(job["id"], top_n=config["rp_args"].get("rp_debugger_tracemalloc"))
+
+    # The job is always stopped, a job left active would keep the peaks from being reset.
+    try:
+        is_stream = is_generator(config["handler"])
+        if is_stream:
+            execution = _stream_job(session, config, job, transport)
+        else:
+            execution = run_job(config["handler"], job)
+
+        # Cancelled jobs, and jobs past their deadline, are stopped and report an error.
+        set_transport(job["id"], transport)
+        try:
+            job_result = await get_cancellation_token(job["id"]).run(execution)
+        except JobCancelled as err:
+            log.error(f"Job cancelled: {err}", job["id"])
+            job_result = {"error": json.dumps(_error_info(err))}
+        finally:
+            release_transport(job["id"])
+
+        if is_stream:
+            await transport.finish_stream(session, job)
+    finally:
+        job_memory = memory_tracker.stop(job["id"])
+
+    # Requested by the handler returning refresh_worker.
+    refresh_worker = job_result.pop("stopPod", False)
+
+    # If refresh_worker is set, worker will be reset after job is complete.
     if config.get("refresh_worker", False):
-        log.info("refresh_worker flag set, stopping pod after job.", job["id"])
+        log.info("refresh_worker flag set, refreshing worker after job.", job["id"])
+        refresh_worker = True
+
+    # If memory grew past the threshold, worker will be reset after job is complete.
+    elif memory_tracker.exceeds(get_memory_threshold(config)):
+        log.info(
+            f"Memory grew by {memory_tracker.growth_mb} MB, refreshing worker after job.",
+            job["id"],
+        )
+        refresh_worker = True
+
+    # In fork mode only the worker process is replaced, otherwise the pod is stopped.
+    if refresh_worker and not is_fork_mode(config):
         job_result["stopPod"] = True
 
     # If rp_debugger is set, debugger output will be returned.
@@ -156,12 +263,87 @@ async def handle_job(session: ClientSession, config: Dict[str, Any], job) -> dic
         # Calculate ready delay for the debugger output.
         ready_delay = (config["reference_counter_start"] - REF_COUNT_ZERO) * 1000
         job_result["output"]["rp_debugger"]["ready_delay_ms"] = ready_delay
+        job_result["output"]["rp_debugger"]["init_duration_ms"] = config.get("init_duration_ms")
+        job_result["output"]["rp_debugger"]["memory"] = job_memory
     else:
         log.debug("rp_debugger | Flag not set, skipping debugger output.", job["id"])
         rp_debugger.clear_debugger_output()
 
-    # Send the job result back to JOB_DONE_URL
-    await send_result(session, job_result, job, is_stream=is_stream)
+    # Send the job result back, to JOB_DONE_URL with the default transport
+    await transport.post(session, job, job_result, is_stream=is_stream)
+
+    job_telemetry.record_job(time.perf_counter() - started, failed="error" in job_result)
+
+    return refresh_worker
+
+
+async def _stream_job(
+    session: ClientSession, config: Dict[str, Any], job: Dict[str, Any], transport: Transport
+) -> Dict[str, Any]:
+    """
+    Runs a generator handler, streaming its output, and returns the job result.
+    """
+    generator_output = run_job_generator(config["handler"], job)
+    log.debug("Handler is a generator, streaming results.", job["id"])
+
+    job_result = {"output": []}
+    async for stream_output in generator_output:
+        log.debug(f"Stream output: {stream_output}", job["id"])
+
+        if type(stream_output.get("output")) == dict:
+            if stream_output["output"].get("error"):
+                stream_output = {"error": str(stream_output["output"]["error"])}
+
+        if stream_output.get("error"):
+            job_result = stream_output
+            break
+
+        if config.get("return_aggregate_stream", False):
+            job_result["output"].append(stream_output["output"])
+
+        await transport.stream(session, job, stream_output)
+
+    return job_result
+
+
+def _error_info(err: Exception) -> Dict[str, Any]:
+    return {
+        "error_type": str(type(err)),
+        "error_message": str(err),
+        "error_traceback": traceback.format_exc(),
+        "hostname": os.environ.get("RUNPOD_POD_HOSTNAME", "unknown"),
+        "worker_id": os.environ.get("RUNPOD_POD_ID", "unknown"),
+        "runpod_version": runpod_version,
+    }
+
+
+def _run_result(job_output: Any) -> Dict[str, Any]:
+    """
+    The result of a job from what the handler returned for it.
+    """
+    run_result = {}
+
+    if isinstance(job_output, dict):
+        error_msg = job_output.pop("error", None)
+        refresh_worker = job_output.pop("refresh_worker", None)
+        run_result["output"] = job_output
+
+        if error_msg:
+            run_result["error"] = error_msg
+        if refresh_worker:
+            run_result["stopPod"] = True
+
+    elif isinstance(job_output, bool):
+        run_result = {"output": job_output}
+
+    else:
+        run_result = {"output": job_output}
+
+    if run_result.get("output") == {}:
+        run_result.pop("output")
+
+    check_return_size(run_result)  # Checks the size of the return body.
+    return run_result
 
 
 async def run_job(handler: Callable, job: Dict[str, Any]) -> Dict[str, Any]:
@@ -188,36 +370,10 @@ async def run_job(handler: Callable, job: Dict[str, Any]) -> Dict[str, Any]:
 
         log.debug(f"Handler output: {job_output}", job["id"])
 
-        if isinstance(job_output, dict):
-            error_msg = job_output.pop("error", None)
-            refresh_worker = job_output.pop("refresh_worker", None)
-            run_result["output"] = job_output
-
-            if error_msg:
-                run_result["error"] = error_msg
-            if refresh_worker:
-                run_result["stopPod"] = True
-
-        elif isinstance(job_output, bool):
-            run_result = {"output": job_output}
-
-        else:
-            run_result = {"output": job_output}
-
-        if run_result.get("output") == {}:
-            run_result.pop("output")
-
-        check_return_size(run_result)  # Checks the size of the return body.
+        run_result = _run_result(job_output)
 
     except Exception as err:
-        error_info = {
-            "error_type": str(type(err)),
-            "error_message": str(err),
-            "error_traceback": traceback.format_exc(),
-            "hostname": os.environ.get("RUNPOD_POD_HOSTNAME", "unknown"),
-            "worker_id": os.environ.get("RUNPOD_POD_ID", "unknown"),
-            "runpod_version": runpod_version,
-        }
+        error_info = _error_info(err)
 
         log.error("Captured Handler Exception", job["id"])
         log.error(json.dumps(error_info, indent=4))
@@ -229,6 +385,48 @@ async def run_job(handler: Callable, job: Dict[str, Any]) -> Dict[str, Any]:
     return run_result
 
 
+async def run_batch(
+    batch_handler: Callable, jobs: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Run several jobs with one call of a batch handler.
+
+    Args:
+        batch_handler (Callable): Called with the list of jobs, returns one output per job
+            in the same order.
+        jobs (List[Dict[str, Any]]): The jobs to run.
+
+    Returns:
+        List[Dict[str, Any]]: The result of each job, an error for all of them if the
+            batch handler failed.
+    """
+    job_ids = ", ".join(job["id"] for job in jobs)
+    log.info(f"Started batch of {len(jobs)} jobs: {job_ids}")
+
+    try:
+        handler_return = batch_handler(jobs)
+        outputs = (
+            await handler_return
+            if inspect.isawaitable(handler_return)
+            else handler_return
+        )
+
+        if not isinstance(outputs, (list, tuple)) or len(outputs) != len(jobs):
+            count = len(outputs) if isinstance(outputs, (list, tuple)) else type(outputs).__name__
+            raise ValueError(
+                f"Batch handler must return a list of {len(jobs)} outputs, got {count}."
+            )
+
+        return [_run_result(output) for output in outputs]
+
+    except Exception as err:
+        error_info = _error_info(err)
+
+        log.error(f"Captured Batch Handler Exception, jobs: {job_ids}")
+        log.error(json.dumps(error_info, indent=4))
+        return [{"error": json.dumps(error_info)} for _ in jobs]
+
+
 async def run_job_generator(
     handler: Callable, job: Dict[str, Any]
 ) -> AsyncGenerator[Dict[str, Union[str, Any]], None]:
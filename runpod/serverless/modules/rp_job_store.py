@@ -0,0 +1,229 @@
+"""
+runpod | serverless | rp_job_store.py
+Jobs submitted to the local API server and their results.
+
+/run adds a job to the JobStore, a JobScaler runs it in the background through a
+JobStoreTransport and /status looks the result up.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from .rp_transport import RELEASED_JOB_ERROR, Transport
+
+IN_QUEUE = "IN_QUEUE"
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+
+# Seconds a finished job is kept, and the most jobs kept.
+JOB_TTL = float(os.environ.get("RUNPOD_API_JOB_TTL", 30 * 60))
+MAX_JOBS = int(os.environ.get("RUNPOD_API_MAX_JOBS", 10_000))
+
+
+class JobStoreFull(Exception):
+    """
+    Raised when a job is added to a store that only holds unfinished jobs.
+    """
+
+
+@dataclass
+class StoredJob:
+    """
+    A job submitted to the local API server.
+
+    `stream` keeps every output of a generator handler, readers that subscribe late
+    get them all before the ones that follow.
+    """
+
+    id: str
+    input: Any
+    webhook: Optional[str] = None
+    status: str = IN_QUEUE
+    output: Any = None
+    error: Optional[str] = None
+    stream: List[Any] = field(default_factory=list)
+    expires_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    _updated: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED)
+
+    def publish(self, output: Any) -> None:
+        self.stream.append(output)
+        self.notify()
+
+    def notify(self) -> None:
+        """
+        Wakes up the readers, the next wait is on a new event.
+        """
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def follow(self, start: int = 0) -> AsyncIterator[Any]:
+        """
+        Yields the stream outputs from index `start` on, as they are published,
+        until the job is finished.
+        """
+        index = start
+        while True:
+            while index < len(self.stream):
+                yield self.stream[index]
+                index += 1
+
+            if self.finished:
+                return
+            await self._updated.wait()
+
+    def as_job(self) -> Dict[str, Any]:
+        return {"id": self.id, "input": self.input}
+
+
+class JobStore:
+    """
+    Jobs by ID. Finished jobs are evicted `ttl` seconds after they finished, and the
+    oldest finished job when `max_jobs` is reached. Lookups are O(1).
+
+    Args:
+        ttl (float): Seconds a finished job is kept.
+        max_jobs (int): Most jobs kept, finished or not.
+    """
+
+    def __init__(self, ttl: float = JOB_TTL, max_jobs: int = MAX_JOBS) -> None:
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+
+        self._jobs: Dict[str, StoredJob] = {}
+        self._finished: "OrderedDict[str, float]" = OrderedDict()  # In the order they finished.
+        self._pending = deque()  # IDs of the jobs not taken yet.
+        self._job_added: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def job_added(self) -> asyncio.Event:
+        # Created on first use, inside the event loop of the server.
+        if self._job_added is None:
+            self._job_added = asyncio.Event()
+        return self._job_added
+
+    def evict(self, now: Optional[float] = None) -> None:
+        """
+        Drops the finished jobs whose time to live has passed.
+        """
+        now = time.monotonic() if now is None else now
+        while self._finished and next(iter(self._finished.values())) <= now:
+            self._drop_oldest_finished()
+
+    def _drop_oldest_finished(self) -> None:
+        job_id, _ = self._finished.popitem(last=False)
+        self._jobs.pop(job_id, None)
+
+    def add(self, job_id: str, job_input: Any, webhook: Optional[str] = None) -> StoredJob:
+        """
+        Adds a job to be run. Raises JobStoreFull when every kept job is unfinished.
+        """
+        self.evict()
+        if len(self._jobs) >= self.max_jobs:
+            if not self._finished:
+                raise JobStoreFull(f"The job store holds {self.max_jobs} unfinished jobs.")
+            self._drop_oldest_finished()
+
+        job = self._jobs[job_id] = StoredJob(id=job_id, input=job_input, webhook=webhook)
+        self._pending.append(job_id)
+        self.job_added.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[StoredJob]:
+        job = self._jobs.get(job_id)
+        if job is not None and job.expires_at is not None and job.expires_at <= time.monotonic():
+            self.evict()
+            return None
+        return job
+
+    def take(self, count: int) -> List[StoredJob]:
+        """
+        Takes up to `count` queued jobs to run, they are in progress from now on.
+        """
+        jobs = []
+        while self._pending and len(jobs) < count:
+            job = self._jobs.get(self._pending.popleft())
+            if job is not None:
+                job.status = IN_PROGRESS
+                jobs.append(job)
+
+        if not self._pending:
+            self.job_added.clear()
+        return jobs
+
+    def finish(self, job_id: str, result: Dict[str, Any]) -> Optional[StoredJob]:
+        """
+        Stores the result of a job, {"output": ...} or {"error": ...}.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        if result.get("error"):
+            job.status, job.error = FAILED, str(result["error"])
+        else:
+            job.status, job.output = COMPLETED, result.get("output")
+
+        job.expires_at = time.monotonic() + self.ttl
+        self._finished[job_id] = job.expires_at
+        job.done.set()
+        job.notify()
+        return job
+
+
+class JobStoreTransport(Transport):
+    """
+    Hands the jobs of a JobStore to a JobScaler and stores what the handler returns.
+
+    Args:
+        store (JobStore): The job store.
+        wait (float): Seconds acquire waits for a job when there is none.
+        on_finished (Callable): Called with each job once its result has been stored.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        wait: float = 1.0,
+        on_finished: Optional[Callable[[StoredJob], Any]] = None,
+    ) -> None:
+        self.store = store
+        self.wait = wait
+        self.on_finished = on_finished
+
+    async def acquire(self, session, num_jobs, on_job=None):
+        try:
+            await asyncio.wait_for(self.store.job_added.wait(), self.wait)
+        except asyncio.TimeoutError:
+            return []
+        return [job.as_job() for job in self.store.take(num_jobs)]
+
+    async def stream(self, session, job, output):
+        stored_job = self.store.get(job["id"])
+        if stored_job is not None:
+            stored_job.publish(output)
+
+    async def post(self, session, job, result, is_stream=False):
+        stored_job = self.store.finish(job["id"], result)
+        if stored_job is not None and self.on_finished is not None:
+            self.on_finished(stored_job)
+
+    async def progress(self, session, job, progress):
+        pass
+
+    async def release(self, session, job):
+        # Nothing else runs the jobs of the store, the job fails so that /status and
+        # /stream do not wait for it.
+        await self.post(session, job, {"error": RELEASED_JOB_ERROR})
@@ -0,0 +1,106 @@
+"""
+runpod | serverless | rp_json.py
+Incremental decoding of the JSON array returned by the batch job-take API.
+"""
+
+import json
+import re
+from typing import Any, List
+
+# Characters that change the state of the scanner outside and inside of strings.
+_STRUCTURAL = re.compile(rb'[{}\[\]"]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+
+class JobArrayDecoder:
+    """
+    Decodes a JSON array of objects fed in chunks and returns each object as soon as
+    its closing brace has been received. A single top level object is returned too.
+
+    The scanner only looks at brackets, braces and string delimiters, skipping over
+    the content of strings with a regular expression, and each complete object is
+    decoded with json.loads. Bytes of returned objects are dropped from the buffer.
+
+    Usage:
+        decoder = JobArrayDecoder()
+        async for chunk in response.content.iter_any():
+            for job in decoder.feed(chunk):
+                ...
+        decoder.close()
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._start = None
+        self._object_depth = 0
+        self._started = False
+
+    def feed(self, data: bytes) -> List[Any]:
+        """
+        Adds a chunk of the response and returns the objects completed by it.
+        Raises ValueError if the data is not valid JSON.
+        """
+        buffer = self._buffer
+        buffer += data
+        pos = self._pos
+        objects = []
+
+        while True:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+
+                if match.group() == b"\\":
+                    if match.end() >= len(buffer):
+                        pos = match.start()  # Wait for the escaped character.
+                        break
+                    pos = match.end() + 1
+                    continue
+
+                self._in_string = False
+                pos = match.end()
+                continue
+
+            match = _STRUCTURAL.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+
+            char, pos = match.group(), match.end()
+
+            if char == b'"':
+                self._in_string = True
+
+            elif char in (b"{", b"["):
+                if self._depth == 0 and self._started:
+                    raise ValueError("Unexpected data after the end of the JSON document.")
+
+                self._started = True
+                if char == b"{" and self._depth <= 1 and self._start is None:
+                    self._start, self._object_depth = match.start(), self._depth
+                self._depth += 1
+
+            else:
+                self._depth -= 1
+                if self._depth < 0:
+                    raise ValueError(f"Unexpected {char.decode()!r} in JSON document.")
+
+                if self._start is not None and self._depth == self._object_depth:
+                    objects.append(json.loads(bytes(buffer[self._start : pos])))
+                    del buffer[:pos]
+                    pos, self._start = 0, None
+
+        self._pos = pos
+        return objects
+
+    def close(self) -> None:
+        """
+        Raises ValueError if the document was incomplete.
+        """
+        if not self._started or self._depth != 0 or self._in_string:
+            raise ValueError("Incomplete JSON document.")
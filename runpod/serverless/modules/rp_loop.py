@@ -0,0 +1,87 @@
+"""
+runpod | serverless | rp_loop.py
+Selects the event loop used by the worker, sls-core and the API server.
+"""
+
+import asyncio
+import os
+from typing import Any, Coroutine, Optional, TypeVar
+
+from .rp_logger import RunPodLogger
+
+log = RunPodLogger()
+
+T = TypeVar("T")
+
+EVENT_LOOPS = ("asyncio", "uvloop")
+
+
+def get_event_loop_setting() -> Optional[str]:
+    """
+    Returns the event loop set with RUNPOD_EVENT_LOOP, "uvloop" or "asyncio".
+    None when it is not set, each entry point then keeps its default.
+    """
+    setting = os.environ.get("RUNPOD_EVENT_LOOP", "").strip().lower()
+    if not setting:
+        return None
+
+    if setting not in EVENT_LOOPS:
+        log.warn(f"Unknown RUNPOD_EVENT_LOOP {setting!r}, using asyncio.")
+        return "asyncio"
+
+    return setting
+
+
+def use_uvloop() -> bool:
+    """
+    Whether uvloop was asked for and is installed.
+    """
+    if get_event_loop_setting() != "uvloop":
+        return False
+
+    try:
+        import uvloop  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        log.warn("RUNPOD_EVENT_LOOP is uvloop but uvloop is not installed, using asyncio.")
+        return False
+
+    return True
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Creates a new event loop of the selected kind.
+    """
+    if use_uvloop():
+        import uvloop  # pylint: disable=import-outside-toplevel
+
+        return uvloop.new_event_loop()
+
+    return asyncio.new_event_loop()
+
+
+def run(main: Coroutine[Any, Any, T]) -> T:
+    """
+    Runs the coroutine like asyncio.run, on the selected event loop.
+    """
+    if not use_uvloop():
+        return asyncio.run(main)
+
+    import uvloop  # pylint: disable=import-outside-toplevel
+
+    if hasattr(uvloop, "run"):
+        return uvloop.run(main)
+
+    # uvloop < 0.18
+    uvloop.install()
+    return asyncio.run(main)
+
+
+def uvicorn_loop() -> str:
+    """
+    Returns the `loop` option for uvicorn, "auto" (uvloop when installed) when not set.
+    """
+    setting = get_event_loop_setting()
+    if setting is None:
+        return "auto"
+    return "uvloop" if use_uvloop() else "asyncio"
@@ -0,0 +1,221 @@
+"""
+runpod | serverless | rp_memory.py
+Per-job memory accounting used to detect leaks and recycle the worker on memory growth.
+"""
+
+import os
+import sys
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # Not available on Windows.
+
+from .rp_logger import RunPodLogger
+
+log = RunPodLogger()
+
+MB = 1024 * 1024
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+# ---------------------------------------------------------------------------- #
+#                                 Process Stats                                #
+# ---------------------------------------------------------------------------- #
+def _read_proc_status(field: str) -> Optional[int]:
+    """
+    Reads a memory field (reported in kB) from /proc/self/status and returns bytes.
+    """
+    try:
+        with open(PROC_STATUS, "r", encoding="utf-8") as status_file:
+            for line in status_file:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return None
+
+
+def get_rss() -> int:
+    """
+    Returns the current resident set size of the process in bytes.
+    Falls back to the peak RSS where the current value is not available.
+    """
+    rss = _read_proc_status("VmRSS")
+    if rss is not None:
+        return rss
+
+    return get_peak_rss()
+
+
+def get_peak_rss() -> int:
+    """
+    Returns the peak resident set size of the process in bytes.
+    """
+    peak = _read_proc_status("VmHWM")
+    if peak is not None:
+        return peak
+
+    if resource is None:
+        return 0
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the kernel's peak RSS counter (Linux only).
+    Returns True if the counter was reset.
+    """
+    try:
+        with open(PROC_CLEAR_REFS, "w", encoding="utf-8") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _to_mb(num_bytes: int) -> float:
+    return round(num_bytes / MB, 2)
+
+
+# ---------------------------------------------------------------------------- #
+#                                Memory Tracker                                #
+# ---------------------------------------------------------------------------- #
+class MemoryTracker:
+    """
+    Singleton that records memory usage around each job.
+
+    RSS is sampled when a job starts and stops, the kernel peak counter is reset
+    when no other job is in flight so that the peak can be attributed to the job.
+    Python heap usage is taken from tracemalloc when it is tracing, otherwise the
+    number of allocated blocks is used as a cheap proxy.
+
+    When jobs run concurrently the deltas include allocations of the other jobs.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if MemoryTracker._instance is None:
+            MemoryTracker._instance = object.__new__(cls)
+            MemoryTracker._instance.clear()
+        return MemoryTracker._instance
+
+    def clear(self) -> None:
+        """
+        Resets the tracker, the next job will set a new baseline.
+        """
+        self.baseline_rss = None
+        self.growth_mb = 0.0
+        self._active = {}
+
+    def start(self, job_id: str, top_n: Optional[int] = None) -> None:
+        """
+        Records the memory state before a job is run.
+
+        Args:
+            job_id (str): The ID of the job.
+            top_n (int): Number of tracemalloc allocation diffs to collect, starts tracing if needed.
+        """
+        if top_n and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        if not self._active:
+            reset_peak_rss()
+            if tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+
+        rss = get_rss()
+        if self.baseline_rss is None:
+            self.baseline_rss = rss
+
+        self._active[job_id] = {
+            "rss": rss,
+            "blocks": sys.getallocatedblocks(),
+            "heap": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+            "snapshot": tracemalloc.take_snapshot() if top_n and tracemalloc.is_tracing() else None,
+            "top_n": top_n,
+        }
+
+    def stop(self, job_id: str) -> Dict[str, Any]:
+        """
+        Records the memory state after a job has run and returns the job's memory stats.
+        """
+        started = self._active.pop(job_id, None)
+        if started is None:
+            return {}
+
+        rss = get_rss()
+        self.growth_mb = _to_mb(rss - self.baseline_rss)
+
+        job_memory = {
+            "rss_start_mb": _to_mb(started["rss"]),
+            "rss_end_mb": _to_mb(rss),
+            "rss_delta_mb": _to_mb(rss - started["rss"]),
+            "rss_peak_mb": _to_mb(get_peak_rss()),
+            "rss_growth_mb": self.growth_mb,
+            "heap_blocks_delta": sys.getallocatedblocks() - started["blocks"],
+        }
+
+        if started["heap"] is not None and tracemalloc.is_tracing():
+            heap, heap_peak = tracemalloc.get_traced_memory()
+            job_memory["heap_delta_mb"] = _to_mb(heap - started["heap"])
+            job_memory["heap_peak_mb"] = _to_mb(heap_peak)
+
+        if started["snapshot"] is not None and tracemalloc.is_tracing():
+            job_memory["top_allocations"] = _top_allocations(
+                started["snapshot"], started["top_n"]
+            )
+
+        log.debug(
+            f"Memory | rss: {job_memory['rss_end_mb']} MB; "
+            f"delta: {job_memory['rss_delta_mb']} MB; "
+            f"growth: {self.growth_mb} MB",
+            job_id,
+        )
+        return job_memory
+
+    def exceeds(self, threshold_mb: Optional[float]) -> bool:
+        """
+        Returns True if the RSS growth since the first job crossed the threshold.
+        """
+        if not threshold_mb:
+            return False
+
+        return self.growth_mb > float(threshold_mb)
+
+
+def _top_allocations(start_snapshot, top_n: int) -> List[str]:
+    """
+    Returns the top N allocation differences since the start snapshot.
+    """
+    excluded = (tracemalloc.__file__, __file__)
+    stats = tracemalloc.take_snapshot().compare_to(start_snapshot, "lineno")
+
+    top_stats = []
+    for stat in stats:
+        if stat.traceback[0].filename in excluded:
+            continue
+        top_stats.append(str(stat))
+        if len(top_stats) == top_n:
+            break
+
+    return top_stats
+
+
+def get_memory_threshold(config: Dict[str, Any]) -> Optional[float]:
+    """
+    Returns the memory growth threshold (MB) after which the worker is recycled.
+    Set with config["refresh_worker_memory_mb"] or RUNPOD_REFRESH_WORKER_MEMORY_MB.
+    """
+    threshold = config.get(
+        "refresh_worker_memory_mb", os.environ.get("RUNPOD_REFRESH_WORKER_MEMORY_MB")
+    )
+    return float(threshold) if threshold else None
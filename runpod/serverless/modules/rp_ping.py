@@ -32,25 +32,38 @@ class Heartbeat:
         self.PING_URL = self.PING_URL.replace("$RUNPOD_POD_ID", WORKER_ID)
         self.PING_INTERVAL = int(os.environ.get("RUNPOD_PING_INTERVAL", 10000)) // 1000
 
-        self._session = SyncClientSession()
-        self._session.headers.update(
-            {"Authorization": f"{os.environ.get('RUNPOD_AI_API_KEY')}"}
-        )
-
-        retry_strategy = Retry(
-            total=retries,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["GET"],
-            backoff_factor=1,
-        )
-
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=pool_connections,
-            pool_maxsize=pool_connections,
-            max_retries=retry_strategy,
-        )
-        self._session.mount("http://", adapter)
-        self._session.mount("https://", adapter)
+        self._pool_connections = pool_connections
+        self._retries = retries
+        self._ping_session = None
+
+    @property
+    def _session(self) -> SyncClientSession:
+        """
+        The HTTP session used for pings, created on first use so that
+        constructing a Heartbeat at import time stays cheap.
+        """
+        if self._ping_session is None:
+            self._ping_session = SyncClientSession()
+            self._ping_session.headers.update(
+                {"Authorization": f"{os.environ.get('RUNPOD_AI_API_KEY')}"}
+            )
+
+            retry_strategy = Retry(
+                total=self._retries,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET"],
+                backoff_factor=1,
+            )
+
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self._pool_connections,
+                pool_maxsize=self._pool_connections,
+                max_retries=retry_strategy,
+            )
+            self._ping_session.mount("http://", adapter)
+            self._ping_session.mount("https://", adapter)
+
+        return self._ping_session
 
     def start_ping(self, test=False):
         """
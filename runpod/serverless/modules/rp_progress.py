@@ -4,26 +4,43 @@ RunPod Progress Module
 
 import asyncio
 import threading
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from runpod.http_client import AsyncClientSession
 from runpod.serverless.modules.rp_logger import RunPodLogger
 
 from .rp_http import send_result
+from .rp_transport import Transport
 
 log = RunPodLogger()
 
+# Transport of each job being run, set by rp_job.handle_job.
+_transports: Dict[str, Transport] = {}
 
-async def _async_progress_update(session, job, progress):
+
+def set_transport(job_id: str, transport: Transport) -> None:
+    _transports[job_id] = transport
+
+
+def release_transport(job_id: str) -> None:
+    _transports.pop(job_id, None)
+
+
+async def _async_progress_update(session, job, progress, transport=None):
     """
-    The actual asynchronous function that sends the update.
+    The actual asynchronous function that sends the update, through the transport of
+    the job, or to the job API when it has none.
     """
+    if transport is not None:
+        await transport.progress(session, job, progress)
+        return
+
     job_data = {"status": "IN_PROGRESS", "output": progress}
 
     await send_result(session, job_data, job)
 
 
-def _thread_target(job: Dict[str, Any], progress: Any):
+def _thread_target(job: Dict[str, Any], progress: Any, transport: Optional[Transport] = None):
     """
     A wrapper around _async_progress_update to handle the event loop.
     """
@@ -35,7 +52,7 @@ def _thread_target(job: Dict[str, Any], progress: Any):
         async def main():
             session = AsyncClientSession()
             async with session:
-                await _async_progress_update(session, job, progress)
+                await _async_progress_update(session, job, progress, transport)
 
         loop.run_until_complete(main())
 
@@ -49,5 +66,10 @@ def progress_update(job: Dict[str, Any], progress: Any) -> None:
     Updates the progress of a currently running job in a separate thread.
     """
     log.debug(f'{job["id"]} | Sending Progress Update: {progress}')
-    thread = threading.Thread(target=_thread_target, args=(job, progress), daemon=True)
+    thread = threading.Thread(
+        target=_thread_target,
+        args=(job, progress),
+        kwargs={"transport": _transports.get(job["id"])},
+        daemon=True,
+    )
     thread.start()
@@ -4,16 +4,50 @@ Provides the functionality for scaling the runpod serverless worker.
 """
 
 import asyncio
+import inspect
+import os
 import signal
-from typing import Any, Dict
+import time
+from functools import partial
+from typing import Any, Dict, List, Optional
 
 from ...http_client import AsyncClientSession, ClientSession, TooManyRequests
-from .rp_job import get_job, handle_job
+from . import rp_loop
+from .rp_backoff import get_backoff, get_jobs_fetcher_timeout, parse_retry_after
+from .rp_cancel import cancel_job, release_token, start_deadline
+from .rp_job import get_job, handle_job, http_transport
 from .rp_logger import RunPodLogger
+from .rp_telemetry import JobTelemetry, TelemetrySnapshot, accepts_telemetry
+from .rp_transport import Transport
 from .worker_state import JobsProgress, IS_LOCAL_TEST
 
 log = RunPodLogger()
 job_progress = JobsProgress()
+job_telemetry = JobTelemetry()
+
+# Seconds between checks for a shut down while backing off.
+BACKOFF_STEP = 0.1
+
+
+def get_parallel_job_takes(config: Dict[str, Any]) -> int:
+    """
+    Returns the number of job-take requests kept in flight at a time.
+    Set with config["parallel_job_takes"] or RUNPOD_PARALLEL_JOB_TAKES, 1 by default.
+    """
+    parallel = config.get("parallel_job_takes") or os.environ.get("RUNPOD_PARALLEL_JOB_TAKES")
+    return max(1, int(parallel)) if parallel else 1
+
+
+def get_shutdown_grace_period(config: Dict[str, Any]) -> Optional[float]:
+    """
+    Returns the seconds jobs in progress may take to finish once the worker is signalled
+    to shut down. Set with config["shutdown_grace_period"] or RUNPOD_SHUTDOWN_GRACE_PERIOD,
+    no limit by default.
+    """
+    grace_period = config.get("shutdown_grace_period")
+    if grace_period is None:
+        grace_period = os.environ.get("RUNPOD_SHUTDOWN_GRACE_PERIOD")
+    return float(grace_period) if grace_period not in (None, "") else None
 
 
 def _default_concurrency_modifier(current_concurrency: int) -> int:
@@ -34,9 +68,12 @@ def _default_concurrency_modifier(current_concurrency: int) -> int:
 class JobScaler:
     """
     Job Scaler. This class is responsible for scaling the number of concurrent requests.
+
+    Jobs are taken from and results sent to the job API, or to `transport` when given,
+    see rp_transport.
     """
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], transport: Optional[Transport] = None):
         self._shutdown_event = asyncio.Event()
         self.current_concurrency = 1
         self.config = config
@@ -45,42 +82,134 @@ class JobScaler:
 
         self.concurrency_modifier = _default_concurrency_modifier
         self.jobs_fetcher = get_job
-        self.jobs_fetcher_timeout = 90
+        self.jobs_fetcher_timeout = get_jobs_fetcher_timeout(config)
+        self.jobs_fetcher_backoff = get_backoff(config)
         self.jobs_handler = handle_job
 
+        # Batches from the job-take API are queued job by job while they are received.
+        self.stream_jobs = True
+
+        # get_job and handle_job are the job API transport, see rp_job.HTTPTransport.
+        self.transport = transport
+        if transport is not None:
+            self.jobs_fetcher = transport.acquire
+            self.jobs_handler = partial(handle_job, transport=transport)
+            self.stream_jobs = transport.streams_jobs
+
+        # Job-take requests kept in flight and the slots they have reserved.
+        self.parallel_job_takes = get_parallel_job_takes(config)
+        self._reserved = 0
+        self._acquiring = False
+
+        # Created by run(), inside the loop that awaits them.
+        self._capacity_changed: Optional[asyncio.Event] = None
+        self._jobs_queued: Optional[asyncio.Event] = None
+
+        # Drain mode, entered when the worker is signalled to shut down.
+        self.shutdown_grace_period = get_shutdown_grace_period(config)
+        self._draining = False
+        self._drain_deadline: Optional[float] = None
+
+        # Number of jobs to take before the worker stops, used by the fork-server.
+        self.jobs_limit = None
+        self.jobs_taken = 0
+        self.jobs_handled = 0
+
         if concurrency_modifier := config.get("concurrency_modifier"):
             self.concurrency_modifier = concurrency_modifier
 
+        # Set when the worker starts, from the signature of the concurrency modifier.
+        self._modifier_is_async = False
+        self._modifier_telemetry = False
+        self._target_concurrency = None
+        self.concurrency_modifier_interval = float(
+            config.get("concurrency_modifier_interval")
+            or os.environ.get("RUNPOD_CONCURRENCY_MODIFIER_INTERVAL", 1.0)
+        )
+
         if not IS_LOCAL_TEST:
             # below cannot be changed unless local
             return
 
         if jobs_fetcher := self.config.get("jobs_fetcher"):
             self.jobs_fetcher = jobs_fetcher
-
-        if jobs_fetcher_timeout := self.config.get("jobs_fetcher_timeout"):
-            self.jobs_fetcher_timeout = jobs_fetcher_timeout
+            self.stream_jobs = False
 
         if jobs_handler := self.config.get("jobs_handler"):
             self.jobs_handler = jobs_handler
 
     async def set_scale(self):
-        self.current_concurrency = self.concurrency_modifier(self.current_concurrency)
-
-        if self.jobs_queue and (self.current_concurrency == self.jobs_queue.maxsize):
-            # no need to resize
+        concurrency = self._modified_concurrency()
+
+        # Jobs in progress and job-take requests in flight keep running, the worker
+        # takes no new jobs while it is above the new concurrency.
+        if concurrency != self.current_concurrency:
+            self.current_concurrency = concurrency
+            log.debug(
+                f"JobScaler.set_scale | New concurrency set to: {self.current_concurrency}"
+            )
+
+        if self._reserved or concurrency == self.jobs_queue.maxsize:
+            # A request in flight may be waiting to put a job in the queue, it is
+            # resized once none is.
             return
 
-        while self.current_occupancy() > 0:
-            # not safe to scale when jobs are in flight
-            await asyncio.sleep(1)
-            continue
+        # Queued jobs are moved to the resized queue.
+        queued = []
+        while not self.jobs_queue.empty():
+            queued.append(self.jobs_queue.get_nowait())
 
-        self.jobs_queue = asyncio.Queue(maxsize=self.current_concurrency)
-        log.debug(
-            f"JobScaler.set_scale | New concurrency set to: {self.current_concurrency}"
+        self.jobs_queue = asyncio.Queue(maxsize=max(concurrency, len(queued)))
+        for job in queued:
+            self.jobs_queue.put_nowait(job)
+
+    def telemetry(self) -> TelemetrySnapshot:
+        """
+        Returns a snapshot of the load of the worker.
+        """
+        queue_depth = self.jobs_queue.qsize()
+        return job_telemetry.snapshot(
+            concurrency=self.current_concurrency,
+            queue_depth=queue_depth,
+            in_flight=job_progress.get_job_count() - queue_depth,
         )
 
+    def _modifier_kwargs(self) -> Dict[str, Any]:
+        if self._modifier_telemetry:
+            return {"telemetry": self.telemetry()}
+        return {}
+
+    def _modified_concurrency(self) -> int:
+        """
+        Concurrency asked for by the concurrency modifier. Async modifiers are evaluated
+        on their own timer, the last value they returned is used.
+        """
+        if self._modifier_is_async:
+            if self._target_concurrency is None:
+                return self.current_concurrency
+            return self._target_concurrency
+
+        return self.concurrency_modifier(self.current_concurrency, **self._modifier_kwargs())
+
+    async def _update_target_concurrency(self):
+        try:
+            self._target_concurrency = await self.concurrency_modifier(self.current_concurrency, **self._modifier_kwargs())
+        except Exception as error:  # pylint: disable=broad-except
+            log.error(f"JobScaler.concurrency_modifier | Error: {error}")
+            return
+
+        if self._target_concurrency != self.current_concurrency:
+            self._capacity_changed.set()
+
+    async def _run_async_modifier(self):
+        """
+        Evaluates an async concurrency modifier every `concurrency_modifier_interval` seconds.
+        """
+        while self.is_alive():
+            await self._backoff(self.concurrency_modifier_interval)
+            if self.is_alive():
+                await self._update_target_concurrency()
+
     def start(self):
         """
         This is required for the worker to be able to shut down gracefully
@@ -92,11 +221,11 @@ class JobScaler:
             signal.signal(signal.SIGTERM, self.handle_shutdown)
             signal.signal(signal.SIGINT, self.handle_shutdown)
         except ValueError:
-            log.warning("Signal handling is only supported in the main thread.")
+            log.warn("Signal handling is only supported in the main thread.")
 
-        # Start the main loop
+        # Start the main loop, on uvloop if RUNPOD_EVENT_LOOP asks for it.
         # Run forever until the worker is signalled to shut down.
-        asyncio.run(self.run())
+        rp_loop.run(self.run())
 
     def handle_shutdown(self, signum, frame):
         """
@@ -111,19 +240,55 @@ class JobScaler:
             frame: The current stack frame.
         """
         log.debug(f"Received shutdown signal: {signum}.")
+        self.drain()
+
+    def drain(self):
+        """
+        Shuts the worker down gracefully.
+
+        Stops taking jobs, releases the jobs that were taken but not started, gives the
+        jobs in progress `shutdown_grace_period` seconds to finish, cancels the rest and
+        sends their results before the worker exits.
+        """
+        if not self._draining:
+            self._draining = True
+            if self.shutdown_grace_period is not None:
+                self._drain_deadline = time.monotonic() + self.shutdown_grace_period
+
+        log.info("Draining worker.")
         self.kill_worker()
 
     async def run(self):
-        # Create an async session that will be closed when the worker is killed.
-        async with AsyncClientSession() as session:
-            # Create tasks for getting and running jobs.
-            jobtake_task = asyncio.create_task(self.get_jobs(session))
-            jobrun_task = asyncio.create_task(self.run_jobs(session))
+        self._capacity_changed = asyncio.Event()
+        self._jobs_queued = asyncio.Event()
+        if not self.is_alive():
+            self._jobs_queued.set()
+
+        self._modifier_is_async = inspect.iscoroutinefunction(self.concurrency_modifier)
+        self._modifier_telemetry = accepts_telemetry(self.concurrency_modifier)
+
+        background = []
+        if self._modifier_telemetry:
+            background.append(asyncio.create_task(job_telemetry.monitor_loop_lag()))
+        if self._modifier_is_async:
+            await self._update_target_concurrency()
+            background.append(asyncio.create_task(self._run_async_modifier()))
+
+        try:
+            # Create an async session that will be closed when the worker is killed.
+            async with AsyncClientSession() as session:
+                # Create tasks for getting and running jobs.
+                jobtake_task = asyncio.create_task(self.get_jobs(session))
+                jobrun_task = asyncio.create_task(self.run_jobs(session))
 
-            tasks = [jobtake_task, jobrun_task]
+                tasks = [jobtake_task, jobrun_task]
 
-            # Concurrently run both tasks and wait for both to finish.
-            await asyncio.gather(*tasks)
+                # Concurrently run both tasks and wait for both to finish.
+                await asyncio.gather(*tasks)
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
 
     def is_alive(self):
         """
@@ -137,6 +302,8 @@ class JobScaler:
         """
         log.info("Kill worker.")
         self._shutdown_event.set()
+        if self._jobs_queued is not None:
+            self._jobs_queued.set()
 
     def current_occupancy(self) -> int:
         current_queue_count = self.jobs_queue.qsize()
@@ -147,72 +314,177 @@ class JobScaler:
         )
         return current_progress_count + current_queue_count
 
+    def _free_slots(self) -> int:
+        """
+        Number of jobs that can be requested without exceeding the concurrency,
+        counting the jobs reserved by job-take requests in flight.
+        """
+        free = self.current_concurrency - self.current_occupancy() - self._reserved
+        if self.jobs_limit:
+            free = min(free, self.jobs_limit - self.jobs_taken - self._reserved)
+        return free
+
+    def _plan_fetches(self, in_flight: int) -> List[int]:
+        """
+        Splits the free slots between the job-take requests that can be started.
+
+        At most `parallel_job_takes` requests are in flight at a time. While a request is
+        in flight another one is only started for at least its share of the concurrency,
+        so that a burst of finished jobs is not taken back one request per job.
+        """
+        free = self._free_slots()
+        available = self.parallel_job_takes - in_flight
+        if free <= 0 or available <= 0:
+            return []
+
+        share = -(-self.current_concurrency // self.parallel_job_takes)  # ceil
+        if in_flight and free < share:
+            return []
+
+        requests = min(available, max(1, free // share))
+        size, extra = divmod(free, requests)
+        return [size + (1 if index < extra else 0) for index in range(requests)]
+
     async def get_jobs(self, session: ClientSession):
         """
         Retrieve multiple jobs from the server in batches using blocking requests.
 
         Runs the block in an infinite loop while the worker is alive.
+        Up to `parallel_job_takes` requests are kept in flight, each one reserves its
+        share of the free slots so that the worker never takes more jobs than it can run.
 
         Adds jobs to the JobsQueue
         """
+        fetches = set()
+        self._acquiring = True
+
         while self.is_alive():
+            # A lower concurrency stops new requests without waiting for those in flight.
             await self.set_scale()
+            self._capacity_changed.clear()
 
-            jobs_needed = self.current_concurrency - self.current_occupancy()
-            if jobs_needed <= 0:
-                log.debug("JobScaler.get_jobs | Queue is full. Retrying soon.")
-                await asyncio.sleep(1)  # don't go rapidly
-                continue
+            for count in self._plan_fetches(len(fetches)):
+                self._reserved += count
+                fetches.add(asyncio.create_task(self._fetch_jobs(session, count)))
 
-            try:
-                log.debug("JobScaler.get_jobs | Starting job acquisition.")
+            if not fetches:
+                log.debug("JobScaler.get_jobs | Queue is full. Waiting for a free slot.")
 
-                # Keep the connection to the blocking call with timeout
-                acquired_jobs = await asyncio.wait_for(
-                    self.jobs_fetcher(session, jobs_needed),
-                    timeout=self.jobs_fetcher_timeout,
-                )
+            # Wait for a request to finish or a job to free its slot.
+            capacity_changed = asyncio.ensure_future(self._capacity_changed.wait())
+            done, _ = await asyncio.wait(
+                [*fetches, capacity_changed], timeout=1, return_when=asyncio.FIRST_COMPLETED
+            )
+            capacity_changed.cancel()
 
-                if not acquired_jobs:
-                    log.debug("JobScaler.get_jobs | No jobs acquired.")
-                    continue
+            for fetch in done - {capacity_changed}:
+                fetches.discard(fetch)
+                fetch.result()
 
-                for job in acquired_jobs:
-                    await self.jobs_queue.put(job)
-                    job_progress.add(job)
-                    log.debug("Job Queued", job["id"])
+        # Jobs taken by requests still in flight are run before the worker stops,
+        # unless it is draining.
+        if self._draining:
+            for fetch in fetches:
+                fetch.cancel()
 
-                log.info(f"Jobs in queue: {self.jobs_queue.qsize()}")
+        try:
+            await asyncio.gather(*fetches, return_exceptions=self._draining)
+        finally:
+            self._acquiring = False
+            self._jobs_queued.set()
 
-            except TooManyRequests:
-                log.debug(
-                    f"JobScaler.get_jobs | Too many requests. Debounce for 5 seconds."
-                )
-                await asyncio.sleep(5)  # debounce for 5 seconds
-            except asyncio.CancelledError:
-                log.debug("JobScaler.get_jobs | Request was cancelled.")
-                raise  # CancelledError is a BaseException
-            except TimeoutError:
-                log.debug("JobScaler.get_jobs | Job acquisition timed out. Retrying.")
-            except TypeError as error:
-                log.debug(f"JobScaler.get_jobs | Unexpected error: {error}.")
-            except Exception as error:
-                log.error(
-                    f"Failed to get job. | Error Type: {type(error).__name__} | Error Message: {str(error)}"
-                )
-            finally:
-                # Yield control back to the event loop
-                await asyncio.sleep(0)
+    async def _fetch_jobs(self, session: ClientSession, count: int):
+        """
+        Takes up to `count` jobs, for which slots have been reserved, and queues them.
+        """
+        try:
+            log.debug(f"JobScaler.get_jobs | Starting acquisition of {count} job(s).")
+
+            jobs_taken = self.jobs_taken
+            if self.stream_jobs:
+                fetch = self.jobs_fetcher(session, count, on_job=self._queue_job)
+            else:
+                fetch = self.jobs_fetcher(session, count)
+
+            # Keep the connection to the blocking call with timeout
+            acquired_jobs = await asyncio.wait_for(fetch, timeout=self.jobs_fetcher_timeout)
+
+            self.jobs_fetcher_backoff.reset()
+
+            for job in acquired_jobs or []:
+                await self._queue_job(job)
+
+            if self.jobs_taken == jobs_taken:
+                log.debug("JobScaler.get_jobs | No jobs acquired.")
+                return
+
+            log.info(f"Jobs in queue: {self.jobs_queue.qsize()}")
+
+        except TooManyRequests as error:
+            retry_after = parse_retry_after((error.headers or {}).get("Retry-After"))
+            delay = self.jobs_fetcher_backoff.next_delay(retry_after)
+            log.debug(
+                f"JobScaler.get_jobs | Too many requests. Backing off for {delay:.2f} seconds."
+            )
+            await self._backoff(delay)
+        except asyncio.CancelledError:
+            log.debug("JobScaler.get_jobs | Request was cancelled.")
+            raise  # CancelledError is a BaseException
+        except asyncio.TimeoutError:
+            log.debug("JobScaler.get_jobs | Job acquisition timed out. Retrying.")
+        except TypeError as error:
+            log.debug(f"JobScaler.get_jobs | Unexpected error: {error}.")
+        except Exception as error:
+            delay = self.jobs_fetcher_backoff.next_delay()
+            log.error(
+                f"Failed to get job. | Error Type: {type(error).__name__} | Error Message: {str(error)}"
+                f" | Retrying in {delay:.2f} seconds."
+            )
+            await self._backoff(delay)
+        finally:
+            self._reserved -= count
+            self._capacity_changed.set()
+
+    async def _queue_job(self, job: Dict[str, Any]):
+        """
+        Adds a taken job to the jobs queue and wakes up the job runner.
+        """
+        self.jobs_taken += 1
+        start_deadline(job, self.config)
+        await self.jobs_queue.put(job)
+        job_progress.add(job)
+        log.debug("Job Queued", job["id"])
+        if self._jobs_queued is not None:
+            self._jobs_queued.set()
+
+    async def _backoff(self, delay: float):
+        """
+        Waits before the next job acquisition, returns early if the worker is shut down.
+
+        Sleeps in short steps rather than waiting on the shutdown event, which was created
+        outside the running loop and cannot be awaited in it on Python < 3.10.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + delay
+        while self.is_alive():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, BACKOFF_STEP))
 
     async def run_jobs(self, session: ClientSession):
         """
         Retrieve jobs from the jobs queue and process them concurrently.
 
-        Runs the block in an infinite loop while the worker is alive or jobs queue is not empty.
+        Runs the block in an infinite loop while the worker is alive, job-take requests
+        are in flight or the jobs queue is not empty.
         """
         tasks = []  # Store the tasks for concurrent job processing
 
-        while self.is_alive() or not self.jobs_queue.empty():
+        while self.is_alive() or self._acquiring or not self.jobs_queue.empty():
+            if self._draining:
+                await self._release_queued_jobs(session)
+
             # Fetch as many jobs as the concurrency allows
             while len(tasks) < self.current_concurrency and not self.jobs_queue.empty():
                 job = await self.jobs_queue.get()
@@ -221,23 +493,76 @@ class JobScaler:
                 task = asyncio.create_task(self.handle_job(session, job))
                 tasks.append(task)
 
-            # Wait for any job to finish
-            if tasks:
-                log.info(f"Jobs in progress: {len(tasks)}")
+            # Wait for any job to finish or to be queued
+            self._jobs_queued.clear()
+            if self.jobs_queue.empty() and (self.is_alive() or self._acquiring):
+                if tasks:
+                    log.info(f"Jobs in progress: {len(tasks)}")
 
+                jobs_queued = asyncio.ensure_future(self._jobs_queued.wait())
                 done, pending = await asyncio.wait(
-                    tasks, return_when=asyncio.FIRST_COMPLETED
+                    [*tasks, jobs_queued], return_when=asyncio.FIRST_COMPLETED
                 )
+                jobs_queued.cancel()
 
                 # Remove completed tasks from the list
                 tasks = [t for t in tasks if t not in done]
 
-            # Yield control back to the event loop
-            await asyncio.sleep(0)
+            elif len(tasks) >= self.current_concurrency and not self.jobs_queue.empty():
+                log.info(f"Jobs in progress: {len(tasks)}")
+
+                # Also wake up on a shut down, queued jobs are released when draining.
+                waiters = list(tasks)
+                if self.is_alive() or self._acquiring:
+                    waiters.append(asyncio.ensure_future(self._jobs_queued.wait()))
+
+                done, pending = await asyncio.wait(
+                    waiters, return_when=asyncio.FIRST_COMPLETED
+                )
+                if len(waiters) > len(tasks):
+                    waiters[-1].cancel()
+
+                # Remove completed tasks from the list
+                tasks = [t for t in tasks if t not in done]
 
         # Ensure all remaining tasks finish before stopping
+        if tasks and self._drain_deadline is not None:
+            timeout = max(0.0, self._drain_deadline - time.monotonic())
+            await asyncio.wait(tasks, timeout=timeout)
+
+            # Jobs still running after the grace period are cancelled and report an error.
+            for job in list(job_progress):
+                log.info("Grace period is over, cancelling job.", job.id)
+                cancel_job(job.id, "Worker is shutting down.")
+
         await asyncio.gather(*tasks)
 
+    async def _release_queued_jobs(self, session: ClientSession):
+        """
+        Drops the jobs that were taken but not started and gives them back through the
+        transport, see Transport.release. With the job API they are no longer reported
+        as in progress and are handed out again.
+        """
+        transport = self.transport or http_transport
+
+        # Job-take requests still in flight can queue more jobs while they are released.
+        while not self.jobs_queue.empty():
+            released = []
+            while not self.jobs_queue.empty():
+                job = self.jobs_queue.get_nowait()
+                job_progress.remove(job)
+                release_token(job["id"])
+                released.append(job)
+                log.info("Released job, the worker is shutting down.", job["id"])
+
+            results = await asyncio.gather(
+                *(transport.release(session, job) for job in released),
+                return_exceptions=True,
+            )
+            for job, result in zip(released, results):
+                if isinstance(result, Exception):
+                    log.error(f"Failed to release the job: {result}", job["id"])
+
     async def handle_job(self, session: ClientSession, job: dict):
         """
         Process an individual job. This function is run concurrently for multiple jobs.
@@ -245,9 +570,14 @@ class JobScaler:
         try:
             log.debug("Handling Job", job["id"])
 
-            await self.jobs_handler(session, self.config, job)
+            refresh_worker = await self.jobs_handler(session, self.config, job)
+            self.jobs_handled += 1
 
-            if self.config.get("refresh_worker", False):
+            if self.config.get("refresh_worker", False) or refresh_worker:
+                self.kill_worker()
+
+            elif self.jobs_limit and self.jobs_handled >= self.jobs_limit:
+                log.debug(f"JobScaler.handle_job | Job limit of {self.jobs_limit} reached.")
                 self.kill_worker()
 
         except Exception as err:
@@ -255,10 +585,9 @@ class JobScaler:
             raise err
 
         finally:
-            # Inform Queue of a task completion
-            self.jobs_queue.task_done()
-
             # Job is no longer in progress
             job_progress.remove(job)
+            release_token(job["id"])
+            self._capacity_changed.set()
 
             log.debug("Finished Job", job["id"])
@@ -0,0 +1,270 @@
+"""
+runpod | serverless | rp_sls_local.py
+Pure-Python stand-ins for the sls_core.so Hook, to test and benchmark the sls-core
+worker without the compiled library.
+
+    hook = LocalHook([{"id": "job-1", "input": {}}])
+    await core.run(config, hook=hook)
+"""
+
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+from .rp_logger import RunPodLogger
+
+log = RunPodLogger()
+
+
+class SlsLocalError(Exception):
+    """
+    Raised by an HTTPHook when the job API answers with an error.
+    """
+
+
+class _BaseHook(ABC):
+    """
+    The interface of core.Hook. All calls block, like the ctypes calls of sls_core.so,
+    and are made from the threads of core.AsyncHook.
+    """
+
+    rust_crate_version = "python"
+
+    def _json_serialize_job_data(self, job_data: Any) -> bytes:
+        return json.dumps(job_data, ensure_ascii=False).encode("utf-8")
+
+    @abstractmethod
+    def get_jobs(self, max_concurrency: int, max_jobs: int) -> List[Dict[str, Any]]:
+        """
+        Takes up to `max_jobs` jobs, [] when there are none.
+        """
+
+    @abstractmethod
+    def progress_update(self, job_id: str, json_data: bytes) -> bool:
+        """
+        Sends a progress update of a job, already JSON encoded.
+        """
+
+    async def stream_output(self, job_id: str, job_output: Any) -> bool:
+        return self.send_stream_output(job_id, job_output)
+
+    @abstractmethod
+    def send_stream_output(self, job_id: str, job_output: Any) -> bool:
+        """
+        Sends one output of a generator handler.
+        """
+
+    @abstractmethod
+    def post_output(self, job_id: str, job_output: Any) -> bool:
+        """
+        Sends the result of a job.
+        """
+
+    @abstractmethod
+    def finish_stream(self, job_id: str) -> bool:
+        """
+        Marks the stream of a generator job as complete.
+        """
+
+
+class LocalHook(_BaseHook):
+    """
+    Hands out jobs from an in-process queue and keeps what the worker sends back.
+
+    Like sls_core, at most `max_concurrency` jobs are in progress at a time, a job is
+    in progress from get_jobs until its output is posted. Outputs are JSON encoded and
+    decoded again, so what cannot be sent by sls_core fails here too.
+
+    Args:
+        jobs (Iterable): Jobs to hand out, more can be added with add_jobs.
+        wait (float): Seconds get_jobs waits for a job when there is none, like the
+            long poll of the job API. Returns at once by default.
+    """
+
+    def __init__(self, jobs: Iterable[Dict[str, Any]] = (), wait: float = 0.0) -> None:
+        self.wait = wait
+
+        self.outputs: Dict[str, Any] = {}
+        self.streams: Dict[str, List[Any]] = {}
+        self.progress: Dict[str, List[Any]] = {}
+        self.finished_streams = set()
+
+        self._jobs = deque()
+        self._in_progress = set()
+        self._condition = threading.Condition()
+        self.add_jobs(jobs)
+
+    def add_jobs(self, jobs: Iterable[Dict[str, Any]]) -> None:
+        with self._condition:
+            self._jobs.extend(jobs)
+            self._condition.notify_all()
+
+    @property
+    def jobs_left(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def in_progress(self) -> int:
+        return len(self._in_progress)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every job has been handed out and its output posted.
+        Returns False if the timeout passed first.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._jobs and not self._in_progress, timeout
+            )
+
+    def get_jobs(self, max_concurrency: int, max_jobs: int) -> List[Dict[str, Any]]:
+        with self._condition:
+            if not self._jobs and self.wait:
+                self._condition.wait_for(lambda: self._jobs, self.wait)
+
+            count = min(max_jobs, max_concurrency - len(self._in_progress), len(self._jobs))
+            jobs = [self._jobs.popleft() for _ in range(max(count, 0))]
+            self._in_progress.update(job["id"] for job in jobs)
+            return jobs
+
+    def _decode(self, job_output: Any) -> Any:
+        return json.loads(self._json_serialize_job_data(job_output))
+
+    def progress_update(self, job_id: str, json_data: bytes) -> bool:
+        self.progress.setdefault(job_id, []).append(json.loads(json_data))
+        return True
+
+    def send_stream_output(self, job_id: str, job_output: Any) -> bool:
+        self.streams.setdefault(job_id, []).append(self._decode(job_output))
+        return True
+
+    def post_output(self, job_id: str, job_output: Any) -> bool:
+        output = self._decode(job_output)
+        with self._condition:
+            self.outputs[job_id] = output
+            self._in_progress.discard(job_id)
+            self._condition.notify_all()
+        return True
+
+    def finish_stream(self, job_id: str) -> bool:
+        self.finished_streams.add(job_id)
+        return True
+
+
+class HTTPHook(_BaseHook):
+    """
+    Takes jobs from and returns results to a job API over HTTP, like sls_core does.
+
+    The URLs are templates like those of the standard worker, $ID is replaced with the
+    worker ID in the job-take URL and with the job ID in the others, $RUNPOD_POD_ID with
+    the worker ID. By default they are read from RUNPOD_WEBHOOK_GET_JOB,
+    RUNPOD_WEBHOOK_POST_OUTPUT and RUNPOD_WEBHOOK_POST_STREAM.
+
+    Args:
+        job_take_url (str): The job-take URL, job-take-batch is used for more than one job.
+        job_done_url (str): The job-done URL.
+        job_stream_url (str): The stream URL.
+        worker_id (str): The worker ID, RUNPOD_POD_ID by default.
+        timeout (float): Seconds to wait for each request.
+    """
+
+    def __init__(
+        self,
+        job_take_url: Optional[str] = None,
+        job_done_url: Optional[str] = None,
+        job_stream_url: Optional[str] = None,
+        worker_id: Optional[str] = None,
+        timeout: float = 30,
+    ) -> None:
+        worker_id = worker_id or os.environ.get("RUNPOD_POD_ID", "local")
+        job_take_url = job_take_url or os.environ["RUNPOD_WEBHOOK_GET_JOB"]
+        job_done_url = job_done_url or os.environ["RUNPOD_WEBHOOK_POST_OUTPUT"]
+        job_stream_url = job_stream_url or os.environ["RUNPOD_WEBHOOK_POST_STREAM"]
+
+        self.job_take_url = job_take_url.replace("$ID", worker_id)
+        self.job_done_url = job_done_url.replace("$RUNPOD_POD_ID", worker_id)
+        self.job_stream_url = job_stream_url.replace("$RUNPOD_POD_ID", worker_id)
+        self.timeout = timeout
+
+        # requests.Session is not thread safe, each AsyncHook thread has its own.
+        self._local = threading.local()
+        self._in_progress = set()
+        self._streamed = set()
+
+    @property
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _job_take_url(self, max_jobs: int) -> str:
+        job_in_progress = "1" if self._in_progress else "0"
+        if max_jobs > 1:
+            url = self.job_take_url.replace("/job-take/", "/job-take-batch/")
+            return f"{url}&batch_size={max_jobs}&job_in_progress={job_in_progress}"
+        return f"{self.job_take_url}&job_in_progress={job_in_progress}"
+
+    def get_jobs(self, max_concurrency: int, max_jobs: int) -> List[Dict[str, Any]]:
+        max_jobs = min(max_jobs, max_concurrency - len(self._in_progress))
+        if max_jobs <= 0:
+            return []
+
+        response = self._session.get(self._job_take_url(max_jobs), timeout=self.timeout)
+        if response.status_code in (204, 400) or not response.content:
+            return []
+        if not response.ok:
+            raise SlsLocalError(f"job-take: status code {response.status_code}: {response.text}")
+
+        jobs = response.json()
+        jobs = [jobs] if isinstance(jobs, dict) else list(jobs)
+        self._in_progress.update(job["id"] for job in jobs)
+        return jobs
+
+    def _post(self, url_template: str, job_id: str, body: bytes, is_stream: bool) -> bool:
+        url = url_template.replace("$ID", job_id) + f"&isStream={str(is_stream).lower()}"
+        try:
+            response = self._session.post(
+                url,
+                data=body,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as err:
+            log.error(f"SLS Local | Failed to send output: {err}", job_id)
+            return False
+        return response.ok
+
+    def progress_update(self, job_id: str, json_data: bytes) -> bool:
+        body = self._json_serialize_job_data(
+            {"status": "IN_PROGRESS", "output": json.loads(json_data)}
+        )
+        return self._post(self.job_done_url, job_id, body, is_stream=False)
+
+    def send_stream_output(self, job_id: str, job_output: Any) -> bool:
+        self._streamed.add(job_id)
+        return self._post(
+            self.job_stream_url, job_id, self._json_serialize_job_data(job_output), False
+        )
+
+    def post_output(self, job_id: str, job_output: Any) -> bool:
+        # core posts the output of a job, or {"error": ...} when it failed.
+        if not (isinstance(job_output, dict) and set(job_output) == {"error"}):
+            job_output = {"output": job_output}
+
+        is_stream = job_id in self._streamed
+        self._streamed.discard(job_id)
+        try:
+            return self._post(
+                self.job_done_url, job_id, self._json_serialize_job_data(job_output), is_stream
+            )
+        finally:
+            self._in_progress.discard(job_id)
+
+    def finish_stream(self, job_id: str) -> bool:
+        return True
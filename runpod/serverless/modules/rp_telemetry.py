@@ -0,0 +1,117 @@
+"""
+runpod | serverless | rp_telemetry.py
+Load telemetry of the worker, passed to concurrency modifiers that ask for it.
+"""
+
+import asyncio
+import inspect
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .rp_memory import MB, get_rss
+
+
+@dataclass(frozen=True)
+class TelemetrySnapshot:
+    """
+    Load of the worker at one point in time.
+
+    Latencies and the error rate cover the last `window` jobs, the CPU usage is
+    measured since the previous snapshot and the event loop lag is the largest
+    one seen since the previous snapshot.
+    """
+
+    concurrency: int
+    queue_depth: int
+    in_flight: int
+    jobs_completed: int
+    latency_p50_ms: Optional[float]
+    latency_p90_ms: Optional[float]
+    latency_p99_ms: Optional[float]
+    error_rate: float
+    loop_lag_ms: float
+    cpu_percent: float
+    rss_mb: float
+
+
+def _percentile(ordered, percent: float) -> Optional[float]:
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return round(ordered[rank] * 1000, 3)
+
+
+class JobTelemetry:
+    """
+    Singleton that records recent job latencies and errors and samples the
+    event loop lag, CPU and memory usage of the process.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if JobTelemetry._instance is None:
+            JobTelemetry._instance = object.__new__(cls)
+            JobTelemetry._instance.clear()
+        return JobTelemetry._instance
+
+    def clear(self, window: int = 100) -> None:
+        self._jobs = deque(maxlen=window)  # (duration in seconds, failed)
+        self._jobs_completed = 0
+        self._loop_lag = 0.0
+        self._cpu_time = time.process_time()
+        self._wall_time = time.perf_counter()
+
+    def record_job(self, duration: float, failed: bool = False) -> None:
+        self._jobs.append((duration, failed))
+        self._jobs_completed += 1
+
+    async def monitor_loop_lag(self, interval: float = 0.25) -> None:
+        """
+        Measures how late the event loop wakes up from a sleep, runs until cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            self._loop_lag = max(self._loop_lag, loop.time() - start - interval)
+
+    def snapshot(self, concurrency: int, queue_depth: int, in_flight: int) -> TelemetrySnapshot:
+        cpu_time, wall_time = time.process_time(), time.perf_counter()
+        elapsed = wall_time - self._wall_time
+        cpu_percent = (cpu_time - self._cpu_time) / elapsed * 100 if elapsed > 0 else 0.0
+        self._cpu_time, self._wall_time = cpu_time, wall_time
+
+        loop_lag, self._loop_lag = self._loop_lag, 0.0
+
+        durations = sorted(duration for duration, _ in self._jobs)
+        errors = sum(1 for _, failed in self._jobs if failed)
+
+        return TelemetrySnapshot(
+            concurrency=concurrency,
+            queue_depth=queue_depth,
+            in_flight=in_flight,
+            jobs_completed=self._jobs_completed,
+            latency_p50_ms=_percentile(durations, 50),
+            latency_p90_ms=_percentile(durations, 90),
+            latency_p99_ms=_percentile(durations, 99),
+            error_rate=round(errors / len(self._jobs), 4) if self._jobs else 0.0,
+            loop_lag_ms=round(loop_lag * 1000, 3),
+            cpu_percent=round(cpu_percent, 1),
+            rss_mb=round(get_rss() / MB, 2),
+        )
+
+
+def accepts_telemetry(modifier: Callable) -> bool:
+    """
+    Whether a concurrency modifier asks for a TelemetrySnapshot with a keyword-only
+    `telemetry` parameter, `modifier(current_concurrency, *, telemetry)`.
+    """
+    try:
+        parameter = inspect.signature(modifier).parameters.get("telemetry")
+    except (TypeError, ValueError):
+        return False
+
+    return parameter is not None and parameter.kind == inspect.Parameter.KEYWORD_ONLY
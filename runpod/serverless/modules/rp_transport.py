@@ -0,0 +1,167 @@
+"""
+runpod | serverless | rp_transport.py
+Where the worker takes its jobs from and sends their results to.
+
+The JobScaler schedules jobs and rp_job.handle_job runs them, whichever transport is
+used. The transports are:
+    - rp_job.HTTPTransport, the job API over aiohttp, used by default.
+    - core.SlsTransport, sls_core.so or a stand-in from rp_sls_local.
+    - InMemoryTransport, an in-process queue for tests and benchmarks.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from runpod.http_client import ClientSession
+
+OnJob = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+# Result of a released job, for transports that have to finish it to let it go.
+RELEASED_JOB_ERROR = "Worker is shutting down, the job was not started."
+
+
+class Transport(ABC):
+    """
+    Interface of a transport.
+
+    Every call gets the aiohttp session of the worker first, transports that do not
+    use HTTP ignore it.
+    """
+
+    # Whether acquire accepts `on_job`, to hand over the jobs of a batch as they arrive.
+    streams_jobs = False
+
+    @abstractmethod
+    async def acquire(
+        self, session: ClientSession, num_jobs: int, on_job: Optional[OnJob] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Takes up to `num_jobs` jobs. Returns None or an empty list when there are none.
+        """
+
+    @abstractmethod
+    async def stream(self, session: ClientSession, job: Dict[str, Any], output: Any) -> None:
+        """
+        Sends one output of a generator handler, {"output": ...}.
+        """
+
+    async def finish_stream(self, session: ClientSession, job: Dict[str, Any]) -> None:
+        """
+        Called once a generator handler is done, before its result is posted.
+        """
+
+    @abstractmethod
+    async def post(
+        self,
+        session: ClientSession,
+        job: Dict[str, Any],
+        result: Dict[str, Any],
+        is_stream: bool = False,
+    ) -> None:
+        """
+        Sends the result of a job, {"output": ...} or {"error": ...}.
+        """
+
+    @abstractmethod
+    async def progress(self, session: ClientSession, job: Dict[str, Any], progress: Any) -> None:
+        """
+        Sends a progress update of a job in progress.
+        """
+
+    async def release(self, session: ClientSession, job: Dict[str, Any]) -> None:
+        """
+        Gives back a job that was taken but not started, when the worker shuts down.
+
+        Nothing is sent by default: the job API hands out again a job that the worker
+        no longer reports as in progress.
+        """
+
+    def close(self) -> None:
+        """
+        Releases the resources of the transport once the worker has stopped.
+        """
+
+
+class InMemoryTransport(Transport):
+    """
+    Hands out jobs from an in-process queue and keeps what the worker sends back.
+
+    Args:
+        jobs (Iterable): Jobs to hand out, more can be added with add_jobs.
+        wait (float): Seconds acquire waits for a job when there is none, like the
+            long poll of the job API. Returns at once by default.
+    """
+
+    def __init__(self, jobs: Iterable[Dict[str, Any]] = (), wait: float = 0.0) -> None:
+        self.wait = wait
+
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.streams: Dict[str, List[Any]] = {}
+        self.progress_updates: Dict[str, List[Any]] = {}
+        self.finished_streams = set()
+
+        self._jobs = deque(jobs)
+        self._in_progress = set()
+        self._changed: Optional[asyncio.Condition] = None
+
+    @property
+    def _condition(self) -> asyncio.Condition:
+        # Created on first use, inside the event loop of the worker.
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    async def _notify(self) -> None:
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def add_jobs(self, jobs: Iterable[Dict[str, Any]]) -> None:
+        self._jobs.extend(jobs)
+        await self._notify()
+
+    @property
+    def jobs_left(self) -> int:
+        return len(self._jobs)
+
+    async def join(self) -> None:
+        """
+        Waits until every job has been handed out and its result posted.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._jobs and not self._in_progress)
+
+    async def acquire(self, session, num_jobs, on_job=None):
+        if not self._jobs and self.wait:
+            try:
+                async with self._condition:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self._jobs), self.wait
+                    )
+            except asyncio.TimeoutError:
+                return []
+
+        jobs = [self._jobs.popleft() for _ in range(min(num_jobs, len(self._jobs)))]
+        self._in_progress.update(job["id"] for job in jobs)
+        return jobs
+
+    async def stream(self, session, job, output):
+        self.streams.setdefault(job["id"], []).append(output)
+
+    async def finish_stream(self, session, job):
+        self.finished_streams.add(job["id"])
+
+    async def post(self, session, job, result, is_stream=False):
+        self.results[job["id"]] = result
+        self._in_progress.discard(job["id"])
+        await self._notify()
+
+    async def progress(self, session, job, progress):
+        self.progress_updates.setdefault(job["id"], []).append(progress)
+
+    async def release(self, session, job):
+        # Back to the front of the queue, to be handed out again.
+        self._jobs.appendleft(job)
+        self._in_progress.discard(job["id"])
+        await self._notify()
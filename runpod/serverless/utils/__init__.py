@@ -1,4 +1,20 @@
-""" Allows for the import of all modules in the utils directory. """
+""" Allows for the import of all modules in the utils directory.
 
-from .rp_download import download_files_from_urls
-from .rp_upload import upload_file_to_bucket, upload_in_memory_object
+The download and upload helpers are loaded on first use, rp_upload imports boto3.
+"""
+
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    "download_files_from_urls": ".rp_download",
+    "upload_file_to_bucket": ".rp_upload",
+    "upload_in_memory_object": ".rp_upload",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
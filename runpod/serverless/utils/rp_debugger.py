@@ -5,24 +5,39 @@ A collection of functions to help with debugging.
 """
 
 import datetime
+import functools
 import platform
 import time
 
-import cpuinfo
-
 # ---------------------------------------------------------------------------- #
 #                                  System Info                                 #
 # ---------------------------------------------------------------------------- #
 OS_INFO = f"{platform.system()} {platform.release()}"
 
-try:
-    PROCESSOR = cpuinfo.get_cpu_info()["brand_raw"]
-except KeyError:
-    PROCESSOR = "Unable to get processor info."
-
 PYTHON_VERSION = platform.python_version()
 
 
+@functools.lru_cache(maxsize=None)
+def get_processor() -> str:
+    """
+    Returns the processor name.
+    cpuinfo probes the CPU in a subprocess, so it is only run when first needed.
+    """
+    import cpuinfo  # pylint: disable=import-outside-toplevel
+
+    try:
+        return cpuinfo.get_cpu_info()["brand_raw"]
+    except KeyError:
+        return "Unable to get processor info."
+
+
+def __getattr__(name: str):
+    if name == "PROCESSOR":
+        return get_processor()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class Checkpoints:
     """
     A singleton class to store checkpoint times.
@@ -191,7 +206,7 @@ def get_debugger_output():
 
     system_info = {
         "os": OS_INFO,
-        "processor": PROCESSOR,
+        "processor": get_processor(),
         "python_version": PYTHON_VERSION,
         "runpod": runpod.__version__,
     }
@@ -7,7 +7,7 @@ import asyncio
 import os
 from typing import Any, Dict
 
-from runpod.serverless.modules import rp_logger, rp_local, rp_ping, rp_scale
+from runpod.serverless.modules import rp_fork, rp_logger, rp_local, rp_ping, rp_scale
 
 log = rp_logger.RunPodLogger()
 heartbeat = rp_ping.Heartbeat()
@@ -35,6 +35,10 @@ def run_worker(config: Dict[str, Any]) -> None:
     Args:
         config (Dict[str, Any]): Configuration parameters for the worker.
     """
+    if rp_fork.is_fork_mode(config):
+        run_fork_server(config)
+        return
+
     # Start pinging RunPod to show that the worker is alive.
     heartbeat.start_ping()
 
@@ -43,6 +47,30 @@ def run_worker(config: Dict[str, Any]) -> None:
     job_scaler.start()
 
 
+def run_fork_server(config: Dict[str, Any]) -> None:
+    """
+    Starts the worker loop in a forked child of this warm process.
+
+    The child is replaced after `refresh_worker_jobs` jobs (default 1), when the worker
+    is refreshed or when it crashes, without restarting the pod.
+
+    Args:
+        config (Dict[str, Any]): Configuration parameters for the worker.
+    """
+    jobs_per_child = int(config.get("refresh_worker_jobs", 1))
+
+    def _run_child() -> None:
+        # Each child pings for the jobs it is running.
+        heartbeat.start_ping()
+
+        job_scaler = rp_scale.JobScaler(config)
+        job_scaler.jobs_limit = jobs_per_child
+        job_scaler.start()
+
+    log.info(f"Starting fork-server, recycling worker process every {jobs_per_child} job(s).")
+    rp_fork.ForkServer(_run_child).start()
+
+
 def main(config: Dict[str, Any]) -> None:
     """
     Checks if the worker is running locally or on RunPod.
@@ -0,0 +1 @@
+""" Benchmarks for the runpod package, run with RUNPOD_BENCHMARK=1. """
@@ -0,0 +1,31 @@
+""" Reports the benchmark measurements next to their budgets and saves baselines. """
+
+from .helpers import REPORTS, RESULTS
+from .micro import save_baselines
+
+
+def pytest_sessionfinish(session, exitstatus):  # pylint: disable=unused-argument
+    """Writes new microbenchmark baselines when RUNPOD_BENCH_SAVE_BASELINES is set."""
+    save_baselines()
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Prints a table of all measurements taken during the run."""
+    if not RESULTS and not REPORTS:
+        return
+
+    terminalreporter.section("runpod benchmarks")
+    for text in REPORTS:
+        terminalreporter.write_line(text)
+
+    for result in RESULTS:
+        line = f"{result['name']:<40} {result['value']:>12.2f}"
+
+        if result["budget"] is not None:
+            if result.get("minimum"):
+                status = "OK" if result["value"] >= result["budget"] else "BELOW MINIMUM"
+            else:
+                status = "OK" if result["value"] <= result["budget"] else "OVER BUDGET"
+            line += f" / {result['budget']:>10.2f}  {status}"
+
+        terminalreporter.write_line(line)
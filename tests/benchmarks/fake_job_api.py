@@ -0,0 +1,320 @@
+"""
+A local stand-in for the job API a serverless worker talks to.
+
+Implements job-take, job-take-batch, job-done, stream and ping with configurable job
+generation, latency and fault injection. Point a worker at it with `api.env()` (for a
+worker process) or `api.patch_urls()` (for a JobScaler in the current process).
+
+    async with FakeJobAPI(total_jobs=1000, throttle_rate=0.01) as api:
+        with api.patch_urls():
+            ...
+        print(api.counters, api.latencies)
+"""
+
+import asyncio
+import contextlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest.mock import patch
+
+from aiohttp import web
+
+FAKE_WORKER_ID = "fake-worker"
+
+
+def _default_job_factory(index: int) -> Dict[str, Any]:
+    return {"id": f"job-{index}", "input": {"index": index}}
+
+
+class FakeJobAPI:
+    """
+    Fake job API server.
+
+    Args:
+        total_jobs (int): Number of jobs to hand out, None for an endless supply.
+        job_factory (Callable): Builds the job for an index, must return a unique "id".
+        latency (float): Seconds added to every response.
+        jitter (float): Random extra latency of up to this many seconds.
+        idle_wait (float): Seconds a job-take request is held when there are no jobs left,
+            like the long poll of the real API.
+        no_job_rate (float): Share of job-take requests answered with 204 No Content.
+        throttle_rate (float): Share of job-take requests answered with 429 Too Many Requests.
+        error_rate (float): Share of requests answered with a 5xx error.
+        retry_after (int): Retry-After header (seconds) sent with 429 responses.
+        seed (int): Seed for the random fault and latency injection.
+        bandwidth (float): Bytes per second job-take-batch responses are sent with,
+            sent at once by default.
+    """
+
+    def __init__(
+        self,
+        total_jobs: Optional[int] = None,
+        job_factory: Callable[[int], Dict[str, Any]] = _default_job_factory,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        idle_wait: float = 0.1,
+        no_job_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: Optional[int] = None,
+        bandwidth: Optional[float] = None,
+    ):
+        self.total_jobs = total_jobs
+        self.job_factory = job_factory
+        self.latency = latency
+        self.jitter = jitter
+        self.idle_wait = idle_wait
+        self.no_job_rate = no_job_rate
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.bandwidth = bandwidth
+
+        self.counters = Counter()
+        self.latencies: List[float] = []  # Seconds from job-take to job-done per job.
+        self.results: Dict[str, Any] = {}
+        self.first_request_at: Optional[float] = None
+        self.workers = set()  # IDs of the workers that asked for jobs.
+
+        self._random = random.Random(seed)
+        self._next_index = 0
+        self._issued: Dict[str, float] = {}
+        self._done: Optional[asyncio.Event] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.host: Optional[str] = None
+        self.port: Optional[int] = None
+
+    # ------------------------------- Lifecycle ------------------------------- #
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeJobAPI":
+        """Starts the server on the running event loop."""
+        self._done = asyncio.Event()
+
+        app = web.Application()
+        app.router.add_get("/job-take/{worker_id}", self._job_take)
+        app.router.add_get("/job-take-batch/{worker_id}", self._job_take_batch)
+        app.router.add_post("/job-done/{worker_id}/{job_id}", self._job_done)
+        app.router.add_post("/stream/{worker_id}/{job_id}", self._stream)
+        app.router.add_get("/ping/{worker_id}", self._ping)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.host = host
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self) -> None:
+        """Stops the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeJobAPI":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    @contextlib.contextmanager
+    def serve_in_thread(self) -> Iterator["FakeJobAPI"]:
+        """Runs the server on an event loop in a background thread, for synchronous callers."""
+        started = threading.Event()
+
+        def _serve():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=_serve, daemon=True)
+        self._thread.start()
+        started.wait(10)
+        try:
+            yield self
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+
+    async def wait_done(self, timeout: Optional[float] = None) -> None:
+        """Waits until every job of a finite supply has been reported as done."""
+        await asyncio.wait_for(self._done.wait(), timeout)
+
+    # --------------------------------- URLs ---------------------------------- #
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def job_take_url(self) -> str:
+        return f"{self.base_url}/job-take/$ID?gpu=fake"
+
+    @property
+    def job_done_url(self) -> str:
+        return f"{self.base_url}/job-done/$RUNPOD_POD_ID/$ID?gpu=fake"
+
+    @property
+    def job_stream_url(self) -> str:
+        return f"{self.base_url}/stream/$RUNPOD_POD_ID/$ID?gpu=fake"
+
+    @property
+    def ping_url(self) -> str:
+        return f"{self.base_url}/ping/$RUNPOD_POD_ID"
+
+    def env(self, worker_id: str = FAKE_WORKER_ID) -> Dict[str, str]:
+        """Environment variables that point a worker process at this server."""
+        return {
+            "RUNPOD_POD_ID": worker_id,
+            "RUNPOD_WEBHOOK_GET_JOB": self.job_take_url,
+            "RUNPOD_WEBHOOK_POST_OUTPUT": self.job_done_url,
+            "RUNPOD_WEBHOOK_POST_STREAM": self.job_stream_url,
+            "RUNPOD_WEBHOOK_PING": self.ping_url,
+        }
+
+    @contextlib.contextmanager
+    def patch_urls(self, worker_id: str = FAKE_WORKER_ID) -> Iterator[None]:
+        """Points the job modules of the current process at this server."""
+        with patch(
+            "runpod.serverless.modules.rp_job.JOB_GET_URL",
+            self.job_take_url.replace("$ID", worker_id),
+        ), patch(
+            "runpod.serverless.modules.rp_http.JOB_DONE_URL",
+            self.job_done_url.replace("$RUNPOD_POD_ID", worker_id),
+        ), patch(
+            "runpod.serverless.modules.rp_http.JOB_STREAM_URL",
+            self.job_stream_url.replace("$RUNPOD_POD_ID", worker_id),
+        ):
+            yield
+
+    # ------------------------------ Job Supply ------------------------------- #
+    @property
+    def jobs_left(self) -> Optional[int]:
+        if self.total_jobs is None:
+            return None
+        return self.total_jobs - self._next_index
+
+    def _take_jobs(self, count: int) -> List[Dict[str, Any]]:
+        if self.jobs_left is not None:
+            count = min(count, self.jobs_left)
+
+        jobs = []
+        for _ in range(count):
+            job = self.job_factory(self._next_index)
+            self._next_index += 1
+            self._issued[job["id"]] = time.perf_counter()
+            jobs.append(job)
+
+        self.counters["jobs_taken"] += len(jobs)
+        return jobs
+
+    # ---------------------------- Fault Injection ---------------------------- #
+    async def _delay(self) -> None:
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _fault(self) -> Optional[web.Response]:
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.counters["errors"] += 1
+            return web.Response(status=self._random.choice([500, 502, 503]))
+        return None
+
+    def _take_fault(self) -> Optional[web.Response]:
+        if self.throttle_rate and self._random.random() < self.throttle_rate:
+            self.counters["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+
+        if self.no_job_rate and self._random.random() < self.no_job_rate:
+            self.counters["no_job"] += 1
+            return web.Response(status=204)
+
+        return self._fault()
+
+    async def _acquire(self, request: web.Request, count: int):
+        if self.first_request_at is None:
+            self.first_request_at = time.perf_counter()
+        self.workers.add(request.match_info["worker_id"])
+
+        await self._delay()
+
+        fault = self._take_fault()
+        if fault is not None:
+            return fault, []
+
+        jobs = self._take_jobs(count)
+        if not jobs:
+            if self.idle_wait:
+                await asyncio.sleep(self.idle_wait)
+            self.counters["no_job"] += 1
+            return web.Response(status=204), []
+
+        return None, jobs
+
+    # -------------------------------- Routes --------------------------------- #
+    async def _job_take(self, request: web.Request) -> web.Response:
+        self.counters["job_take"] += 1
+        response, jobs = await self._acquire(request, 1)
+        return response or web.json_response(jobs[0])
+
+    async def _job_take_batch(self, request: web.Request) -> web.Response:
+        self.counters["job_take_batch"] += 1
+        batch_size = int(request.query.get("batch_size", 1))
+        response, jobs = await self._acquire(request, batch_size)
+        if response is not None:
+            return response
+        if not self.bandwidth:
+            return web.json_response(jobs)
+
+        # Sends the batch in chunks, paced like a link with the given bandwidth.
+        body = json.dumps(jobs).encode()
+        stream = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await stream.prepare(request)
+        chunk_size = 64 * 1024
+        for index in range(0, len(body), chunk_size):
+            chunk = body[index : index + chunk_size]
+            await stream.write(chunk)
+            await asyncio.sleep(len(chunk) / self.bandwidth)
+        await stream.write_eof()
+        return stream
+
+    async def _job_done(self, request: web.Request) -> web.Response:
+        await self._delay()
+        fault = self._fault()
+        if fault is not None:
+            return fault
+
+        job_id = request.match_info["job_id"]
+        self.results[job_id] = json.loads(await request.text())
+        self.counters["job_done"] += 1
+
+        issued = self._issued.pop(job_id, None)
+        if issued is not None:
+            self.latencies.append(time.perf_counter() - issued)
+
+        if self.total_jobs is not None and self.counters["job_done"] >= self.total_jobs:
+            self._done.set()
+
+        return web.Response(status=200)
+
+    async def _stream(self, request: web.Request) -> web.Response:
+        await self._delay()
+        fault = self._fault()
+        if fault is not None:
+            return fault
+
+        await request.read()
+        self.counters["stream"] += 1
+        return web.Response(status=200)
+
+    async def _ping(self, _request: web.Request) -> web.Response:
+        self.counters["ping"] += 1
+        return web.Response(status=200)
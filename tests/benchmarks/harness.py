@@ -0,0 +1,191 @@
+"""
+Drives a JobScaler against the FakeJobAPI and reports throughput and latency.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+from runpod.serverless import core
+from runpod.serverless.modules.rp_logger import RunPodLogger
+from runpod.serverless.modules.rp_scale import JobScaler
+from runpod.serverless.modules.rp_sls_local import HTTPHook
+from runpod.serverless.modules.rp_transport import Transport
+
+from .fake_job_api import FAKE_WORKER_ID, FakeJobAPI
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def report(api: FakeJobAPI, duration: float, jobs: int) -> Dict[str, Any]:
+    """Summarises a run from the counters and latencies recorded by the fake API."""
+    latencies_ms = [latency * 1000 for latency in api.latencies[:jobs]]
+    return {
+        "jobs": jobs,
+        "duration_s": round(duration, 3),
+        "jobs_per_sec": round(jobs / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "counters": dict(api.counters),
+    }
+
+
+async def run_scaler(
+    handler: Callable,
+    total_jobs: Optional[int] = None,
+    duration: float = 5.0,
+    concurrency: int = 1,
+    timeout: float = 60,
+    log_level: str = "ERROR",
+    config: Optional[Dict[str, Any]] = None,
+    **api_options,
+) -> Dict[str, Any]:
+    """
+    Runs jobs through a JobScaler in this process and reports the result.
+
+    Runs until `total_jobs` jobs are done, or for `duration` seconds against an endless
+    supply of jobs when `total_jobs` is None.
+
+    Args:
+        handler (Callable): The worker handler.
+        total_jobs (int): Number of jobs the fake API hands out.
+        duration (float): Seconds to run for when there is no fixed number of jobs.
+        concurrency (int): Fixed concurrency of the JobScaler.
+        timeout (float): Seconds to wait for all jobs to be done, and for the worker to stop.
+        log_level (str): RunPodLogger level during the run.
+        config (dict): Extra worker config.
+        **api_options: Options for the FakeJobAPI (latency, faults, job_factory, ...).
+    """
+    worker_config = {
+        "handler": handler,
+        "rp_args": {},
+        "concurrency_modifier": lambda _: concurrency,
+        **(config or {}),
+    }
+
+    async with FakeJobAPI(total_jobs=total_jobs, **api_options) as api:
+        with api.patch_urls(), patch.object(RunPodLogger(), "level", log_level):
+            scaler = JobScaler(worker_config)
+
+            start = time.perf_counter()
+            worker = asyncio.create_task(scaler.run())
+            try:
+                if total_jobs is None:
+                    await asyncio.sleep(duration)
+                else:
+                    await api.wait_done(timeout)
+            finally:
+                elapsed = time.perf_counter() - start
+                jobs = api.counters["job_done"]
+                scaler.kill_worker()
+                await asyncio.wait_for(worker, timeout)
+
+    return report(api, elapsed, jobs)
+
+
+async def run_sls_core(
+    handler: Callable,
+    total_jobs: Optional[int] = None,
+    duration: float = 5.0,
+    concurrency: int = 1,
+    max_jobs: int = 1,
+    timeout: float = 60,
+    log_level: str = "ERROR",
+    config: Optional[Dict[str, Any]] = None,
+    **api_options,
+) -> Dict[str, Any]:
+    """
+    Runs jobs through the sls-core worker in this process, with the HTTPHook in place of
+    sls_core.so, and reports the result like run_scaler.
+
+    Args:
+        concurrency (int): max_concurrency of the worker.
+        max_jobs (int): Most jobs taken by one job-take request.
+        See run_scaler for the others.
+    """
+    worker_config = {
+        "handler": handler,
+        "rp_args": {},
+        "max_concurrency": concurrency,
+        "max_jobs": max_jobs,
+        **(config or {}),
+    }
+
+    async with FakeJobAPI(total_jobs=total_jobs, **api_options) as api:
+        with patch.object(RunPodLogger(), "level", log_level):
+            hook = core.AsyncHook(
+                HTTPHook(
+                    api.job_take_url,
+                    api.job_done_url,
+                    api.job_stream_url,
+                    worker_id=FAKE_WORKER_ID,
+                    timeout=timeout,
+                )
+            )
+            scaler = core._job_scaler(worker_config, hook)
+
+            start = time.perf_counter()
+            worker = asyncio.create_task(scaler.run())
+            try:
+                if total_jobs is None:
+                    await asyncio.sleep(duration)
+                else:
+                    await api.wait_done(timeout)
+            finally:
+                elapsed = time.perf_counter() - start
+                jobs = api.counters["job_done"]
+                scaler.kill_worker()
+                await asyncio.wait_for(worker, timeout)
+                hook.shutdown()
+
+    return report(api, elapsed, jobs)
+
+
+async def run_transport(
+    handler: Callable,
+    transport: Transport,
+    completed: Callable[[], int],
+    duration: float = 5.0,
+    concurrency: int = 1,
+    timeout: float = 60,
+    log_level: str = "ERROR",
+) -> Dict[str, Any]:
+    """
+    Runs jobs through a JobScaler on `transport` for `duration` seconds.
+
+    Args:
+        completed (Callable): Returns the number of jobs whose result the transport got.
+    """
+    worker_config = {
+        "handler": handler,
+        "rp_args": {},
+        "concurrency_modifier": lambda _: concurrency,
+    }
+
+    with patch.object(RunPodLogger(), "level", log_level):
+        scaler = JobScaler(worker_config, transport)
+
+        start = time.perf_counter()
+        worker = asyncio.create_task(scaler.run())
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            elapsed = time.perf_counter() - start
+            jobs = completed()
+            scaler.kill_worker()
+            await asyncio.wait_for(worker, timeout)
+            transport.close()
+
+    return {
+        "jobs": jobs,
+        "duration_s": round(elapsed, 3),
+        "jobs_per_sec": round(jobs / elapsed, 2) if elapsed else 0.0,
+    }
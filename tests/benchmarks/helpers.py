@@ -0,0 +1,107 @@
+"""
+Shared helpers for the benchmarks.
+
+Benchmarks are skipped unless RUNPOD_BENCHMARK is set, run them without coverage:
+
+    RUNPOD_BENCHMARK=1 pytest tests/benchmarks --no-cov
+
+Measurements are compared to their budget in budgets.json, a maximum for times and
+memory and a minimum for throughput (`*_per_sec`). A budget can be overridden with RUNPOD_BUDGET_<NAME> (e.g. RUNPOD_BUDGET_IMPORT_RUNPOD_MS=500).
+"""
+
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+BENCHMARK_DIR = Path(__file__).parent
+REPO_ROOT = BENCHMARK_DIR.parent.parent
+BUDGETS_FILE = BENCHMARK_DIR / "budgets.json"
+
+BENCHMARK_ENABLED = os.environ.get("RUNPOD_BENCHMARK", "").lower() in ["1", "t", "true"]
+
+requires_benchmark = pytest.mark.skipif(
+    not BENCHMARK_ENABLED, reason="Benchmarks only run with RUNPOD_BENCHMARK=1."
+)
+
+# Measurements and text reports shown at the end of the run, see conftest.py
+RESULTS: List[Dict[str, Any]] = []
+REPORTS: List[str] = []
+
+
+def get_budget(name: str) -> float:
+    """Returns the budget for a measurement, environment overrides take precedence."""
+    override = os.environ.get(f"RUNPOD_BUDGET_{name.upper()}")
+    if override is not None:
+        return float(override)
+
+    with open(BUDGETS_FILE, "r", encoding="utf-8") as budgets_file:
+        return float(json.load(budgets_file)[name])
+
+
+def assert_within_budget(name: str, value: float) -> None:
+    """Records a measurement and fails the benchmark if it exceeds its budget."""
+    budget = get_budget(name)
+    RESULTS.append({"name": name, "value": value, "budget": budget})
+
+    assert value <= budget, f"{name} = {value:.2f} exceeds its budget of {budget:.2f}"
+
+
+def assert_above_budget(name: str, value: float) -> None:
+    """Records a measurement and fails the benchmark if it falls below its minimum."""
+    budget = get_budget(name)
+    RESULTS.append({"name": name, "value": value, "budget": budget, "minimum": True})
+
+    assert value >= budget, f"{name} = {value:.2f} is below its minimum of {budget:.2f}"
+
+
+def record(name: str, value: float) -> None:
+    """Records a measurement that is reported without a budget."""
+    RESULTS.append({"name": name, "value": value, "budget": None})
+
+
+def report(text: str) -> None:
+    """Adds a text report, e.g. a chart, to the end of the run."""
+    REPORTS.append(text)
+
+
+def median_of(runs: int, measure: Callable[[], float]) -> float:
+    """Returns the median of several runs of a measurement."""
+    return statistics.median(measure() for _ in range(runs))
+
+
+def worker_env(**overrides: str) -> Dict[str, str]:
+    """Environment for a worker subprocess using the local checkout of runpod."""
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if not key.startswith("RUNPOD_") or key.startswith("RUNPOD_BENCH")
+    }
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    env["RUNPOD_LOG_LEVEL"] = "ERROR"
+    env.update(overrides)
+    return env
+
+
+def read_proc_status_mb(pid: int, field: str) -> float:
+    """Reads a memory field of a process from /proc in MB."""
+    with open(f"/proc/{pid}/status", "r", encoding="utf-8") as status_file:
+        for line in status_file:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+
+    raise KeyError(field)
+
+
+def wait_for(predicate: Callable[[], bool], timeout: float, interval: float = 0.01) -> bool:
+    """Polls until the predicate is true or the timeout is reached."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
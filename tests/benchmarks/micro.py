@@ -0,0 +1,142 @@
+"""
+Microbenchmark helpers: time a call in microseconds and compare it to a stored baseline.
+
+Baselines are kept in baselines.json relative to a reference workload timed in the same
+run, so that they hold on faster and slower machines alike. After an intended change in
+per-job overhead, store new baselines with:
+
+    RUNPOD_BENCH_SAVE_BASELINES=1 RUNPOD_BENCHMARK=1 pytest tests/benchmarks/test_overhead.py --no-cov
+
+A measurement fails the run when, relative to the reference, it is slower than its
+baseline by more than RUNPOD_BENCH_TOLERANCE (a fraction, 0.5 by default) and by more
+than RUNPOD_BENCH_MIN_DELTA_US microseconds (5 by default). Timings this short are noisy
+on shared runners, the absolute margin keeps jitter of the fastest calls from failing it.
+"""
+
+import asyncio
+import json
+import os
+import timeit
+from typing import Any, Awaitable, Callable, Dict
+
+from .helpers import BENCHMARK_DIR, RESULTS
+
+BASELINES_FILE = BENCHMARK_DIR / "baselines.json"
+
+SAVE_BASELINES = os.environ.get("RUNPOD_BENCH_SAVE_BASELINES", "").lower() in ["1", "t", "true"]
+TOLERANCE = float(os.environ.get("RUNPOD_BENCH_TOLERANCE", "0.5"))
+MIN_DELTA_US = float(os.environ.get("RUNPOD_BENCH_MIN_DELTA_US", "5"))
+
+REPEAT = 5
+
+# Serialized by the reference workload, about the size of a small job.
+REFERENCE_PAYLOAD = {
+    "id": "job-reference",
+    "input": {"prompt": "reference", "steps": 10, "values": list(range(20))},
+}
+
+# New baselines, written at the end of the session when saving is enabled.
+NEW_BASELINES: Dict[str, float] = {}
+
+
+def load_baselines() -> Dict[str, float]:
+    if not BASELINES_FILE.exists():
+        return {}
+    with open(BASELINES_FILE, "r", encoding="utf-8") as baselines_file:
+        return json.load(baselines_file)
+
+
+def save_baselines() -> None:
+    """Merges the new baselines into baselines.json."""
+    if not NEW_BASELINES:
+        return
+
+    baselines = {**load_baselines(), **NEW_BASELINES}
+    with open(BASELINES_FILE, "w", encoding="utf-8") as baselines_file:
+        json.dump(dict(sorted(baselines.items())), baselines_file, indent=4)
+        baselines_file.write("\n")
+
+
+def _best_us(run_batch: Callable[[int], Any]) -> float:
+    """
+    Best time per call in microseconds, `run_batch(number)` makes `number` calls.
+    The batch size is doubled until a batch takes at least 0.2 seconds.
+    """
+    number = 1
+    while True:
+        start = timeit.default_timer()
+        run_batch(number)
+        if timeit.default_timer() - start >= 0.2:
+            break
+        number *= 2
+
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = timeit.default_timer()
+        run_batch(number)
+        best = min(best, timeit.default_timer() - start)
+
+    return best / number * 1e6
+
+
+def time_us(function: Callable[[], Any]) -> float:
+    """Best time of a call in microseconds."""
+
+    def _batch(number):
+        for _ in range(number):
+            function()
+
+    return _best_us(_batch)
+
+
+def time_async_us(function: Callable[[], Awaitable[Any]]) -> float:
+    """Best time of an awaited call in microseconds, starting the event loop is not included."""
+
+    async def _batch(number):
+        for _ in range(number):
+            await function()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return _best_us(lambda number: loop.run_until_complete(_batch(number)))
+    finally:
+        loop.close()
+
+
+def reference_us() -> float:
+    """
+    Time of a fixed pure-Python workload, a JSON round trip, on this machine.
+    Baselines are multiples of it, it is timed next to each measurement so that both
+    see the same load of the machine.
+    """
+    return time_us(lambda: json.loads(json.dumps(REFERENCE_PAYLOAD)))
+
+
+def assert_no_regression(name: str, value_us: float) -> None:
+    """
+    Records a per-call time against its baseline, fails on a regression.
+    """
+    reference = reference_us()
+    relative = value_us / reference
+    if SAVE_BASELINES:
+        NEW_BASELINES[name] = round(relative, 3)
+
+    baseline = load_baselines().get(name)
+    limit = baseline * (1 + TOLERANCE) if baseline is not None else None
+    RESULTS.append(
+        {
+            "name": f"{name}_us",
+            "value": value_us,
+            "budget": limit * reference if limit is not None else None,
+        }
+    )
+
+    if limit is None or SAVE_BASELINES:
+        return
+
+    delta_us = value_us - baseline * reference
+    assert relative <= limit or delta_us <= MIN_DELTA_US, (
+        f"{name} = {value_us:.2f} us is {relative:.2f}x the reference workload, "
+        f"more than {TOLERANCE:.0%} and {MIN_DELTA_US:g} us above its baseline of "
+        f"{baseline:.2f}x"
+    )
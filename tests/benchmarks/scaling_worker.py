@@ -0,0 +1,49 @@
+"""
+Worker process for the scaling benchmark.
+
+    python -m tests.benchmarks.scaling_worker <cpu|io|mixed> <concurrency>
+
+Reads the job API URLs from the environment, see FakeJobAPI.env().
+"""
+
+import asyncio
+import sys
+
+import runpod
+
+CPU_ITERATIONS = 20_000
+IO_SLEEP = 0.01
+
+
+def _burn_cpu() -> int:
+    return sum(i * i for i in range(CPU_ITERATIONS))
+
+
+def cpu_handler(job):
+    """CPU-bound handler, blocks the event loop."""
+    return {"index": job["input"]["index"], "result": _burn_cpu()}
+
+
+async def io_handler(job):
+    """I/O-bound handler, waits without using the CPU."""
+    await asyncio.sleep(IO_SLEEP)
+    return {"index": job["input"]["index"]}
+
+
+async def mixed_handler(job):
+    """Alternates between CPU-bound and I/O-bound jobs."""
+    if job["input"]["index"] % 2:
+        return await io_handler(job)
+    return cpu_handler(job)
+
+
+HANDLERS = {"cpu": cpu_handler, "io": io_handler, "mixed": mixed_handler}
+
+
+if __name__ == "__main__":
+    kind, concurrency = sys.argv[1], int(sys.argv[2])
+    sys.argv = sys.argv[:1]  # The worker parses its own arguments.
+
+    runpod.serverless.start(
+        {"handler": HANDLERS[kind], "concurrency_modifier": lambda _: concurrency}
+    )
@@ -0,0 +1,63 @@
+"""
+Time until the first job of a large job-take-batch response can be queued.
+"""
+
+import asyncio
+import base64
+import os
+import statistics
+import time
+import unittest
+
+from runpod.http_client import AsyncClientSession
+from runpod.serverless.modules.rp_job import get_job
+
+from .fake_job_api import FakeJobAPI
+from .helpers import assert_within_budget, record, requires_benchmark
+
+BATCH_SIZE = 8
+JOB_INPUT_BYTES = 1024 * 1024
+BANDWIDTH = 50 * 1024 * 1024  # Bytes per second.
+
+
+def large_job(index):
+    data = base64.b64encode(os.urandom(JOB_INPUT_BYTES // 4 * 3)).decode()
+    return {"id": f"job-{index}", "input": {"image": data}}
+
+
+async def take_batch(streamed: bool):
+    """Returns the ms until the first job and until the whole batch was received."""
+    async with FakeJobAPI(job_factory=large_job, bandwidth=BANDWIDTH) as api:
+        with api.patch_urls():
+            async with AsyncClientSession() as session:
+                times = []
+
+                async def on_job(job):  # pylint: disable=unused-argument
+                    times.append(time.perf_counter())
+
+                start = time.perf_counter()
+                if streamed:
+                    await get_job(session, BATCH_SIZE, on_job=on_job)
+                else:
+                    for job in await get_job(session, BATCH_SIZE):
+                        await on_job(job)
+
+    assert len(times) == BATCH_SIZE
+    return (times[0] - start) * 1000, (times[-1] - start) * 1000
+
+
+@requires_benchmark
+class TestBatchDecode(unittest.TestCase):
+    """Streamed decoding of the batch response compared to decoding it at once."""
+
+    def test_first_job_latency(self):
+        results = {}
+        for streamed in (False, True):
+            name = "batch_streamed" if streamed else "batch_buffered"
+            runs = [asyncio.run(take_batch(streamed)) for _ in range(3)]
+            results[name] = statistics.median(run[0] for run in runs)
+            record(f"{name}_total_ms", statistics.median(run[1] for run in runs))
+
+        record("batch_buffered_first_job_ms", results["batch_buffered"])
+        assert_within_budget("batch_streamed_first_job_ms", results["batch_streamed"])
+        self.assertLess(results["batch_streamed"], results["batch_buffered"])
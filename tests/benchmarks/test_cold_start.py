@@ -0,0 +1,123 @@
+"""
+Cold start benchmarks: import time, time to the first job-take request and idle memory.
+"""
+
+import subprocess
+import sys
+import textwrap
+import time
+import unittest
+
+from .fake_job_api import FakeJobAPI
+from .helpers import (
+    assert_within_budget,
+    median_of,
+    read_proc_status_mb,
+    requires_benchmark,
+    wait_for,
+    worker_env,
+)
+
+IMPORT_RUNS = 5
+
+WORKER_SCRIPT = textwrap.dedent(
+    """
+    import runpod
+
+    def handler(job):
+        return job["input"]
+
+    runpod.serverless.start({"handler": handler})
+    """
+)
+
+
+def import_time_ms(module: str) -> float:
+    """
+    Returns the time `import <module>` takes in a fresh interpreter, in milliseconds.
+
+    Uses `python -X importtime` and sums the cumulative time of the top level imports
+    of `module` and its parent packages, the imports made when the interpreter starts
+    up (site, encodings, ...) are left out.
+    """
+    parts = module.split(".")
+    packages = {".".join(parts[: index + 1]) for index in range(len(parts))}
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        env=worker_env(),
+        text=True,
+        timeout=60,
+    )
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name[1:].startswith(" ") and name.strip() in packages:  # Top level import
+            total_us += int(cumulative)
+
+    return total_us / 1000
+
+
+@requires_benchmark
+class TestImportTime(unittest.TestCase):
+    """Import time of the public entry points."""
+
+    def test_import_runpod(self):
+        assert_within_budget(
+            "import_runpod_ms", median_of(IMPORT_RUNS, lambda: import_time_ms("runpod"))
+        )
+
+    def test_import_serverless(self):
+        assert_within_budget(
+            "import_runpod_serverless_ms",
+            median_of(IMPORT_RUNS, lambda: import_time_ms("runpod.serverless")),
+        )
+
+    def test_import_endpoint(self):
+        assert_within_budget(
+            "import_runpod_endpoint_ms",
+            median_of(IMPORT_RUNS, lambda: import_time_ms("runpod.endpoint")),
+        )
+
+    def test_import_api(self):
+        assert_within_budget(
+            "import_runpod_api_ms", median_of(IMPORT_RUNS, lambda: import_time_ms("runpod.api"))
+        )
+
+
+@requires_benchmark
+@unittest.skipUnless(sys.platform.startswith("linux"), "Reads memory stats from /proc.")
+class TestWorkerColdStart(unittest.TestCase):
+    """Start up of a queue worker against a local job-take API."""
+
+    def test_first_job_take_and_idle_memory(self):
+        """Time from process start to the first job-take request, then peak RSS at idle."""
+        with FakeJobAPI(total_jobs=0).serve_in_thread() as api:
+            start = time.perf_counter()
+            worker = subprocess.Popen(  # pylint: disable=consider-using-with
+                [sys.executable, "-c", WORKER_SCRIPT],
+                env=worker_env(**api.env()),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                self.assertTrue(
+                    wait_for(lambda: api.first_request_at is not None, timeout=30),
+                    "The worker did not request a job.",
+                )
+                first_job_take_ms = (api.first_request_at - start) * 1000
+
+                time.sleep(1)  # Let the worker settle in its idle polling loop.
+                self.assertIsNone(worker.poll(), "The worker exited while idle.")
+                idle_peak_rss_mb = read_proc_status_mb(worker.pid, "VmHWM")
+            finally:
+                worker.terminate()
+                worker.wait(10)
+
+        assert_within_budget("first_job_take_ms", first_job_take_ms)
+        assert_within_budget("idle_peak_rss_mb", idle_peak_rss_mb)
@@ -0,0 +1,57 @@
+"""
+Job and stream POST throughput of a JobScaler on the asyncio and uvloop event loops.
+
+The fake job API runs on the same loop as the worker, both sides use the loop under test.
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+from runpod.serverless.modules import rp_loop
+
+from .harness import run_scaler
+from .helpers import record, report, requires_benchmark
+
+DURATION = float(os.environ.get("RUNPOD_BENCH_DURATION", "5"))
+
+STREAM_CHUNKS = 5
+
+
+def noop_handler(job):
+    return job["input"]
+
+
+async def stream_handler(job):
+    for index in range(STREAM_CHUNKS):
+        yield {"chunk": index, "input": job["input"]}
+
+
+@requires_benchmark
+class TestEventLoopThroughput(unittest.TestCase):
+    """Jobs/sec and stream POSTs/sec under RUNPOD_EVENT_LOOP=asyncio and uvloop."""
+
+    def _run(self, event_loop, handler):
+        with patch.dict(os.environ, {"RUNPOD_EVENT_LOOP": event_loop}):
+            if event_loop == "uvloop" and not rp_loop.use_uvloop():
+                self.skipTest("uvloop is not installed")
+
+            return rp_loop.run(
+                run_scaler(handler, duration=DURATION, concurrency=10, seed=0)
+            )
+
+    def test_job_and_stream_posts(self):
+        rows = []
+        for event_loop in ("asyncio", "uvloop"):
+            jobs = self._run(event_loop, noop_handler)
+            streams = self._run(event_loop, stream_handler)
+            stream_posts = streams["counters"].get("stream", 0) / streams["duration_s"]
+
+            record(f"event_loop_{event_loop}_jobs_per_sec", jobs["jobs_per_sec"])
+            record(f"event_loop_{event_loop}_stream_posts_per_sec", round(stream_posts, 2))
+            rows.append(
+                f"{event_loop:<8} {jobs['jobs_per_sec']:>10.1f} jobs/s"
+                f" {stream_posts:>10.1f} stream POSTs/s"
+            )
+
+        report("Event loop throughput\n" + "\n".join(rows))
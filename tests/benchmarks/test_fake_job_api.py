@@ -0,0 +1,81 @@
+""" Tests for the fake job API used by the benchmarks. """
+
+import unittest
+
+import aiohttp
+
+from runpod.http_client import TooManyRequests
+from runpod.serverless.modules import rp_http, rp_job
+
+from .fake_job_api import FakeJobAPI
+from .harness import percentile, run_scaler
+
+
+class TestFakeJobAPI(unittest.IsolatedAsyncioTestCase):
+    """The fake API answers the worker's requests like the real one."""
+
+    async def test_job_take_and_done(self):
+        async with FakeJobAPI(total_jobs=3, idle_wait=0) as api, aiohttp.ClientSession() as session:
+            with api.patch_urls():
+                single = await rp_job.get_job(session, 1)
+                batch = await rp_job.get_job(session, 5)
+                empty = await rp_job.get_job(session, 1)
+
+                for job in single + batch:
+                    await rp_http.send_result(session, {"output": job["input"]}, job)
+
+            await api.wait_done(5)
+
+        self.assertEqual([job["id"] for job in single], ["job-0"])
+        self.assertEqual([job["id"] for job in batch], ["job-1", "job-2"])
+        self.assertIsNone(empty)
+        self.assertEqual(api.results["job-2"], {"output": {"index": 2}})
+        self.assertEqual(len(api.latencies), 3)
+        self.assertEqual(api.counters["job_take"], 2)
+        self.assertEqual(api.counters["job_take_batch"], 1)
+        self.assertEqual(api.counters["job_done"], 3)
+        self.assertEqual(api.counters["no_job"], 1)
+
+    async def test_faults(self):
+        async with FakeJobAPI(throttle_rate=1, retry_after=7) as api, aiohttp.ClientSession() as session:
+            with api.patch_urls():
+                with self.assertRaises(TooManyRequests):
+                    await rp_job.get_job(session, 1)
+
+            api.throttle_rate, api.error_rate = 0, 1
+            with api.patch_urls():
+                with self.assertRaises(aiohttp.ClientResponseError):
+                    await rp_job.get_job(session, 1)
+
+            api.error_rate, api.no_job_rate = 0, 1
+            with api.patch_urls():
+                self.assertIsNone(await rp_job.get_job(session, 1))
+
+        self.assertEqual(api.counters["throttled"], 1)
+        self.assertEqual(api.counters["errors"], 1)
+        self.assertEqual(api.counters["no_job"], 1)
+
+    async def test_env(self):
+        async with FakeJobAPI() as api:
+            env = api.env("worker-1")
+
+        self.assertEqual(env["RUNPOD_POD_ID"], "worker-1")
+        self.assertTrue(env["RUNPOD_WEBHOOK_GET_JOB"].endswith("/job-take/$ID?gpu=fake"))
+        self.assertIn("/job-done/$RUNPOD_POD_ID/$ID?", env["RUNPOD_WEBHOOK_POST_OUTPUT"])
+
+    async def test_run_scaler(self):
+        result = await run_scaler(lambda job: job["input"], total_jobs=5, concurrency=5)
+
+        self.assertEqual(result["jobs"], 5)
+        self.assertEqual(result["counters"]["job_done"], 5)
+        self.assertGreater(result["jobs_per_sec"], 0)
+
+
+class TestPercentile(unittest.TestCase):
+    """Nearest-rank percentiles."""
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 50), 0.0)
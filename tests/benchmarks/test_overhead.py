@@ -0,0 +1,113 @@
+"""
+Per-job overhead the SDK adds around a no-op handler, in microseconds per call.
+"""
+
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from runpod.serverless.modules import rp_http, rp_job
+from runpod.serverless.modules.rp_logger import RunPodLogger
+from runpod.serverless.modules.worker_state import JobsProgress
+from runpod.serverless.utils import rp_debugger
+
+from .helpers import requires_benchmark
+from .micro import assert_no_regression, time_async_us, time_us
+
+JOB = {"id": "job-overhead", "input": {"prompt": "benchmark", "steps": 10}}
+
+
+def noop_handler(job):
+    return job["input"]
+
+
+async def async_noop_handler(job):
+    return job["input"]
+
+
+async def _no_transmit(*_args, **_kwargs):
+    return None
+
+
+class _Session:  # pylint: disable=too-few-public-methods
+    """Stands in for the aiohttp session, only the headers are used."""
+
+    def __init__(self):
+        self.headers = {}
+
+
+def _job():
+    return {"id": JOB["id"], "input": dict(JOB["input"])}
+
+
+@requires_benchmark
+class TestPerJobOverhead(unittest.TestCase):
+    """Hot paths run for every job."""
+
+    def setUp(self):
+        level = patch.object(RunPodLogger(), "level", "ERROR")
+        level.start()
+        self.addCleanup(level.stop)
+
+    def test_run_job(self):
+        """run_job wrapping a sync and an async no-op handler."""
+        assert_no_regression(
+            "run_job_sync", time_async_us(lambda: rp_job.run_job(noop_handler, _job()))
+        )
+        assert_no_regression(
+            "run_job_async", time_async_us(lambda: rp_job.run_job(async_noop_handler, _job()))
+        )
+
+    def test_jobs_progress(self):
+        """JobsProgress add and remove of a job dict, each builds a Job(**dict)."""
+        job_progress = JobsProgress()
+        job = _job()
+
+        def add_remove():
+            job_progress.add(job)
+            job_progress.remove(job)
+
+        assert_no_regression("jobs_progress_add_remove", time_us(add_remove))
+
+    def test_logger(self):
+        """RunPodLogger calls below the log level and written to stdout."""
+        log = RunPodLogger()
+        assert_no_regression("logger_filtered", time_us(lambda: log.debug("Started.", JOB["id"])))
+
+        with patch.object(log, "level", "INFO"), redirect_stdout(io.StringIO()):
+            assert_no_regression("logger_emitted", time_us(lambda: log.info("Started.", JOB["id"])))
+
+    def test_handle_result(self):
+        """Serialization of a job result in _handle_result, without the HTTP request."""
+        session, result = _Session(), {"output": JOB["input"]}
+
+        with patch.object(rp_http, "_transmit", _no_transmit):
+            assert_no_regression(
+                "send_result_serialization",
+                time_async_us(lambda: rp_http.send_result(session, result, JOB)),
+            )
+
+    def test_debugger(self):
+        """rp_debugger bookkeeping: a timed checkpoint and clearing the output after a job."""
+        checkpoints = rp_debugger.Checkpoints()
+
+        def checkpoint():
+            with rp_debugger.LineTimer("benchmark"):
+                pass
+            checkpoints.get_checkpoints()
+            rp_debugger.clear_debugger_output()
+
+        assert_no_regression("debugger_checkpoint", time_us(checkpoint))
+        assert_no_regression("debugger_clear", time_us(rp_debugger.clear_debugger_output))
+
+    def test_handle_job(self):
+        """Everything handle_job does around a no-op handler, without the HTTP request."""
+        config = {"handler": noop_handler, "rp_args": {}}
+        session = _Session()
+
+        with patch.object(rp_http, "_transmit", _no_transmit):
+            assert_no_regression(
+                "handle_job_noop",
+                time_async_us(lambda: rp_job.handle_job(session, config, _job())),
+            )
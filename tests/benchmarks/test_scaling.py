@@ -0,0 +1,108 @@
+"""
+Aggregate throughput of N worker processes sharing a host and a job API.
+
+Bottlenecks in serialization, logging or the connection pool only show up when many
+workers run side by side, so throughput is measured for an increasing number of
+processes and compared to N times the throughput of a single process.
+
+    RUNPOD_BENCH_WORKERS=1,2,4,8 RUNPOD_BENCHMARK=1 pytest tests/benchmarks/test_scaling.py --no-cov
+"""
+
+import os
+import subprocess
+import sys
+import time
+import unittest
+from typing import Dict, List
+
+from .fake_job_api import FakeJobAPI
+from .helpers import (
+    REPO_ROOT,
+    assert_above_budget,
+    record,
+    report,
+    requires_benchmark,
+    wait_for,
+    worker_env,
+)
+
+# Seconds throughput is measured for, after all workers asked for their first job.
+DURATION = float(os.environ.get("RUNPOD_BENCH_DURATION", "5"))
+
+# Jobs each worker process runs concurrently.
+CONCURRENCY = int(os.environ.get("RUNPOD_BENCH_CONCURRENCY", "10"))
+
+
+def worker_counts() -> List[int]:
+    """Numbers of worker processes to measure, by default up to the number of CPUs."""
+    if counts := os.environ.get("RUNPOD_BENCH_WORKERS"):
+        return [int(count) for count in counts.split(",")]
+
+    cpus = os.cpu_count() or 1
+    return [count for count in (1, 2, 4, 8, 16) if count <= cpus]
+
+
+def measure(kind: str, workers: int) -> float:
+    """Returns the aggregate jobs/sec of `workers` processes running the `kind` handler."""
+    with FakeJobAPI(idle_wait=0.1).serve_in_thread() as api:
+        processes = [
+            subprocess.Popen(  # pylint: disable=consider-using-with
+                [sys.executable, "-m", "tests.benchmarks.scaling_worker", kind, str(CONCURRENCY)],
+                cwd=REPO_ROOT,
+                env=worker_env(**api.env(f"worker-{index}")),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            for index in range(workers)
+        ]
+        try:
+            if not wait_for(lambda: len(api.workers) == workers, timeout=60):
+                raise AssertionError("Not all workers asked for a job.")
+
+            start_jobs, start = api.counters["job_done"], time.perf_counter()
+            time.sleep(DURATION)
+            jobs, elapsed = api.counters["job_done"] - start_jobs, time.perf_counter() - start
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(30)
+
+    return jobs / elapsed
+
+
+def plot(kind: str, throughput: Dict[int, float]) -> str:
+    """Text chart of throughput against the number of workers."""
+    width = 40
+    peak = max(throughput.values()) or 1
+    lines = [f"{kind} handler (concurrency {CONCURRENCY} per worker)"]
+    for workers, jobs_per_sec in throughput.items():
+        bar = "#" * round(width * jobs_per_sec / peak)
+        lines.append(f"  N={workers:<3} {bar:<{width}} {jobs_per_sec:10.2f} jobs/sec")
+    return "\n".join(lines)
+
+
+@requires_benchmark
+class TestWorkerScaling(unittest.TestCase):
+    """Aggregate throughput against the number of worker processes."""
+
+    def _run(self, kind):
+        throughput = {workers: measure(kind, workers) for workers in worker_counts()}
+        report(plot(kind, throughput))
+
+        for workers, jobs_per_sec in throughput.items():
+            record(f"scaling_{kind}_n{workers}_jobs_per_sec", jobs_per_sec)
+
+        # Share of the ideal linear speed up reached with the most workers.
+        fewest, most = min(throughput), max(throughput)
+        efficiency = (throughput[most] / most) / (throughput[fewest] / fewest)
+        assert_above_budget(f"scaling_{kind}_efficiency", efficiency)
+
+    def test_cpu_bound(self):
+        self._run("cpu")
+
+    def test_io_bound(self):
+        self._run("io")
+
+    def test_mixed(self):
+        self._run("mixed")
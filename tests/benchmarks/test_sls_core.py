@@ -0,0 +1,186 @@
+"""
+Poll overhead and allocations of the sls-core Hook.get_jobs receive path, and
+throughput of the sls-core worker against the JobScaler worker.
+
+sls_core.so is not needed, _runpod_sls_get_jobs is replaced by a Python function that
+writes a prepared response into the buffer it is given, and the worker runs with the
+pure-Python hooks of rp_sls_local.
+"""
+
+import asyncio
+import ctypes
+import json
+import os
+import time
+import tracemalloc
+import unittest
+
+from runpod.serverless import core
+from runpod.serverless.modules.rp_sls_local import LocalHook
+
+from .harness import run_scaler, run_sls_core
+from .helpers import assert_above_budget, assert_within_budget, record, requires_benchmark
+from .micro import time_us
+
+# Seconds each throughput scenario runs for.
+DURATION = float(os.environ.get("RUNPOD_BENCH_DURATION", "5"))
+
+JOBS = [{"id": f"job-{index}", "input": {"data": "x" * 100_000}} for index in range(10)]
+
+
+class FakeGetJobs:  # pylint: disable=too-few-public-methods
+    """Stands in for _runpod_sls_get_jobs, answers with `payload` or STILL_WAITING."""
+
+    def __init__(self, payload: bytes = b""):
+        self.payload = payload
+
+    def __call__(self, max_concurrency, max_jobs, buf_ref, buf_len):
+        if not self.payload:
+            return core.CGetJobResult(status_code=core.STILL_WAITING, res_len=0)
+        if len(self.payload) > buf_len.value:
+            return core.CGetJobResult(
+                status_code=core.ERROR_BUFFER_TOO_SMALL, res_len=len(self.payload)
+            )
+        ctypes.memmove(buf_ref._obj, self.payload, len(self.payload))
+        return core.CGetJobResult(status_code=core.OK, res_len=len(self.payload))
+
+
+def make_hook(get_jobs: FakeGetJobs) -> core.Hook:
+    """A Hook that is not the singleton and does not load sls_core.so."""
+    hook = object.__new__(core.Hook)
+    hook._get_jobs = get_jobs
+    return hook
+
+
+def legacy_get_jobs(hook: core.Hook, max_concurrency: int, max_jobs: int):
+    """The receive path before the buffer was reused, for comparison."""
+    buf = ctypes.create_string_buffer(1024 * 1024 * 20)
+    res = hook._get_jobs(
+        ctypes.c_int(max_concurrency),
+        ctypes.c_int(max_jobs),
+        ctypes.byref(buf),
+        ctypes.c_int(len(buf.raw)),
+    )
+    if res.status_code == core.OK:
+        return list(json.loads(buf.raw[: res.res_len].decode("utf-8")))
+    return []
+
+
+def peak_allocated(call, calls: int = 20) -> float:
+    """Peak bytes allocated during `calls` calls, counted by tracemalloc."""
+    call()  # Warm up, the shared buffer is allocated once.
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(calls):
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+@requires_benchmark
+class TestGetJobsReceivePath(unittest.TestCase):
+    """Hook.get_jobs against the previous allocate-per-poll implementation."""
+
+    def test_empty_poll(self):
+        hook = make_hook(FakeGetJobs())
+
+        assert_within_budget("sls_get_jobs_empty_poll_us", time_us(lambda: hook.get_jobs(1, 1)))
+        assert_within_budget(
+            "sls_get_jobs_empty_poll_peak_alloc_kb",
+            peak_allocated(lambda: hook.get_jobs(1, 1)) / 1024,
+        )
+        record("sls_get_jobs_legacy_empty_poll_us", time_us(lambda: legacy_get_jobs(hook, 1, 1)))
+        record(
+            "sls_get_jobs_legacy_empty_poll_peak_alloc_kb",
+            peak_allocated(lambda: legacy_get_jobs(hook, 1, 1)) / 1024,
+        )
+
+    def test_jobs_poll(self):
+        payload = json.dumps(JOBS).encode()
+        hook = make_hook(FakeGetJobs(payload))
+        self.assertEqual(hook.get_jobs(10, 10), JOBS)
+
+        record("sls_get_jobs_1mb_poll_us", time_us(lambda: hook.get_jobs(10, 10)))
+        record("sls_get_jobs_legacy_1mb_poll_us", time_us(lambda: legacy_get_jobs(hook, 10, 10)))
+
+    def test_buffer_grows(self):
+        payload = json.dumps([{"id": "big", "input": {"data": "x" * (core.JOBS_BUFFER_SIZE + 1)}}])
+        hook = make_hook(FakeGetJobs(payload.encode()))
+
+        self.assertEqual(hook.get_jobs(1, 1)[0]["id"], "big")
+        self.assertGreaterEqual(len(hook._jobs_buffer), len(payload))
+
+
+def noop_handler(job):
+    return job["input"]
+
+
+async def sleep_handler(job):
+    await asyncio.sleep(0.01)
+    return job["input"]
+
+
+async def run_local_hook(handler, duration: float, concurrency: int, max_jobs: int) -> float:
+    """Jobs/sec of the sls-core worker taking jobs from a LocalHook, without HTTP."""
+    # More jobs than the worker can finish in time.
+    hook = LocalHook({"id": f"job-{index}", "input": {}} for index in range(int(duration * 20_000)))
+    serverless_hook = core.AsyncHook(hook)
+    scaler = core._job_scaler(
+        {
+            "handler": handler,
+            "rp_args": {},
+            "max_concurrency": concurrency,
+            "max_jobs": max_jobs,
+        },
+        serverless_hook,
+    )
+
+    worker = asyncio.create_task(scaler.run())
+    await asyncio.sleep(duration)
+    jobs = len(hook.outputs)
+    scaler.kill_worker()
+    await asyncio.wait_for(worker, 60)
+    serverless_hook.shutdown()
+    return round(jobs / duration, 2)
+
+
+@requires_benchmark
+class TestSlsCoreThroughput(unittest.TestCase):
+    """Jobs/sec of the sls-core worker and the JobScaler worker, head to head."""
+
+    def _compare(self, name, handler, concurrency=1, max_jobs=1):
+        scaler = asyncio.run(
+            run_scaler(handler, duration=DURATION, concurrency=concurrency, seed=0)
+        )
+        sls = asyncio.run(
+            run_sls_core(
+                handler, duration=DURATION, concurrency=concurrency, max_jobs=max_jobs, seed=0
+            )
+        )
+        self.assertGreater(sls["jobs"], 0)
+
+        record(f"{name}_scaler_jobs_per_sec", scaler["jobs_per_sec"])
+        record(f"{name}_sls_p50_ms", sls["p50_ms"])
+        record(f"{name}_sls_p99_ms", sls["p99_ms"])
+        record(
+            f"{name}_sls_vs_scaler",
+            round(sls["jobs_per_sec"] / scaler["jobs_per_sec"], 3) if scaler["jobs_per_sec"] else 0,
+        )
+        assert_above_budget(f"{name}_sls_jobs_per_sec", sls["jobs_per_sec"])
+
+    def test_noop_handler(self):
+        self._compare("sls_throughput_noop", noop_handler)
+
+    def test_sleep_handler_concurrent(self):
+        self._compare("sls_throughput_sleep_concurrent", sleep_handler, concurrency=10, max_jobs=10)
+
+    def test_local_hook(self):
+        """The sls-core worker without HTTP, the overhead of the worker alone."""
+        start = time.perf_counter()
+        jobs_per_sec = asyncio.run(run_local_hook(noop_handler, DURATION, 10, 10))
+        self.assertLess(time.perf_counter() - start, DURATION + 30)
+        record("sls_local_noop_jobs_per_sec", jobs_per_sec)
@@ -0,0 +1,75 @@
+"""
+Throughput and latency of a JobScaler against the local fake job API.
+"""
+
+import asyncio
+import os
+import random
+import unittest
+
+from .harness import run_scaler
+from .helpers import assert_above_budget, record, requires_benchmark
+
+# Seconds each scenario runs for.
+DURATION = float(os.environ.get("RUNPOD_BENCH_DURATION", "5"))
+
+
+def noop_handler(job):
+    return job["input"]
+
+
+async def sleep_handler(job):
+    await asyncio.sleep(0.01)
+    return job["input"]
+
+
+async def varying_handler(job):
+    await asyncio.sleep(random.uniform(0, 0.1))
+    return job["input"]
+
+
+@requires_benchmark
+class TestScalerThroughput(unittest.TestCase):
+    """Jobs/sec and end-to-end latency for a single worker."""
+
+    def _run(self, name, handler, **options):
+        result = asyncio.run(run_scaler(handler, duration=DURATION, seed=0, **options))
+        self.assertGreater(result["jobs"], 0)
+
+        record(f"{name}_p50_ms", result["p50_ms"])
+        record(f"{name}_p99_ms", result["p99_ms"])
+        assert_above_budget(f"{name}_jobs_per_sec", result["jobs_per_sec"])
+        return result
+
+    def test_noop_handler(self):
+        self._run("throughput_noop", noop_handler)
+
+    def test_noop_handler_concurrent(self):
+        self._run("throughput_noop_concurrent", noop_handler, concurrency=10)
+
+    def test_async_sleep_handler_concurrent(self):
+        self._run("throughput_sleep_concurrent", sleep_handler, concurrency=10)
+
+    def test_parallel_job_takes(self):
+        """Jobs of varying length against a slow job API, one and four job-take requests."""
+        for parallel in (1, 4):
+            self._run(
+                f"throughput_takes_{parallel}",
+                varying_handler,
+                concurrency=32,
+                latency=0.05,
+                config={"parallel_job_takes": parallel},
+            )
+
+    def test_api_latency_and_faults(self):
+        """Job-take latency with occasional empty, throttled and failed responses."""
+        result = self._run(
+            "throughput_faults",
+            noop_handler,
+            concurrency=10,
+            latency=0.005,
+            no_job_rate=0.05,
+            throttle_rate=0.01,
+            error_rate=0.01,
+        )
+        self.assertGreater(result["counters"].get("job_take_batch", 0), 0)
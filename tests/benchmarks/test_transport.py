@@ -0,0 +1,76 @@
+"""
+Throughput of the JobScaler on each transport, with the same handlers.
+
+The job API transport runs against the fake job API, the sls-core transport against
+the in-process LocalHook in place of sls_core.so.
+"""
+
+import asyncio
+import os
+import unittest
+
+from runpod.serverless import core
+from runpod.serverless.modules.rp_sls_local import LocalHook
+from runpod.serverless.modules.rp_transport import InMemoryTransport
+
+from .harness import run_scaler, run_transport
+from .helpers import assert_above_budget, record, requires_benchmark
+
+# Seconds each scenario runs for.
+DURATION = float(os.environ.get("RUNPOD_BENCH_DURATION", "5"))
+
+# More jobs than a worker can finish in time.
+JOBS = int(DURATION * 20_000)
+
+
+def noop_handler(job):
+    return job["input"]
+
+
+def generator_handler(job):
+    yield from range(5)
+
+
+def make_jobs():
+    return ({"id": f"job-{index}", "input": {}} for index in range(JOBS))
+
+
+async def run_in_memory(handler, concurrency):
+    transport = InMemoryTransport(make_jobs())
+    return await run_transport(
+        handler, transport, lambda: len(transport.results), DURATION, concurrency
+    )
+
+
+async def run_sls(handler, concurrency):
+    hook = LocalHook(make_jobs())
+    transport = core.SlsTransport(core.AsyncHook(hook), max_jobs=concurrency)
+    return await run_transport(handler, transport, lambda: len(hook.outputs), DURATION, concurrency)
+
+
+@requires_benchmark
+class TestTransportThroughput(unittest.TestCase):
+    """Jobs/sec of the JobScaler on the job API, sls-core and in-memory transports."""
+
+    def _run_all(self, name, handler, concurrency):
+        results = {
+            "http": asyncio.run(run_scaler(handler, duration=DURATION, concurrency=concurrency)),
+            "sls": asyncio.run(run_sls(handler, concurrency)),
+            "memory": asyncio.run(run_in_memory(handler, concurrency)),
+        }
+        for transport, result in results.items():
+            self.assertGreater(result["jobs"], 0)
+            record(f"transport_{transport}_{name}_jobs_per_sec", result["jobs_per_sec"])
+
+        assert_above_budget(
+            f"transport_memory_{name}_jobs_per_sec", results["memory"]["jobs_per_sec"]
+        )
+
+    def test_noop_handler(self):
+        self._run_all("noop", noop_handler, concurrency=1)
+
+    def test_noop_handler_concurrent(self):
+        self._run_all("noop_concurrent", noop_handler, concurrency=10)
+
+    def test_generator_handler_concurrent(self):
+        self._run_all("generator_concurrent", generator_handler, concurrency=10)
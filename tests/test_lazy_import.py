@@ -0,0 +1,92 @@
+""" Tests that heavy dependencies are only imported when they are used. """
+
+import json
+import subprocess
+import sys
+import unittest
+
+# Modules a queue worker should never import.
+HEAVY_MODULES = ["boto3", "cpuinfo", "fastapi", "paramiko", "pydantic", "uvicorn"]
+
+
+def _run_isolated(code: str) -> dict:
+    """Runs code in a fresh interpreter and returns the JSON it prints."""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+        timeout=60,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _imported_modules(statement: str) -> dict:
+    code = (
+        "import json, sys\n"
+        f"{statement}\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'heavy': heavy}))\n"
+    )
+    return _run_isolated(code)
+
+
+class TestLazyImport(unittest.TestCase):
+    """Tests for the lazily loaded package structure."""
+
+    def test_import_runpod(self):
+        """`import runpod` does not import any heavy dependency."""
+        self.assertEqual(_imported_modules("import runpod")["heavy"], [])
+
+    def test_import_serverless(self):
+        """A queue worker does not import the API server, boto3, paramiko or cpuinfo."""
+        result = _imported_modules(
+            "import runpod\n"
+            "from runpod.serverless import worker\n"
+            "from runpod.serverless.modules import rp_scale"
+        )
+        self.assertEqual(result["heavy"], [])
+
+    def test_lazy_attributes(self):
+        """The public API is still available as attributes of the package."""
+        result = _run_isolated(
+            "import json, runpod\n"
+            "names = [runpod.Endpoint.__name__, runpod.AsyncioEndpoint.__name__,\n"
+            "         runpod.get_gpus.__name__, runpod.RunPodLogger.__name__,\n"
+            "         runpod.serverless.rp_fastapi.WorkerAPI.__name__,\n"
+            "         runpod.serverless.utils.upload_file_to_bucket.__name__,\n"
+            "         runpod.cli.ssh.__name__]\n"
+            "print(json.dumps(names))\n"
+        )
+        self.assertEqual(
+            result,
+            [
+                "Endpoint",
+                "Endpoint",
+                "get_gpus",
+                "RunPodLogger",
+                "WorkerAPI",
+                "upload_file_to_bucket",
+                "runpod.cli.groups.ssh",
+            ],
+        )
+
+    def test_unknown_attribute(self):
+        """Unknown attributes still raise AttributeError."""
+        import runpod  # pylint: disable=import-outside-toplevel
+
+        with self.assertRaises(AttributeError):
+            runpod.not_a_runpod_attribute  # pylint: disable=pointless-statement
+
+        with self.assertRaises(AttributeError):
+            runpod.serverless.not_a_serverless_attribute  # pylint: disable=pointless-statement
+
+    def test_api_key_override(self):
+        """Setting runpod.api_key takes precedence over the credentials file."""
+        result = _run_isolated(
+            "import json, runpod\n"
+            "runpod.api_key = 'set-by-user'\n"
+            "from runpod import api_key\n"
+            "print(json.dumps(api_key))\n"
+        )
+        self.assertEqual(result, "set-by-user")
@@ -0,0 +1,234 @@
+""" Tests for runpod | serverless | core """
+
+# pylint: disable=protected-access
+
+import asyncio
+import ctypes
+import json
+import threading
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from runpod.serverless import core
+
+JOBS = [{"id": f"job-{index}", "input": {"data": "x" * 100}} for index in range(3)]
+
+
+class FakeGetJobs:  # pylint: disable=too-few-public-methods
+    """Stands in for _runpod_sls_get_jobs, answers with `payload` or STILL_WAITING."""
+
+    def __init__(self, payload: bytes = b""):
+        self.payload = payload
+        self.buffer_sizes = []
+
+    def __call__(self, max_concurrency, max_jobs, buf_ref, buf_len):
+        self.buffer_sizes.append(buf_len.value)
+        if not self.payload:
+            return core.CGetJobResult(status_code=core.STILL_WAITING, res_len=0)
+        if len(self.payload) > buf_len.value:
+            return core.CGetJobResult(
+                status_code=core.ERROR_BUFFER_TOO_SMALL, res_len=len(self.payload)
+            )
+        ctypes.memmove(buf_ref._obj, self.payload, len(self.payload))
+        return core.CGetJobResult(status_code=core.OK, res_len=len(self.payload))
+
+
+def make_hook(get_jobs: FakeGetJobs) -> core.Hook:
+    """A Hook that is not the singleton and does not load sls_core.so."""
+    hook = object.__new__(core.Hook)
+    hook._get_jobs = get_jobs
+    return hook
+
+
+@patch.object(core, "JOBS_BUFFER_SIZE", 64)
+@patch.object(core, "MAX_JOBS_BUFFER_SIZE", 4096)
+class TestHookGetJobs(unittest.TestCase):
+    """Tests for Hook.get_jobs and its jobs buffer."""
+
+    def test_no_jobs(self):
+        get_jobs = FakeGetJobs()
+        hook = make_hook(get_jobs)
+
+        self.assertEqual(hook.get_jobs(1, 1), [])
+        self.assertEqual(hook.get_jobs(1, 1), [])
+        self.assertEqual(get_jobs.buffer_sizes, [64, 64])
+
+    def test_buffer_reused(self):
+        hook = make_hook(FakeGetJobs(b'[{"id": "job-0"}]'))
+
+        self.assertEqual(hook.get_jobs(1, 1), [{"id": "job-0"}])
+        buffer = hook._jobs_buffer
+        hook.get_jobs(1, 1)
+
+        self.assertIs(hook._jobs_buffer, buffer)
+
+    def test_buffer_grows(self):
+        payload = json.dumps(JOBS).encode()
+        get_jobs = FakeGetJobs(payload)
+        hook = make_hook(get_jobs)
+
+        self.assertEqual(hook.get_jobs(3, 3), JOBS)
+        # Doubled was not enough, so it grew to the size sls_core asked for.
+        self.assertEqual(get_jobs.buffer_sizes, [64, len(payload)])
+
+        self.assertEqual(hook.get_jobs(3, 3), JOBS)
+        self.assertEqual(get_jobs.buffer_sizes[-1], len(payload))
+
+    def test_buffer_doubles(self):
+        payload = b'[{"id": "job-0", "input": "' + b"x" * 60 + b'"}]'
+        get_jobs = FakeGetJobs(payload)
+        hook = make_hook(get_jobs)
+
+        hook.get_jobs(1, 1)
+
+        self.assertEqual(get_jobs.buffer_sizes, [64, 128])
+
+    def test_buffer_at_maximum(self):
+        get_jobs = FakeGetJobs(b"[" + b" " * 5000 + b"]")
+        hook = make_hook(get_jobs)
+
+        with self.assertRaises(core.SlsCoreError) as context:
+            hook.get_jobs(1, 1)
+
+        self.assertIn("buffer too small", str(context.exception))
+        self.assertEqual(get_jobs.buffer_sizes, [64, 4096])
+        self.assertEqual(len(hook._jobs_buffer), 4096)
+
+    def test_error_from_server(self):
+        hook = make_hook(lambda *args: core.CGetJobResult(status_code=2, res_len=0))
+
+        with self.assertRaises(core.SlsCoreError):
+            hook.get_jobs(1, 1)
+
+    def test_unknown_status_code(self):
+        hook = make_hook(lambda *args: core.CGetJobResult(status_code=9, res_len=0))
+
+        with self.assertRaises(ValueError):
+            hook.get_jobs(1, 1)
+
+
+class RecordingHook:
+    """Stands in for the Hook, records the thread of each call."""
+
+    def __init__(self):
+        self.calls = []
+        self.polling = threading.Event()
+        self.release_poll = threading.Event()
+
+    def _record(self, name, *args):
+        self.calls.append((name, threading.current_thread().name, args))
+        return True
+
+    def _json_serialize_job_data(self, job_data):
+        return json.dumps(job_data).encode()
+
+    def get_jobs(self, max_concurrency, max_jobs):
+        self._record("get_jobs", max_concurrency, max_jobs)
+        self.polling.set()
+        self.release_poll.wait(5)
+        return JOBS
+
+    def send_stream_output(self, job_id, job_output):
+        return self._record("send_stream_output", job_id, job_output)
+
+    def post_output(self, job_id, job_output):
+        return self._record("post_output", job_id, job_output)
+
+    def finish_stream(self, job_id):
+        return self._record("finish_stream", job_id)
+
+    def progress_update(self, job_id, json_data):
+        return self._record("progress_update", job_id, json_data)
+
+
+class TestAsyncHook(IsolatedAsyncioTestCase):
+    """Tests for the AsyncHook executors."""
+
+    async def asyncSetUp(self):
+        self.hook = RecordingHook()
+        self.async_hook = core.AsyncHook(self.hook)
+
+    async def asyncTearDown(self):
+        self.hook.release_poll.set()
+        self.async_hook.shutdown()
+
+    async def test_executors(self):
+        self.hook.release_poll.set()
+
+        self.assertEqual(await self.async_hook.get_jobs(2, 3), JOBS)
+        await self.async_hook.post_output("job-0", {"output": 1})
+        await self.async_hook.progress_update("job-0", {"step": 1})
+
+        threads = {name: thread for name, thread, _ in self.hook.calls}
+        self.assertTrue(threads["get_jobs"].startswith("sls-jobs"))
+        self.assertTrue(threads["post_output"].startswith("sls-output"))
+        self.assertTrue(threads["progress_update"].startswith("sls-output"))
+        self.assertEqual(self.hook.calls[0][2], (2, 3))
+        self.assertEqual(self.hook.calls[2][2], ("job-0", b'{"step": 1}'))
+
+    async def test_output_not_blocked_by_poll(self):
+        """Results are sent while a job poll is still waiting on sls_core."""
+        poll = asyncio.ensure_future(self.async_hook.get_jobs(1, 1))
+        await asyncio.get_running_loop().run_in_executor(None, self.hook.polling.wait, 5)
+
+        self.assertTrue(await asyncio.wait_for(self.async_hook.post_output("job-0", {}), 1))
+        self.assertFalse(poll.done())
+
+        self.hook.release_poll.set()
+        self.assertEqual(await asyncio.wait_for(poll, 1), JOBS)
+
+    async def test_output_order(self):
+        """The outputs of a job are sent in the order they were made."""
+        calls = [self.async_hook.stream_output("job-0", {"output": index}) for index in range(5)]
+        calls.append(self.async_hook.finish_stream("job-0"))
+        calls.append(self.async_hook.post_output("job-0", {"output": "done"}))
+        await asyncio.gather(*calls)
+
+        self.assertEqual(
+            [(name, args[-1]) for name, _, args in self.hook.calls],
+            [("send_stream_output", {"output": index}) for index in range(5)]
+            + [("finish_stream", "job-0"), ("post_output", {"output": "done"})],
+        )
+
+
+class TestSlsTransport(IsolatedAsyncioTestCase):
+    """Tests for the SlsTransport."""
+
+    async def asyncSetUp(self):
+        self.hook = RecordingHook()
+        self.transport = core.SlsTransport(core.AsyncHook(self.hook), max_jobs=3)
+
+    async def asyncTearDown(self):
+        self.hook.release_poll.set()
+        self.transport.close()
+
+    async def _timed_out_acquire(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.transport.acquire(None, 3), 0.05)
+
+    async def test_jobs_returned_after_timeout(self):
+        """Jobs returned after an acquire timed out are taken by the next acquires."""
+        await self._timed_out_acquire()
+
+        self.hook.release_poll.set()
+        self.assertEqual(await asyncio.wait_for(self.transport.acquire(None, 1), 1), JOBS[:1])
+        self.assertEqual(await asyncio.wait_for(self.transport.acquire(None, 3), 1), JOBS[1:])
+
+        self.assertEqual([name for name, _, _ in self.hook.calls], ["get_jobs"])
+        self.assertEqual(self.transport._in_progress, {job["id"] for job in JOBS})
+
+    async def test_jobs_returned_after_cancel_released(self):
+        """Jobs returned after the last acquire was cancelled are released on close."""
+        await self._timed_out_acquire()
+
+        self.hook.release_poll.set()
+        while self.transport._poll is not None:
+            await asyncio.sleep(0.01)
+        self.transport.close()
+
+        self.assertEqual(
+            [args for name, _, args in self.hook.calls if name == "post_output"],
+            [(job["id"], {"error": core.RELEASED_JOB_ERROR}) for job in JOBS],
+        )
+        self.assertEqual(self.transport._in_progress, set())
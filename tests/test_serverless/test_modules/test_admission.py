@@ -0,0 +1,104 @@
+""" Tests for runpod.serverless.modules.rp_admission """
+
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from runpod.serverless.modules.rp_admission import (
+    AdmissionController,
+    AdmissionRejected,
+    get_admission_settings,
+)
+
+
+class TestAdmissionSettings(TestCase):
+    """Tests for get_admission_settings."""
+
+    def test_defaults(self):
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertEqual(
+                get_admission_settings({}),
+                {"max_in_flight": 0, "max_queue": 0, "queue_timeout": 10.0},
+            )
+
+    def test_config_and_env(self):
+        env = {"RUNPOD_REALTIME_MAX_IN_FLIGHT": "4", "RUNPOD_REALTIME_MAX_QUEUE": "8"}
+        with patch.dict("os.environ", env):
+            settings = get_admission_settings({"realtime_max_in_flight": 2})
+
+        self.assertEqual(settings["max_in_flight"], 2)
+        self.assertEqual(settings["max_queue"], 8)
+
+
+class TestAdmissionController(IsolatedAsyncioTestCase):
+    """Tests for the AdmissionController."""
+
+    async def test_no_limit(self):
+        controller = AdmissionController()
+        for _ in range(100):
+            await controller.acquire()
+        self.assertEqual(controller.in_flight, 100)
+
+    async def test_queue_in_order(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=2)
+        order = []
+
+        async def request(name):
+            async with controller.admit():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request(name) for name in "abc"))
+
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(controller.in_flight, 0)
+        metrics = controller.metrics()
+        self.assertEqual(metrics["admitted"], 3)
+        self.assertGreater(metrics["queue_time_max_ms"], 0)
+
+    async def test_queue_full(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=1)
+        await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        with self.assertRaises(AdmissionRejected) as context:
+            await controller.acquire()
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(context.exception.retry_after, 1)
+
+        controller.release()
+        await queued
+        self.assertEqual(controller.in_flight, 1)
+        self.assertEqual(controller.metrics()["rejected"], 1)
+
+    async def test_queue_timeout(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.01)
+        await controller.acquire()
+
+        with self.assertRaises(AdmissionRejected) as context:
+            await controller.acquire()
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(controller.queued, 0)
+        self.assertEqual(controller.metrics()["timed_out"], 1)
+
+    async def test_cancelled_in_queue(self):
+        controller = AdmissionController(max_in_flight=1, max_queue=1)
+        await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        queued.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await queued
+
+        # The slot is not handed to the cancelled request.
+        controller.release()
+        self.assertEqual(controller.in_flight, 0)
+        self.assertEqual(controller.metrics()["cancelled"], 1)
+
+    async def test_retry_after(self):
+        controller = AdmissionController(max_in_flight=2, max_queue=0)
+        await controller.acquire()
+        controller.release(duration=3.0)
+        self.assertEqual(controller.retry_after(), 2)
@@ -0,0 +1,97 @@
+""" Tests for runpod.serverless.modules.rp_backoff """
+
+import email.utils
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+from runpod.serverless.modules.rp_backoff import (
+    Backoff,
+    get_backoff,
+    get_jobs_fetcher_timeout,
+    parse_retry_after,
+)
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    """Tests for parse_retry_after."""
+
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertEqual(parse_retry_after("-3"), 0.0)
+
+    def test_http_date(self):
+        retry_at = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(retry_at), 30, delta=2)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after(""))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+class TestBackoff(unittest.TestCase):
+    """Tests for the Backoff policy."""
+
+    def test_exponential_with_jitter(self):
+        """Delays double with every failure, jittered between half and the full delay."""
+        backoff = Backoff(base=1, factor=2, max_delay=100)
+
+        for attempt in range(5):
+            delay = backoff.next_delay()
+            self.assertGreaterEqual(delay, 2**attempt / 2)
+            self.assertLessEqual(delay, 2**attempt)
+
+        self.assertEqual(backoff.attempts, 5)
+
+    def test_max_delay(self):
+        backoff = Backoff(base=1, max_delay=3)
+        delays = [backoff.next_delay() for _ in range(10)]
+        self.assertLessEqual(max(delays), 3)
+
+    def test_reset(self):
+        backoff = Backoff(base=1)
+        for _ in range(5):
+            backoff.next_delay()
+
+        backoff.reset()
+
+        self.assertLessEqual(backoff.next_delay(), 1)
+
+    def test_retry_after(self):
+        """A Retry-After is honoured up to its ceiling, with at most a second of jitter."""
+        backoff = Backoff(max_retry_after=20)
+
+        self.assertTrue(5 <= backoff.next_delay(retry_after=5) <= 5.5)
+        self.assertTrue(20 <= backoff.next_delay(retry_after=600) <= 21)
+        self.assertEqual(backoff.next_delay(retry_after=0), 0)
+
+
+class TestConfig(unittest.TestCase):
+    """Tests for the configuration helpers."""
+
+    def test_get_backoff_from_config(self):
+        backoff = Backoff()
+        self.assertIs(get_backoff({"jobs_fetcher_backoff": backoff}), backoff)
+
+    def test_get_backoff_from_env(self):
+        env = {
+            "RUNPOD_BACKOFF_BASE": "0.5",
+            "RUNPOD_BACKOFF_MAX": "10",
+            "RUNPOD_BACKOFF_MAX_RETRY_AFTER": "15",
+        }
+        with patch.dict(os.environ, env):
+            backoff = get_backoff({})
+
+        self.assertEqual(backoff.base, 0.5)
+        self.assertEqual(backoff.max_delay, 10)
+        self.assertEqual(backoff.max_retry_after, 15)
+
+    def test_get_jobs_fetcher_timeout(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(get_jobs_fetcher_timeout({}), 90)
+            self.assertEqual(get_jobs_fetcher_timeout({"jobs_fetcher_timeout": 30}), 30)
+
+        with patch.dict(os.environ, {"RUNPOD_JOBS_FETCHER_TIMEOUT": "45"}):
+            self.assertEqual(get_jobs_fetcher_timeout({}), 45)
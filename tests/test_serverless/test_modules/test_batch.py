@@ -0,0 +1,76 @@
+""" Tests for runpod.serverless.modules.rp_batch """
+
+import asyncio
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from runpod.serverless.modules.rp_batch import MicroBatcher, get_batch_settings
+
+
+def make_job(index):
+    return {"id": f"job-{index}", "input": index}
+
+
+class TestBatchSettings(TestCase):
+    """Tests for get_batch_settings."""
+
+    def test_defaults(self):
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertEqual(get_batch_settings({}), {"max_batch_size": 8, "max_wait": 0.005})
+
+    def test_config_and_env(self):
+        with patch.dict("os.environ", {"RUNPOD_REALTIME_BATCH_WAIT_MS": "20"}):
+            settings = get_batch_settings({"realtime_max_batch_size": 4})
+        self.assertEqual(settings, {"max_batch_size": 4, "max_wait": 0.02})
+
+
+class TestMicroBatcher(IsolatedAsyncioTestCase):
+    """Tests for the MicroBatcher."""
+
+    def setUp(self):
+        self.batches = []
+
+    async def batch_handler(self, jobs):
+        self.batches.append([job["id"] for job in jobs])
+        return [job["input"] * 10 for job in jobs]
+
+    async def test_demultiplexed(self):
+        batcher = MicroBatcher(self.batch_handler, max_batch_size=8, max_wait=0.01)
+
+        results = await asyncio.gather(*(batcher.submit(make_job(index)) for index in range(3)))
+
+        self.assertEqual(results, [{"output": 0}, {"output": 10}, {"output": 20}])
+        self.assertEqual(self.batches, [["job-0", "job-1", "job-2"]])
+
+    async def test_max_batch_size(self):
+        batcher = MicroBatcher(self.batch_handler, max_batch_size=2, max_wait=10)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(make_job(index)) for index in range(4))), 1
+        )
+
+        self.assertEqual([result["output"] for result in results], [0, 10, 20, 30])
+        self.assertEqual(self.batches, [["job-0", "job-1"], ["job-2", "job-3"]])
+        self.assertEqual(
+            batcher.metrics(), {"batches": 2, "batch_size_avg": 2.0, "max_batch_size": 2}
+        )
+
+    async def test_max_wait(self):
+        batcher = MicroBatcher(self.batch_handler, max_batch_size=8, max_wait=0.01)
+
+        first = await batcher.submit(make_job(0))
+        second = await batcher.submit(make_job(1))
+
+        self.assertEqual((first, second), ({"output": 0}, {"output": 10}))
+        self.assertEqual(self.batches, [["job-0"], ["job-1"]])
+
+    async def test_cancelled_request(self):
+        batcher = MicroBatcher(self.batch_handler, max_batch_size=8, max_wait=0.01)
+
+        cancelled = asyncio.create_task(batcher.submit(make_job(0)))
+        kept = asyncio.create_task(batcher.submit(make_job(1)))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        self.assertEqual(await kept, {"output": 10})
+        self.assertEqual(self.batches, [["job-1"]])
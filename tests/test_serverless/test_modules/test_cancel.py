@@ -0,0 +1,165 @@
+""" Tests for runpod.serverless.modules.rp_cancel """
+
+import asyncio
+import json
+import os
+import time
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from runpod.serverless.modules import rp_cancel, rp_job
+from runpod.serverless.modules.rp_cancel import (
+    DEADLINE_EXCEEDED,
+    CancellationToken,
+    JobCancelled,
+    cancel_job,
+    get_cancellation_token,
+    get_execution_timeout,
+    release_token,
+    start_deadline,
+)
+
+
+class TestCancellationToken(IsolatedAsyncioTestCase):
+    """Tests for the CancellationToken class."""
+
+    def test_cancel(self):
+        token = CancellationToken()
+        self.assertFalse(token.cancelled)
+        self.assertIsNone(token.remaining())
+        token.raise_if_cancelled()
+
+        token.cancel("stop")
+        token.cancel("again")
+
+        self.assertTrue(token.cancelled)
+        with self.assertRaises(JobCancelled) as context:
+            token.raise_if_cancelled()
+        self.assertEqual(str(context.exception), "stop")
+
+    def test_deadline(self):
+        """A token is cancelled once its deadline has passed, also without a running loop."""
+        token = CancellationToken(deadline=time.monotonic() - 1)
+        self.assertEqual(token.remaining(), 0)
+        self.assertTrue(token.cancelled)
+        self.assertEqual(token.reason, DEADLINE_EXCEEDED)
+
+    async def test_run_returns_result(self):
+        token = CancellationToken(deadline=time.monotonic() + 10)
+        self.assertEqual(await token.run(asyncio.sleep(0, result="done")), "done")
+
+    async def test_run_cancelled_at_deadline(self):
+        """The task is cancelled at the deadline."""
+        stopped = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        token = CancellationToken(deadline=time.monotonic() + 0.05)
+        with self.assertRaises(JobCancelled):
+            await asyncio.wait_for(token.run(work()), timeout=1)
+        self.assertTrue(stopped.is_set())
+
+    async def test_run_cancelled(self):
+        token = CancellationToken()
+        asyncio.get_running_loop().call_later(0.01, token.cancel, "stop")
+
+        with self.assertRaises(JobCancelled) as context:
+            await asyncio.wait_for(token.run(asyncio.sleep(10)), timeout=1)
+        self.assertEqual(str(context.exception), "stop")
+
+    async def test_run_already_cancelled(self):
+        """A cancelled token does not start the awaitable."""
+        token = CancellationToken()
+        token.cancel()
+        started = []
+
+        async def work():
+            started.append(True)
+
+        with self.assertRaises(JobCancelled):
+            await token.run(work())
+        self.assertEqual(started, [])
+
+
+class TestTokens(IsolatedAsyncioTestCase):
+    """Tests for the job token registry."""
+
+    def tearDown(self):
+        rp_cancel._tokens.clear()
+
+    def test_get_execution_timeout(self):
+        self.assertIsNone(get_execution_timeout({}, {"id": "1"}))
+        self.assertEqual(get_execution_timeout({"execution_timeout": 30}, {"id": "1"}), 30)
+        job = {"id": "1", "policy": {"executionTimeout": 1500}}
+        self.assertEqual(get_execution_timeout({"execution_timeout": 30}, job), 1.5)
+
+        with patch.dict(os.environ, {"RUNPOD_EXECUTION_TIMEOUT": "12"}):
+            self.assertEqual(get_execution_timeout({}, {"id": "1"}), 12)
+        with patch.dict(os.environ, {"RUNPOD_EXECUTION_TIMEOUT": "0"}):
+            self.assertIsNone(get_execution_timeout({}, {"id": "1"}))
+
+    def test_registry(self):
+        token = start_deadline({"id": "job-1"}, {"execution_timeout": 60})
+        self.assertIs(get_cancellation_token("job-1"), token)
+        self.assertAlmostEqual(token.remaining(), 60, delta=1)
+
+        self.assertTrue(cancel_job("job-1", "stop"))
+        self.assertTrue(token.cancelled)
+
+        release_token("job-1")
+        self.assertFalse(cancel_job("job-1"))
+        self.assertIsNot(get_cancellation_token("job-1"), token)
+
+
+class TestHandleJobDeadline(IsolatedAsyncioTestCase):
+    """Tests for deadlines in rp_job.handle_job."""
+
+    def tearDown(self):
+        rp_cancel._tokens.clear()
+
+    async def _handle(self, handler, job):
+        config = {"handler": handler, "rp_args": {}}
+        with patch("runpod.serverless.modules.rp_job.send_result", AsyncMock()) as send:
+            await asyncio.wait_for(rp_job.handle_job(MagicMock(), config, job), timeout=2)
+        return send.await_args.args[1]
+
+    async def test_async_handler_stopped_at_deadline(self):
+        job = {"id": "job-1", "input": {}, "policy": {"executionTimeout": 50}}
+        start_deadline(job, {})
+
+        async def handler(job):  # pylint: disable=unused-argument
+            await asyncio.sleep(10)
+
+        result = await self._handle(handler, job)
+
+        error = json.loads(result["error"])
+        self.assertIn("JobCancelled", error["error_type"])
+        self.assertEqual(error["error_message"], DEADLINE_EXCEEDED)
+
+    async def test_expired_job_not_run(self):
+        """A job whose deadline passed while it was queued is not run."""
+        job = {"id": "job-1", "input": {}}
+        get_cancellation_token("job-1").deadline = time.monotonic() - 1
+        handler = MagicMock()
+
+        result = await self._handle(handler, job)
+
+        handler.assert_not_called()
+        self.assertIn("error", result)
+
+    async def test_cooperative_cancellation(self):
+        """Synchronous handlers stop by checking their token."""
+
+        def handler(job):
+            token = get_cancellation_token(job["id"])
+            token.cancel("stop")
+            token.raise_if_cancelled()
+
+        result = await self._handle(handler, {"id": "job-1", "input": {}})
+
+        self.assertEqual(json.loads(result["error"])["error_message"], "stop")
@@ -3,15 +3,22 @@
 # pylint: disable=protected-access
 
 import asyncio
+import json
 import os
+import socket
 import unittest
-from unittest.mock import MagicMock, Mock, patch
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock, Mock, call, patch
 
 import pytest
 import requests
 
 import runpod
+from fastapi import HTTPException
 from runpod.serverless.modules import rp_fastapi
+from runpod.serverless.modules.rp_admission import AdmissionController
+from runpod.serverless.modules.rp_job_store import JobStore
+from runpod.serverless.modules.rp_scale import JobsProgress
 
 
 class TestFastAPI(unittest.TestCase):
@@ -120,7 +127,8 @@ class TestFastAPI(unittest.TestCase):
             debug_run_return = asyncio.run(worker_api._sim_run(default_input_object))
             assert debug_run_return == {"id": "test-123", "status": "IN_PROGRESS"}
 
-            self.assertTrue(mock_ping.called)
+            # The heartbeat starts with the server, in the process that serves.
+            self.assertFalse(mock_ping.called)
 
             # Test with generator handler
             def generator_handler(job):
@@ -197,139 +205,349 @@ class TestFastAPI(unittest.TestCase):
 
         loop.close()
 
-    @pytest.mark.asyncio
-    def test_stream(self):
-        """
-        Tests the _stream() method.
-        """
-        loop = asyncio.get_event_loop()
 
+class TestStartUvicorn(unittest.TestCase):
+    """Tests serving the API from one or several processes."""
+
+    def setUp(self):
         module_location = "runpod.serverless.modules.rp_fastapi"
-        with patch(f"{module_location}.FastAPI", Mock()), patch(
-            f"{module_location}.APIRouter", return_value=Mock()
-        ), patch(f"{module_location}.uvicorn", Mock()), patch(
-            f"{module_location}.uuid.uuid4", return_value="123"
-        ), patch(
-            f"{module_location}.threading"
-        ) as mock_threading:
+        self.patches = [
+            patch(f"{module_location}.Heartbeat.start_ping", Mock()),
+            patch(f"{module_location}.FastAPI", Mock()),
+            patch(f"{module_location}.APIRouter", return_value=Mock()),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+        self.worker_api = rp_fastapi.WorkerAPI({"handler": Mock()})
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+
+    def test_one_process(self):
+        with patch.object(rp_fastapi, "uvicorn") as mock_uvicorn, patch.object(
+            rp_fastapi, "ForkServer"
+        ) as mock_fork_server:
+            self.worker_api.start_uvicorn("localhost", "8000", 1)
+
+        mock_fork_server.assert_not_called()
+        rp_fastapi.Heartbeat.start_ping.assert_called_once()
+        self.assertEqual(mock_uvicorn.run.call_args.kwargs["port"], 8000)
+        self.assertNotIn("workers", mock_uvicorn.run.call_args.kwargs)
+
+    def _start_processes(self, env):
+        with patch.dict(os.environ, env), patch.object(
+            rp_fastapi, "uvicorn"
+        ) as mock_uvicorn, patch.object(
+            rp_fastapi, "ForkServer"
+        ) as mock_fork_server, patch.object(
+            rp_fastapi, "_bind_socket"
+        ) as mock_bind, patch.object(
+            rp_fastapi, "signal"
+        ):
+            self.worker_api.start_uvicorn("0.0.0.0", 8000, 3)
 
-            default_input_object = rp_fastapi.DefaultRequest(
-                input={"test_input": "test_input"}
-            )
+            target = mock_fork_server.call_args.args[0]
+            self.assertEqual(mock_fork_server.call_args.kwargs["processes"], 3)
+            mock_fork_server.return_value.start.assert_called_once()
 
-            input_object_with_webhook = rp_fastapi.DefaultRequest(
-                input={"test_input": "test_input"}, webhook="test_webhook"
-            )
+            parent_binds = list(mock_bind.call_args_list)
+            rp_fastapi.Heartbeat.start_ping.assert_not_called()
+            target()  # What each forked process runs.
+            rp_fastapi.Heartbeat.start_ping.assert_called_once()
 
-            worker_api = rp_fastapi.WorkerAPI({"handler": self.handler})
+        mock_uvicorn.Server.return_value.run.assert_called_once()
+        return parent_binds, mock_bind, mock_uvicorn
 
-            # Add job to job_list
-            asyncio.run(worker_api._sim_run(default_input_object))
+    def test_processes_share_socket(self):
+        parent_binds, mock_bind, mock_uvicorn = self._start_processes({})
 
-            stream_return = asyncio.run(worker_api._sim_stream("test_job_id"))
-            assert stream_return == {
-                "id": "test_job_id",
-                "status": "FAILED",
-                "error": "Job ID not found",
-            }
+        self.assertEqual(parent_binds, [call("0.0.0.0", 8000)])
+        self.assertEqual(mock_bind.call_count, 1)
+        mock_uvicorn.Server.return_value.run.assert_called_once_with(
+            sockets=[mock_bind.return_value]
+        )
+        mock_bind.return_value.close.assert_called_once()
 
-            stream_return = asyncio.run(worker_api._sim_stream("test-123"))
-            assert stream_return == {
-                "id": "test-123",
-                "status": "FAILED",
-                "error": "Stream not supported, handler must be a generator.",
-            }
+    @unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT not supported")
+    def test_processes_reuse_port(self):
+        parent_binds, mock_bind, _ = self._start_processes({"RUNPOD_API_REUSE_PORT": "1"})
 
-            # Test with generator handler
-            def generator_handler(job):
-                del job
-                yield {"result": "success"}
+        self.assertEqual(parent_binds, [])
+        mock_bind.assert_called_once_with("0.0.0.0", 8000, reuse_port=True)
 
-            generator_worker_api = rp_fastapi.WorkerAPI({"handler": generator_handler})
-            generator_stream_return = asyncio.run(
-                generator_worker_api._sim_stream("test-123")
-            )
-            assert generator_stream_return == {
-                "id": "test-123",
-                "status": "COMPLETED",
-                "stream": [{"output": {"result": "success"}}],
-            }
+    @unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT not supported")
+    def test_bind_socket(self):
+        sock = rp_fastapi._bind_socket("127.0.0.1", 0, reuse_port=True)
+        try:
+            port = sock.getsockname()[1]
+            self.assertTrue(sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT))
+            self.assertTrue(sock.get_inheritable())
 
-            # Test webhook caller sent
-            asyncio.run(generator_worker_api._sim_run(input_object_with_webhook))
-            asyncio.run(generator_worker_api._sim_stream("test-123"))
-            assert mock_threading.Thread.called
+            # A second process can bind the same port.
+            other = rp_fastapi._bind_socket("127.0.0.1", port, reuse_port=True)
+            other.close()
+        finally:
+            sock.close()
 
-        loop.close()
 
-    @pytest.mark.asyncio
-    def test_status(self):
-        """
-        Tests the _status() method.
-        """
-        loop = asyncio.get_event_loop()
+class TestWorkerAPIJobs(IsolatedAsyncioTestCase):
+    """Jobs submitted to /run run in the background, /status and /stream read the result."""
 
+    async def asyncSetUp(self):
+        JobsProgress().clear()
         module_location = "runpod.serverless.modules.rp_fastapi"
-        with patch(f"{module_location}.FastAPI", Mock()), patch(
-            f"{module_location}.APIRouter", return_value=Mock()
-        ), patch(f"{module_location}.uvicorn", Mock()), patch(
-            f"{module_location}.uuid.uuid4", return_value="123"
-        ), patch(
-            f"{module_location}.threading"
-        ) as mock_threading:
-
-            worker_api = rp_fastapi.WorkerAPI({"handler": self.handler})
-
-            default_input_object = rp_fastapi.DefaultRequest(
-                input={"test_input": "test_input"}
+        self.patches = [
+            patch(f"{module_location}.Heartbeat.start_ping", Mock()),
+            patch(f"{module_location}.FastAPI", Mock()),
+            patch(f"{module_location}.APIRouter", return_value=Mock()),
+        ]
+        for patcher in self.patches:
+            patcher.start()
+        self.worker_apis = []
+
+    async def asyncTearDown(self):
+        for worker_api in self.worker_apis:
+            await worker_api.stop_job_worker()
+        for patcher in self.patches:
+            patcher.stop()
+
+    def _worker_api(self, handler):
+        worker_api = rp_fastapi.WorkerAPI({"handler": handler, "rp_args": {}})
+        worker_api.job_transport.wait = 0.01
+        self.worker_apis.append(worker_api)
+        return worker_api
+
+    async def _run(self, worker_api, webhook=None):
+        job = await worker_api._sim_run(
+            rp_fastapi.DefaultRequest(input={"number": 1}, webhook=webhook)
+        )
+        return job["id"]
+
+    async def _wait_done(self, worker_api, job_id):
+        await asyncio.wait_for(worker_api.job_store.get(job_id).done.wait(), 5)
+
+    async def test_status(self):
+        calls = []
+
+        async def handler(job):
+            calls.append(job["id"])
+            await asyncio.sleep(0.05)
+            return {"result": job["input"]["number"]}
+
+        worker_api = self._worker_api(handler)
+        job_id = await self._run(worker_api)
+
+        status = await worker_api._sim_status(job_id)
+        self.assertIn(status["status"], ["IN_QUEUE", "IN_PROGRESS"])
+
+        await self._wait_done(worker_api, job_id)
+        for _ in range(3):
+            status = await worker_api._sim_status(job_id)
+            self.assertEqual(
+                status, {"id": job_id, "status": "COMPLETED", "output": {"result": 1}}
             )
 
-            input_object_with_webhook = rp_fastapi.DefaultRequest(
-                input={"test_input": "test_input"}, webhook="test_webhook"
+        # The handler ran once, in the background, not for every status request.
+        self.assertEqual(calls, [job_id])
+
+    async def test_status_not_found(self):
+        worker_api = self._worker_api(Mock())
+        status = await worker_api._sim_status("test_job_id")
+        self.assertEqual(
+            status, {"id": "test_job_id", "status": "FAILED", "error": "Job ID not found"}
+        )
+
+    async def test_status_error(self):
+        worker_api = self._worker_api(Mock(side_effect=Exception("test error")))
+        job_id = await self._run(worker_api)
+        await self._wait_done(worker_api, job_id)
+
+        status = await worker_api._sim_status(job_id)
+        self.assertEqual(status["status"], "FAILED")
+        self.assertIn("test error", status["error"])
+
+    async def test_status_generator(self):
+        def handler(job):
+            del job
+            yield {"result": "success"}
+
+        worker_api = self._worker_api(handler)
+        job_id = await self._run(worker_api)
+        await self._wait_done(worker_api, job_id)
+
+        status = await worker_api._sim_status(job_id)
+        self.assertEqual(status["output"], [{"result": "success"}])
+
+    async def test_stream(self):
+        def handler(job):
+            del job
+            yield {"result": "success"}
+
+        worker_api = self._worker_api(handler)
+        job_id = await self._run(worker_api)
+
+        stream = await asyncio.wait_for(worker_api._sim_stream(job_id), 5)
+        self.assertEqual(
+            stream,
+            {"id": job_id, "status": "COMPLETED", "stream": [{"output": {"result": "success"}}]},
+        )
+
+        stream = await worker_api._sim_stream("test_job_id")
+        self.assertEqual(stream["error"], "Job ID not found")
+
+    async def test_stream_not_generator(self):
+        worker_api = self._worker_api(Mock(return_value={"result": "success"}))
+        job_id = await self._run(worker_api)
+
+        stream = await worker_api._sim_stream(job_id)
+        self.assertEqual(stream["error"], "Stream not supported, handler must be a generator.")
+
+    async def _read_stream(self, response):
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    async def test_stream_sse(self):
+        async def handler(job):
+            del job
+            for index in range(3):
+                await asyncio.sleep(0.01)
+                yield {"index": index}
+
+        worker_api = self._worker_api(handler)
+        job_id = await self._run(worker_api)
+
+        request = Mock(headers={"accept": "text/event-stream"})
+        response = await worker_api._sim_stream(job_id, request)
+        self.assertEqual(response.media_type, "text/event-stream")
+
+        body = await asyncio.wait_for(self._read_stream(response), 5)
+        events = body.strip().split("\n\n")
+        self.assertEqual(events[0], 'id: 0\ndata: {"output": {"index": 0}}')
+        self.assertEqual(
+            events[-1], f'event: done\ndata: {{"id": "{job_id}", "status": "COMPLETED"}}'
+        )
+        self.assertEqual(len(events), 4)
+
+        # A reconnecting client resumes after the last event it got.
+        request = Mock(headers={"accept": "text/event-stream", "last-event-id": "1"})
+        body = await self._read_stream(await worker_api._sim_stream(job_id, request))
+        self.assertTrue(body.startswith('id: 2\ndata: {"output": {"index": 2}}'))
+
+    async def test_stream_ndjson(self):
+        def handler(job):
+            del job
+            yield {"index": 0}
+            raise ValueError("test error")
+
+        worker_api = self._worker_api(handler)
+        job_id = await self._run(worker_api)
+
+        request = Mock(headers={"accept": "application/x-ndjson"})
+        response = await worker_api._sim_stream(job_id, request)
+        lines = (await asyncio.wait_for(self._read_stream(response), 5)).splitlines()
+
+        self.assertEqual(json.loads(lines[0]), {"output": {"index": 0}})
+        self.assertEqual(json.loads(lines[-1])["status"], "FAILED")
+        self.assertIn("test error", json.loads(lines[-1])["error"])
+
+    async def test_realtime_admission(self):
+        release = asyncio.Event()
+
+        async def handler(job):
+            await release.wait()
+            return job["input"]
+
+        worker_api = self._worker_api(handler)
+        worker_api.admission = AdmissionController(max_in_flight=1, max_queue=1)
+
+        jobs = [rp_fastapi.Job(id=f"job-{index}", input=index) for index in range(3)]
+        running = asyncio.create_task(worker_api._realtime(jobs[0]))
+        queued = asyncio.create_task(worker_api._realtime(jobs[1]))
+        await asyncio.sleep(0.01)
+
+        with self.assertRaises(HTTPException) as context:
+            await worker_api._realtime(jobs[2])
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(context.exception.headers, {"Retry-After": "1"})
+
+        metrics = await worker_api._realtime_metrics()
+        self.assertEqual((metrics["in_flight"], metrics["queued"]), (1, 1))
+
+        release.set()
+        self.assertEqual(await running, {"output": 0})
+        self.assertEqual(await queued, {"output": 1})
+
+    async def test_realtime_disconnect(self):
+        cancelled = asyncio.Event()
+
+        async def handler(job):
+            del job
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        worker_api = self._worker_api(handler)
+        worker_api.admission = AdmissionController(max_in_flight=1)
+        request = Mock(is_disconnected=AsyncMock(side_effect=[False, True, True]))
+
+        with patch.object(rp_fastapi, "DISCONNECT_POLL_INTERVAL", 0.01):
+            response = await asyncio.wait_for(
+                worker_api._realtime(rp_fastapi.Job(id="job-0", input={}), request), 5
             )
 
-            # Add job to job_list
-            asyncio.run(worker_api._sim_run(default_input_object))
+        self.assertEqual(response.status_code, 499)
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(worker_api.admission.in_flight, 0)
+        self.assertEqual(worker_api.admission.metrics()["cancelled"], 1)
 
-            status_return = asyncio.run(worker_api._sim_status("test_job_id"))
-            assert status_return == {
-                "id": "test_job_id",
-                "status": "FAILED",
-                "error": "Job ID not found",
-            }
+    async def test_realtime_unlimited_not_watched(self):
+        """Without an in-flight limit requests are not watched for a disconnect."""
+        worker_api = self._worker_api(Mock(return_value={"result": "success"}))
+        request = Mock(is_disconnected=AsyncMock(return_value=True))
 
-            status_return = asyncio.run(worker_api._sim_status("test-123"))
-            assert status_return == {
-                "id": "test-123",
-                "status": "COMPLETED",
-                "output": {"result": "success"},
-            }
+        response = await worker_api._realtime(rp_fastapi.Job(id="job-0", input={}), request)
 
-            # Test webhook caller sent
-            asyncio.run(worker_api._sim_run(input_object_with_webhook))
-            asyncio.run(worker_api._sim_status("test-123"))
-            assert mock_threading.Thread.called
+        self.assertEqual(response, {"output": {"result": "success"}})
+        request.is_disconnected.assert_not_called()
 
-            # Test with generator handler
-            def generator_handler(job):
-                del job
-                yield {"result": "success"}
+    async def test_realtime_batch(self):
+        batches = []
 
-            generator_worker_api = rp_fastapi.WorkerAPI({"handler": generator_handler})
-            asyncio.run(generator_worker_api._sim_run(default_input_object))
-            generator_stream_return = asyncio.run(
-                generator_worker_api._sim_status("test-123")
-            )
-            assert generator_stream_return == {
-                "id": "test-123",
-                "status": "COMPLETED",
-                "output": [{"result": "success"}],
-            }
+        def batch_handler(jobs):
+            batches.append(len(jobs))
+            return [{"number": job["input"]} for job in jobs]
 
-            # Test with error handler
-            error_worker_api = rp_fastapi.WorkerAPI({"handler": self.error_handler})
-            asyncio.run(error_worker_api._sim_run(default_input_object))
-            error_status_return = asyncio.run(error_worker_api._sim_status("test-123"))
-            assert "error" in error_status_return
+        worker_api = rp_fastapi.WorkerAPI(
+            {"handler": Mock(), "batch_handler": batch_handler, "realtime_batch_wait_ms": 10}
+        )
+        jobs = [rp_fastapi.Job(id=f"job-{index}", input=index) for index in range(3)]
+        results = await asyncio.gather(*(worker_api._realtime(job) for job in jobs))
 
-        loop.close()
+        self.assertEqual([result["output"]["number"] for result in results], [0, 1, 2])
+        self.assertEqual(batches, [3])
+        self.assertEqual((await worker_api._realtime_metrics())["batches"], 1)
+
+    async def test_webhook(self):
+        worker_api = self._worker_api(Mock(return_value={"result": "success"}))
+
+        with patch("runpod.serverless.modules.rp_fastapi.threading") as mock_threading:
+            job_id = await self._run(worker_api, webhook="test_webhook")
+            await self._wait_done(worker_api, job_id)
+
+        mock_threading.Thread.assert_called_once()
+        self.assertEqual(
+            mock_threading.Thread.call_args.kwargs["args"],
+            ("test_webhook", {"output": {"result": "success"}}),
+        )
+
+    async def test_job_store_full(self):
+        worker_api = self._worker_api(Mock(return_value={}))
+        worker_api.job_store = JobStore(max_jobs=1)
+        worker_api.job_transport.store = worker_api.job_store
+
+        await self._run(worker_api)
+        with self.assertRaises(HTTPException) as context:
+            await self._run(worker_api)
+        self.assertEqual(context.exception.status_code, 429)
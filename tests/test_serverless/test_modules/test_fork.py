@@ -0,0 +1,187 @@
+""" Tests for runpod.serverless.modules.rp_fork """
+
+# pylint: disable=protected-access
+
+import os
+import signal
+import unittest
+from unittest.mock import MagicMock, patch
+
+from runpod.serverless import worker
+from runpod.serverless.modules import rp_fork
+from runpod.serverless.modules.rp_fork import ForkServer
+
+
+class TestForkMode(unittest.TestCase):
+    """Tests for the refresh worker mode helpers."""
+
+    def test_default_mode(self):
+        """Pod mode is the default."""
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(rp_fork.get_refresh_worker_mode({}), "pod")
+            self.assertFalse(rp_fork.is_fork_mode({}))
+
+    def test_fork_mode(self):
+        """Fork mode can be set from the config or the environment."""
+        self.assertTrue(rp_fork.is_fork_mode({"refresh_worker_mode": "fork"}))
+
+        with patch.dict(os.environ, {"RUNPOD_REFRESH_WORKER_MODE": "FORK"}):
+            self.assertTrue(rp_fork.is_fork_mode({}))
+
+    def test_fork_mode_unsupported(self):
+        """Fork mode falls back when os.fork is not available."""
+        with patch.object(rp_fork, "os") as mock_os:
+            del mock_os.fork
+            mock_os.environ = {}
+            self.assertFalse(rp_fork.is_fork_mode({"refresh_worker_mode": "fork"}))
+
+
+class TestForkServer(unittest.TestCase):
+    """Tests for the ForkServer class."""
+
+    def setUp(self):
+        self.target = MagicMock()
+        self.server = ForkServer(self.target)
+
+    @patch("runpod.serverless.modules.rp_fork.signal.signal")
+    @patch("runpod.serverless.modules.rp_fork.os.waitpid")
+    @patch("runpod.serverless.modules.rp_fork.os.fork")
+    def test_recycles_children(self, mock_fork, mock_waitpid, _):
+        """Children that exit are replaced until shutdown."""
+        mock_fork.side_effect = [101, 102]
+
+        def waitpid(pid, options):  # pylint: disable=unused-argument
+            if mock_waitpid.call_count == 2:
+                self.server._shutdown = True
+            return mock_fork.call_count + 100, 0
+
+        mock_waitpid.side_effect = waitpid
+        self.server.start()
+
+        self.assertEqual(mock_fork.call_count, 2)
+        self.assertEqual(self.server.children, {})
+        self.target.assert_not_called()
+
+    @patch("runpod.serverless.modules.rp_fork.time.sleep")
+    @patch("runpod.serverless.modules.rp_fork.signal.signal")
+    @patch("runpod.serverless.modules.rp_fork.os.waitpid")
+    @patch("runpod.serverless.modules.rp_fork.os.fork")
+    def test_crashed_child(self, mock_fork, mock_waitpid, _, mock_sleep):
+        """A crashing child is logged and replaced after a short delay."""
+        mock_fork.side_effect = [101, 102]
+        statuses = [(101, signal.SIGSEGV), (102, 0)]
+
+        def waitpid(pid, options):  # pylint: disable=unused-argument
+            if len(statuses) == 1:
+                self.server._shutdown = True
+            return statuses.pop(0)
+
+        mock_waitpid.side_effect = waitpid
+        with patch.object(rp_fork.log, "error") as mock_error:
+            self.server.start()
+
+        mock_error.assert_called_once()
+        mock_sleep.assert_called_once_with(rp_fork.MIN_CHILD_LIFETIME)
+
+    @patch("runpod.serverless.modules.rp_fork._exit_with_parent")
+    @patch("runpod.serverless.modules.rp_fork.os._exit")
+    @patch("runpod.serverless.modules.rp_fork.os.setpgid")
+    @patch("runpod.serverless.modules.rp_fork.signal.signal")
+    @patch("runpod.serverless.modules.rp_fork.os.fork", return_value=0)
+    def test_child_runs_target(self, _, __, mock_setpgid, mock_exit, mock_exit_with_parent):
+        """The child runs the target in its own process group and exits."""
+        mock_exit.side_effect = SystemExit
+        with self.assertRaises(SystemExit):
+            self.server._fork()
+
+        mock_setpgid.assert_called_once_with(0, 0)
+        mock_exit_with_parent.assert_called_once_with(os.getpid())
+        self.target.assert_called_once()
+        mock_exit.assert_called_once_with(0)
+
+    @patch("runpod.serverless.modules.rp_fork.signal.pthread_sigmask")
+    @patch("runpod.serverless.modules.rp_fork.os.fork", return_value=101)
+    def test_signals_blocked_until_child_registered(self, mock_fork, mock_sigmask):
+        """A shutdown signal during a fork is handled once the child can be sent it."""
+        events = []
+        mock_sigmask.side_effect = lambda how, signals: events.append(
+            (how, set(self.server.children))
+        )
+        mock_fork.side_effect = lambda: events.append("fork") or 101
+
+        self.server._fork()
+
+        self.assertEqual(
+            events,
+            [(signal.SIG_BLOCK, set()), "fork", (signal.SIG_SETMASK, {101})],
+        )
+        self.assertEqual(mock_sigmask.call_args_list[0][0][1], rp_fork.FORWARDED_SIGNALS)
+
+    @patch("runpod.serverless.modules.rp_fork._exit_with_parent")
+    @patch("runpod.serverless.modules.rp_fork.os._exit")
+    @patch("runpod.serverless.modules.rp_fork.os.setpgid")
+    @patch("runpod.serverless.modules.rp_fork.signal.signal")
+    def test_child_failure(self, _, __, mock_exit, ___):
+        """A failing target exits the child with code 1."""
+        self.target.side_effect = RuntimeError("boom")
+        self.server._run_child()
+        mock_exit.assert_called_once_with(1)
+
+    @patch("runpod.serverless.modules.rp_fork.os.kill")
+    @patch("runpod.serverless.modules.rp_fork.os.getppid", return_value=100)
+    @patch("runpod.serverless.modules.rp_fork.ctypes.CDLL")
+    @patch("runpod.serverless.modules.rp_fork.sys.platform", "linux")
+    def test_exit_with_parent(self, mock_cdll, _, mock_kill):
+        """Children get SIGTERM when the parent exits, also if it exited before the fork."""
+        mock_cdll.return_value.prctl.return_value = 0
+
+        rp_fork._exit_with_parent(100)
+
+        mock_cdll.return_value.prctl.assert_called_once_with(
+            rp_fork.PR_SET_PDEATHSIG, signal.SIGTERM, 0, 0, 0
+        )
+        mock_kill.assert_not_called()
+
+        rp_fork._exit_with_parent(99)
+        mock_kill.assert_called_once_with(os.getpid(), signal.SIGTERM)
+
+    @patch("runpod.serverless.modules.rp_fork.os.kill")
+    def test_handle_shutdown(self, mock_kill):
+        """Shutdown is forwarded to the running children."""
+        self.server.children = {101: 0.0, 102: 0.0}
+        mock_kill.side_effect = [None, ProcessLookupError]
+
+        self.server.handle_shutdown(signal.SIGTERM, None)
+
+        self.assertFalse(self.server.is_alive())
+        mock_kill.assert_any_call(101, signal.SIGTERM)
+        mock_kill.assert_any_call(102, signal.SIGTERM)
+
+    @patch("runpod.serverless.modules.rp_fork.os.waitpid")
+    def test_wait_child(self, mock_waitpid):
+        """Interrupted waits are retried and a missing child ends the wait."""
+        mock_waitpid.side_effect = [InterruptedError, (101, 256)]
+        self.assertEqual(self.server._wait_child(), (101, 1))
+
+        mock_waitpid.side_effect = ChildProcessError
+        self.assertEqual(self.server._wait_child(), (None, 0))
+
+
+class TestRunForkServer(unittest.TestCase):
+    """Tests for the fork-server entry point of the worker."""
+
+    @patch("runpod.serverless.worker.rp_scale.JobScaler")
+    @patch("runpod.serverless.worker.rp_fork.ForkServer")
+    def test_run_worker_fork_mode(self, mock_fork_server, mock_job_scaler):
+        """run_worker starts the fork-server and children run a limited JobScaler."""
+        config = {"refresh_worker_mode": "fork", "refresh_worker_jobs": 3}
+
+        with patch.object(worker.heartbeat, "start_ping"):
+            worker.run_worker(config)
+
+            mock_fork_server.return_value.start.assert_called_once()
+            child_target = mock_fork_server.call_args[0][0]
+            child_target()
+
+        self.assertEqual(mock_job_scaler.return_value.jobs_limit, 3)
+        mock_job_scaler.return_value.start.assert_called_once()
@@ -0,0 +1,107 @@
+""" Tests for runpod.serverless.modules.rp_init """
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from runpod.serverless.modules import rp_loop
+from runpod.serverless.modules.rp_init import run_init
+
+
+class TestRunInit(unittest.TestCase):
+    """Tests for the run_init function."""
+
+    def test_no_init(self):
+        """Nothing is run or recorded without an init stage."""
+        config = {}
+        self.assertIsNone(run_init(config))
+        self.assertNotIn("init_duration_ms", config)
+
+    def test_sync_init(self):
+        """A sync init runs in the calling thread."""
+        init = MagicMock()
+        config = {"init": init}
+
+        duration = run_init(config)
+
+        init.assert_called_once_with()
+        self.assertEqual(config["init_duration_ms"], duration)
+        self.assertGreaterEqual(duration, 0)
+
+    def test_async_init(self):
+        """An async init is awaited."""
+        calls = []
+
+        async def init():
+            await asyncio.sleep(0)
+            calls.append("init")
+
+        run_init({"init": init})
+        self.assertEqual(calls, ["init"])
+
+    def test_async_init_event_loop(self):
+        """An async init runs on the event loop selected for the worker."""
+        run = rp_loop.run
+
+        async def init():
+            pass
+
+        with patch.object(rp_loop, "run", side_effect=run) as mock_run:
+            run_init({"init": init})
+            run_init({"init": [init, init]})
+
+        self.assertEqual(mock_run.call_count, 2)
+
+    def test_parallel_init(self):
+        """A list of init steps runs in parallel."""
+        barrier = threading.Barrier(2, timeout=5)
+        calls = []
+
+        def load_model():
+            barrier.wait()  # deadlocks unless both sync steps run concurrently
+            calls.append("model")
+
+        def load_tokenizer():
+            barrier.wait()
+            calls.append("tokenizer")
+
+        async def warm_cache():
+            calls.append("cache")
+
+        start = time.perf_counter()
+        run_init({"init": [load_model, load_tokenizer, warm_cache]})
+
+        self.assertCountEqual(calls, ["model", "tokenizer", "cache"])
+        self.assertLess(time.perf_counter() - start, 5)
+
+    def test_failed_init(self):
+        """Init failures are logged and raised."""
+        init = MagicMock(side_effect=RuntimeError("no weights"))
+
+        with patch("runpod.serverless.modules.rp_init.log") as mock_log:
+            with self.assertRaises(RuntimeError):
+                run_init({"init": init})
+
+        mock_log.error.assert_called_once()
+
+    def test_start_runs_init_before_worker(self):
+        """serverless.start runs the init stage before the worker starts."""
+        order = []
+        config = {
+            "handler": MagicMock(),
+            "init": lambda: order.append("init"),
+        }
+
+        with patch("runpod.serverless.worker.main") as mock_main, patch(
+            "runpod.serverless.signal.signal"
+        ), patch("sys.argv", ["handler.py"]):
+            mock_main.side_effect = lambda config: order.append("worker")
+
+            import runpod  # pylint: disable=import-outside-toplevel
+
+            runpod.serverless.start(config)
+
+        self.assertEqual(order, ["init", "worker"])
+        self.assertIn("init_duration_ms", config)
@@ -2,14 +2,14 @@
 Test Serverless Job Module
 """
 
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from unittest import IsolatedAsyncioTestCase
 from aiohttp import ClientResponse, ClientResponseError
 from aiohttp.test_utils import make_mocked_coro
 
 from runpod.http_client import TooManyRequests
-from runpod.serverless.modules import rp_job
+from runpod.serverless.modules import rp_cancel, rp_job
 
 
 class TestJob(IsolatedAsyncioTestCase):
@@ -149,6 +149,56 @@ class TestJob(IsolatedAsyncioTestCase):
                 await rp_job.get_job(mock_session)
             self.assertEqual(str(context.exception), "Unexpected error")
 
+    async def test_get_job_batch_streamed(self):
+        """Tests that batch jobs are passed to on_job while the response is received."""
+        chunks = [b'[{"id": "1", "input": {}}, {"id"', b': "2", "input": {}}, {"no_id": 1}', b"]"]
+        received = []
+
+        async def iter_any():
+            for chunk in chunks:
+                yield chunk
+                received.append("chunk")
+
+        async def on_job(job):
+            received.append(job["id"])
+
+        response = Mock(ClientResponse)
+        response.status = 200
+        response.content_type = "application/json"
+        response.content_length = None
+        response.content.iter_any = iter_any
+
+        with patch("aiohttp.ClientSession") as mock_session, patch(
+            "runpod.serverless.modules.rp_job.JOB_GET_URL", "http://mock.url"
+        ):
+            mock_session.get.return_value.__aenter__.return_value = response
+            jobs = await rp_job.get_job(mock_session, 3, on_job=on_job)
+
+        self.assertEqual(jobs, [])
+        self.assertEqual(received, ["1", "chunk", "2", "chunk", "chunk"])
+
+    async def test_get_job_batch_streamed_invalid(self):
+        """Tests that jobs decoded before an invalid part of the response are kept."""
+
+        async def iter_any():
+            yield b'[{"id": "1", "input": {}}, {"id": '
+
+        on_job = AsyncMock()
+        response = Mock(ClientResponse)
+        response.status = 200
+        response.content_type = "application/json"
+        response.content_length = None
+        response.content.iter_any = iter_any
+
+        with patch("aiohttp.ClientSession") as mock_session, patch(
+            "runpod.serverless.modules.rp_job.JOB_GET_URL", "http://mock.url"
+        ):
+            mock_session.get.return_value.__aenter__.return_value = response
+            jobs = await rp_job.get_job(mock_session, 3, on_job=on_job)
+
+        self.assertEqual(jobs, [])
+        on_job.assert_awaited_once_with({"id": "1", "input": {}})
+
 
 class TestRunJob(IsolatedAsyncioTestCase):
     """Tests the run_job function"""
@@ -235,6 +285,34 @@ class TestRunJob(IsolatedAsyncioTestCase):
         self.assertRaises(Exception, job_result)
 
 
+class TestRunBatch(IsolatedAsyncioTestCase):
+    """Tests the run_batch function"""
+
+    jobs = [{"id": "job-0", "input": 0}, {"id": "job-1", "input": 1}]
+
+    async def test_batch(self):
+        """Each job gets the output at its position, errors stay with their job."""
+
+        async def batch_handler(jobs):
+            return [{"value": jobs[0]["input"]}, {"error": "bad input"}]
+
+        results = await rp_job.run_batch(batch_handler, self.jobs)
+        self.assertEqual(results, [{"output": {"value": 0}}, {"error": "bad input"}])
+
+    async def test_batch_exception(self):
+        """A failing batch handler fails every job of the batch."""
+        results = await rp_job.run_batch(Mock(side_effect=ValueError("failed")), self.jobs)
+
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assertIn("failed", result["error"])
+
+    async def test_batch_wrong_length(self):
+        """The batch handler must return one output per job."""
+        results = await rp_job.run_batch(Mock(return_value=[1]), self.jobs)
+        self.assertIn("list of 2 outputs, got 1", results[1]["error"])
+
+
 class TestRunJobGenerator(IsolatedAsyncioTestCase):
     """Tests the run_job_generator function"""
 
@@ -315,3 +393,29 @@ class TestRunJobGenerator(IsolatedAsyncioTestCase):
         assert mock_log.error.call_count == 1
         assert mock_log.info.call_count == 1
         mock_log.info.assert_called_with("Finished running generator.", "123")
+
+
+class TestHandleJob(IsolatedAsyncioTestCase):
+    """Tests for the handle_job function."""
+
+    def tearDown(self):
+        rp_cancel._tokens.clear()  # pylint: disable=protected-access
+
+    async def test_memory_tracker_stopped_on_error(self):
+        """
+        Tests that the job is no longer tracked when sending its output raises
+        """
+
+        def handler(job):  # pylint: disable=unused-argument
+            yield "partial_output"
+
+        transport = Mock(rp_job.Transport)
+        transport.stream = AsyncMock(side_effect=RuntimeError("stream failed"))
+        config = {"handler": handler, "rp_args": {}}
+        job = {"id": "123", "input": {}}
+
+        with self.assertRaises(RuntimeError):
+            await rp_job.handle_job(Mock(), config, job, transport)
+
+        self.assertNotIn("123", rp_job.memory_tracker._active)  # pylint: disable=protected-access
+        transport.post.assert_not_called()
@@ -0,0 +1,149 @@
+""" Tests for runpod.serverless.modules.rp_job_store """
+
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import Mock, patch
+
+from runpod.serverless.modules import rp_job_store
+from runpod.serverless.modules.rp_job_store import (
+    COMPLETED,
+    FAILED,
+    IN_PROGRESS,
+    IN_QUEUE,
+    JobStore,
+    JobStoreFull,
+    JobStoreTransport,
+)
+from runpod.serverless.modules.rp_transport import RELEASED_JOB_ERROR
+
+
+class TestJobStore(IsolatedAsyncioTestCase):
+    """Tests for the JobStore."""
+
+    async def test_lifecycle(self):
+        store = JobStore()
+        job = store.add("job-1", {"number": 1}, webhook="test_webhook")
+
+        self.assertIs(store.get("job-1"), job)
+        self.assertEqual(job.status, IN_QUEUE)
+
+        taken, = store.take(5)
+        self.assertIs(taken, job)
+        self.assertEqual(job.status, IN_PROGRESS)
+        self.assertEqual(store.take(5), [])
+
+        store.finish("job-1", {"output": {"result": 1}})
+        self.assertEqual(job.status, COMPLETED)
+        self.assertEqual(job.output, {"result": 1})
+        self.assertTrue(job.done.is_set())
+        self.assertTrue(job.finished)
+
+    async def test_failed(self):
+        store = JobStore()
+        store.add("job-1", {})
+
+        job = store.finish("job-1", {"error": "test error"})
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.error, "test error")
+        self.assertIsNone(store.finish("unknown", {"output": None}))
+
+    async def test_ttl(self):
+        store = JobStore(ttl=10)
+        store.add("job-1", {})
+        store.add("job-2", {})
+
+        with patch.object(rp_job_store.time, "monotonic", return_value=100):
+            store.finish("job-1", {"output": 1})
+
+        with patch.object(rp_job_store.time, "monotonic", return_value=105):
+            self.assertIsNotNone(store.get("job-1"))
+
+        with patch.object(rp_job_store.time, "monotonic", return_value=110):
+            self.assertIsNone(store.get("job-1"))
+
+        # Unfinished jobs are never evicted.
+        self.assertIsNotNone(store.get("job-2"))
+        self.assertEqual(len(store), 1)
+
+    async def test_max_jobs(self):
+        store = JobStore(max_jobs=2)
+        store.add("job-1", {})
+        store.add("job-2", {})
+
+        with self.assertRaises(JobStoreFull):
+            store.add("job-3", {})
+
+        # The oldest finished job makes room.
+        store.finish("job-2", {"output": 2})
+        store.finish("job-1", {"output": 1})
+        store.add("job-3", {})
+
+        self.assertIsNone(store.get("job-2"))
+        self.assertIsNotNone(store.get("job-1"))
+        self.assertEqual(len(store), 2)
+
+
+class TestJobStoreTransport(IsolatedAsyncioTestCase):
+    """Tests for the JobStoreTransport."""
+
+    async def test_acquire(self):
+        store = JobStore()
+        transport = JobStoreTransport(store, wait=0.01)
+        self.assertEqual(await transport.acquire(None, 1), [])
+
+        acquire = asyncio.create_task(transport.acquire(None, 2))
+        await asyncio.sleep(0)
+        store.add("job-1", {"number": 1})
+
+        self.assertEqual(await acquire, [{"id": "job-1", "input": {"number": 1}}])
+
+    async def test_outputs(self):
+        on_finished = Mock()
+        store = JobStore()
+        transport = JobStoreTransport(store, on_finished=on_finished)
+        job = store.add("job-1", {})
+
+        await transport.progress(None, {"id": "job-1"}, "half way")
+        await transport.stream(None, {"id": "job-1"}, {"output": 1})
+        await transport.stream(None, {"id": "unknown"}, {"output": 1})
+        await transport.post(None, {"id": "job-1"}, {"output": [1]}, is_stream=True)
+
+        self.assertEqual(job.stream, [{"output": 1}])
+        self.assertEqual(job.output, [1])
+        on_finished.assert_called_once_with(job)
+
+    async def test_release(self):
+        store = JobStore()
+        transport = JobStoreTransport(store)
+        job = store.add("job-1", {})
+        store.take(1)
+
+        await transport.release(None, {"id": "job-1"})
+
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.error, RELEASED_JOB_ERROR)
+
+
+class TestStoredJobFollow(IsolatedAsyncioTestCase):
+    """Tests for StoredJob.follow."""
+
+    async def _read(self, job, start=0):
+        return [output async for output in job.follow(start)]
+
+    async def test_readers(self):
+        store = JobStore()
+        job = store.add("job-1", {})
+        job.publish({"output": 0})
+
+        readers = [asyncio.create_task(self._read(job)) for _ in range(2)]
+        await asyncio.sleep(0)
+        job.publish({"output": 1})
+        await asyncio.sleep(0)
+        store.finish("job-1", {"output": [0, 1]})
+
+        for reader in readers:
+            self.assertEqual(await asyncio.wait_for(reader, 1), [{"output": 0}, {"output": 1}])
+
+        # A late reader gets the outputs it missed, from where it asks.
+        self.assertEqual(await self._read(job), [{"output": 0}, {"output": 1}])
+        self.assertEqual(await self._read(job, start=1), [{"output": 1}])
@@ -0,0 +1,72 @@
+""" Tests for runpod.serverless.modules.rp_json """
+
+import json
+import random
+import unittest
+
+from runpod.serverless.modules.rp_json import JobArrayDecoder
+
+
+def decode(data: bytes, chunk_size: int):
+    """Feeds `data` to a decoder in chunks of `chunk_size` bytes."""
+    decoder = JobArrayDecoder()
+    objects = []
+    for index in range(0, len(data), chunk_size):
+        objects.extend(decoder.feed(data[index : index + chunk_size]))
+    decoder.close()
+    return objects
+
+
+class TestJobArrayDecoder(unittest.TestCase):
+    """Tests for the JobArrayDecoder class."""
+
+    def setUp(self):
+        self.jobs = [
+            {"id": "job-1", "input": {"prompt": 'braces {[ and "quotes" ]}'}},
+            {"id": "job-2", "input": {"escapes": "\\\\\"\né☃", "list": [{}, [1]]}},
+            {"id": "job-3", "input": {"data": "x" * 1000}},
+        ]
+
+    def test_chunk_sizes(self):
+        """Objects are decoded the same way whatever the chunking."""
+        data = json.dumps(self.jobs).encode()
+        for chunk_size in (1, 2, 3, 7, 64, len(data)):
+            self.assertEqual(decode(data, chunk_size), self.jobs)
+
+    def test_random_chunks(self):
+        """Escapes and multi-byte characters split across chunks are handled."""
+        data = json.dumps(self.jobs, ensure_ascii=False, indent=2).encode()
+        rng = random.Random(0)
+        for _ in range(50):
+            decoder, objects, index = JobArrayDecoder(), [], 0
+            while index < len(data):
+                size = rng.randint(1, 20)
+                objects.extend(decoder.feed(data[index : index + size]))
+                index += size
+            decoder.close()
+            self.assertEqual(objects, self.jobs)
+
+    def test_objects_returned_as_soon_as_complete(self):
+        """An object is returned by the chunk that completes it."""
+        decoder = JobArrayDecoder()
+        first = json.dumps(self.jobs[0]).encode()
+
+        self.assertEqual(decoder.feed(b"[" + first[:-1]), [])
+        self.assertEqual(decoder.feed(first[-1:] + b", {"), [self.jobs[0]])
+
+    def test_single_object_and_empty_array(self):
+        self.assertEqual(decode(json.dumps(self.jobs[0]).encode(), 5), [self.jobs[0]])
+        self.assertEqual(decode(b" [ ] ", 1), [])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            decode(b"[{}]]", 2)
+        with self.assertRaises(ValueError):
+            decode(b"[{}] [{}]", 2)
+        with self.assertRaises(ValueError):
+            decode(b'[{"id": }]', 2)
+
+    def test_incomplete(self):
+        for data in (b"", b"[", b'[{"id": "1"}', b'[{"id": "1'):
+            with self.assertRaises(ValueError):
+                decode(data, 1)
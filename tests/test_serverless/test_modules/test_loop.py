@@ -0,0 +1,64 @@
+""" Tests for runpod.serverless.modules.rp_loop """
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from runpod.serverless.modules import rp_loop
+
+
+async def _loop_name():
+    return type(asyncio.get_running_loop()).__module__
+
+
+class TestEventLoop(unittest.TestCase):
+    """Tests for the RUNPOD_EVENT_LOOP setting."""
+
+    def test_setting(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(rp_loop.get_event_loop_setting())
+        with patch.dict(os.environ, {"RUNPOD_EVENT_LOOP": " UVLoop "}):
+            self.assertEqual(rp_loop.get_event_loop_setting(), "uvloop")
+        with patch.dict(os.environ, {"RUNPOD_EVENT_LOOP": "trio"}):
+            self.assertEqual(rp_loop.get_event_loop_setting(), "asyncio")
+
+    def test_asyncio(self):
+        with patch.dict(os.environ, {"RUNPOD_EVENT_LOOP": "asyncio"}):
+            self.assertFalse(rp_loop.use_uvloop())
+            self.assertEqual(rp_loop.run(_loop_name()), "asyncio.unix_events")
+            self.assertEqual(rp_loop.uvicorn_loop(), "asyncio")
+
+            loop = rp_loop.new_event_loop()
+            self.assertIsInstance(loop, asyncio.BaseEventLoop)
+            loop.close()
+
+    def test_default(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(rp_loop.use_uvloop())
+            self.assertEqual(rp_loop.uvicorn_loop(), "auto")
+
+    def test_uvloop(self):
+        try:
+            import uvloop  # pylint: disable=import-outside-toplevel,unused-import
+        except ImportError:
+            self.skipTest("uvloop is not installed")
+
+        with patch.dict(os.environ, {"RUNPOD_EVENT_LOOP": "uvloop"}):
+            self.assertTrue(rp_loop.use_uvloop())
+            self.assertEqual(rp_loop.run(_loop_name()), "uvloop")
+            self.assertEqual(rp_loop.uvicorn_loop(), "uvloop")
+
+            loop = rp_loop.new_event_loop()
+            self.assertEqual(type(loop).__module__, "uvloop")
+            loop.close()
+
+    def test_uvloop_missing(self):
+        """Falls back to asyncio when uvloop is not installed."""
+        with patch.dict(os.environ, {"RUNPOD_EVENT_LOOP": "uvloop"}), patch.dict(
+            sys.modules, {"uvloop": None}
+        ):
+            self.assertFalse(rp_loop.use_uvloop())
+            self.assertEqual(rp_loop.run(_loop_name()), "asyncio.unix_events")
+            self.assertEqual(rp_loop.uvicorn_loop(), "asyncio")
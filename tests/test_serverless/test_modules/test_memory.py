@@ -0,0 +1,83 @@
+""" Tests for runpod.serverless.modules.rp_memory """
+
+import tracemalloc
+import unittest
+from unittest.mock import mock_open, patch
+
+from runpod.serverless.modules import rp_memory
+from runpod.serverless.modules.rp_memory import MemoryTracker, get_memory_threshold
+
+
+class TestProcessStats(unittest.TestCase):
+    """Tests for the process memory helpers."""
+
+    def test_read_proc_status(self):
+        """Reads kB values from /proc/self/status as bytes."""
+        status = "Name:\tpython\nVmHWM:\t    2048 kB\nVmRSS:\t    1024 kB\n"
+        with patch("builtins.open", mock_open(read_data=status)):
+            self.assertEqual(rp_memory.get_rss(), 1024 * 1024)
+            self.assertEqual(rp_memory.get_peak_rss(), 2048 * 1024)
+
+    def test_read_proc_status_missing(self):
+        """Falls back to getrusage when /proc is not available."""
+        with patch("builtins.open", side_effect=OSError):
+            self.assertGreater(rp_memory.get_rss(), 0)
+            self.assertFalse(rp_memory.reset_peak_rss())
+
+
+class TestMemoryTracker(unittest.TestCase):
+    """Tests for the MemoryTracker class."""
+
+    def setUp(self):
+        self.tracker = MemoryTracker()
+        self.tracker.clear()
+
+    def test_singleton(self):
+        """Only one tracker exists per process."""
+        self.assertIs(MemoryTracker(), self.tracker)
+
+    def test_start_stop(self):
+        """Stats are reported for a tracked job."""
+        self.tracker.start("job-1")
+        job_memory = self.tracker.stop("job-1")
+
+        for key in ["rss_start_mb", "rss_end_mb", "rss_delta_mb", "rss_peak_mb"]:
+            self.assertIn(key, job_memory)
+        self.assertNotIn("top_allocations", job_memory)
+        self.assertEqual(self.tracker.stop("job-1"), {})
+
+    def test_tracemalloc_top_allocations(self):
+        """Top allocation diffs are included when requested."""
+        try:
+            self.tracker.start("job-2", top_n=3)
+            leak = [bytearray(1024) for _ in range(100)]  # pylint: disable=unused-variable
+            job_memory = self.tracker.stop("job-2")
+        finally:
+            tracemalloc.stop()
+
+        self.assertIn("heap_delta_mb", job_memory)
+        self.assertLessEqual(len(job_memory["top_allocations"]), 3)
+        self.assertTrue(job_memory["top_allocations"])
+
+    def test_exceeds(self):
+        """Growth is measured against the first job's baseline."""
+        with patch.object(rp_memory, "get_rss", return_value=100 * rp_memory.MB):
+            self.tracker.start("job-3")
+
+        with patch.object(rp_memory, "get_rss", return_value=400 * rp_memory.MB):
+            self.tracker.stop("job-3")
+
+        self.assertEqual(self.tracker.growth_mb, 300)
+        self.assertTrue(self.tracker.exceeds(200))
+        self.assertFalse(self.tracker.exceeds(500))
+        self.assertFalse(self.tracker.exceeds(None))
+
+    def test_get_memory_threshold(self):
+        """Threshold is read from the config, then the environment."""
+        self.assertEqual(get_memory_threshold({"refresh_worker_memory_mb": 512}), 512)
+
+        with patch.dict("os.environ", {"RUNPOD_REFRESH_WORKER_MEMORY_MB": "256"}):
+            self.assertEqual(get_memory_threshold({}), 256)
+
+        with patch.dict("os.environ", {}, clear=True):
+            self.assertIsNone(get_memory_threshold({}))
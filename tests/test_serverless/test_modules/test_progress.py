@@ -6,7 +6,13 @@ import unittest
 from threading import Event
 from unittest.mock import ANY, patch
 
-from runpod.serverless.modules.rp_progress import _thread_target, progress_update
+from runpod.serverless.modules.rp_progress import (
+    _thread_target,
+    progress_update,
+    release_transport,
+    set_transport,
+)
+from runpod.serverless.modules.rp_transport import InMemoryTransport
 
 
 class TestProgressUpdate(unittest.TestCase):
@@ -21,7 +27,7 @@ class TestProgressUpdate(unittest.TestCase):
         # Create an event to track thread completion
         thread_event = Event()
 
-        def mock_thread_function(job, progress):
+        def mock_thread_function(job, progress, transport=None):
             try:
                 assert job == "fake_job", "Job ID was not passed correctly"
                 assert progress == "50%", "Progress was not passed correctly"
@@ -39,7 +45,7 @@ class TestProgressUpdate(unittest.TestCase):
         _thread_target(job, progress)
 
         assert mock_thread_target.called, "Thread function was not started"
-        mock_thread_target.assert_called_once_with(job, progress)
+        mock_thread_target.assert_called_once_with(job, progress, transport=None)
         assert thread_event.wait(
             timeout=30
         ), "Thread did not complete within expected time"
@@ -47,3 +53,23 @@ class TestProgressUpdate(unittest.TestCase):
         # Assertions
         expected_job_data = {"status": "IN_PROGRESS", "output": progress}
         mock_result.assert_called_once_with(ANY, expected_job_data, job)
+
+    @patch("runpod.serverless.modules.rp_progress.send_result")
+    def test_progress_update_transport(self, mock_result):
+        """
+        Tests that the update of a job with a transport is sent through it.
+        """
+        job = {"id": "transport_job"}
+        transport = InMemoryTransport()
+        set_transport(job["id"], transport)
+        try:
+            with patch("runpod.serverless.modules.rp_progress._thread_target") as mock_target:
+                progress_update(job, "50%")
+        finally:
+            release_transport(job["id"])
+        mock_target.assert_called_once_with(job, "50%", transport=transport)
+
+        _thread_target(job, "50%", transport)
+
+        self.assertEqual(transport.progress_updates, {"transport_job": ["50%"]})
+        mock_result.assert_not_called()
@@ -0,0 +1,444 @@
+""" Tests for runpod.serverless.modules.rp_scale """
+
+import asyncio
+import os
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, patch
+
+from runpod.http_client import TooManyRequests
+from runpod.serverless.modules import rp_cancel, rp_loop
+from runpod.serverless.modules.rp_backoff import Backoff
+from runpod.serverless.modules.rp_telemetry import TelemetrySnapshot
+from runpod.serverless.modules.rp_scale import (
+    JobScaler,
+    JobsProgress,
+    get_parallel_job_takes,
+    get_shutdown_grace_period,
+)
+
+
+class TestJobScaler(IsolatedAsyncioTestCase):
+    """Tests for the JobScaler class."""
+
+    async def asyncSetUp(self):
+        JobsProgress().clear()
+
+        self.jobs = [{"id": f"job-{i}", "input": {}} for i in range(5)]
+        self.jobs_fetcher = AsyncMock(side_effect=self._fetch)
+        self.jobs_handler = AsyncMock(return_value=False)
+
+        with patch("runpod.serverless.modules.rp_scale.IS_LOCAL_TEST", True):
+            self.job_scaler = JobScaler(
+                {
+                    "concurrency_modifier": lambda current: 2,
+                    "jobs_fetcher": self.jobs_fetcher,
+                    "jobs_handler": self.jobs_handler,
+                }
+            )
+
+    async def _fetch(self, session, num_jobs):  # pylint: disable=unused-argument
+        jobs, self.jobs = self.jobs[:num_jobs], self.jobs[num_jobs:]
+        return jobs
+
+    async def test_jobs_limit(self):
+        """The worker stops after taking and handling `jobs_limit` jobs."""
+        self.job_scaler.jobs_limit = 3
+
+        await self.job_scaler.run()
+
+        self.assertEqual(self.job_scaler.jobs_taken, 3)
+        self.assertEqual(self.job_scaler.jobs_handled, 3)
+        self.assertEqual(self.jobs_handler.await_count, 3)
+        self.assertFalse(self.job_scaler.is_alive())
+
+    async def test_refresh_requested_by_handler(self):
+        """The worker stops when the job handler asks for a refresh."""
+        self.jobs_handler.return_value = True
+
+        await self.job_scaler.run()
+
+        self.assertFalse(self.job_scaler.is_alive())
+        self.assertLessEqual(self.jobs_handler.await_count, 2)
+
+    async def test_handler_no_refresh(self):
+        """The worker keeps taking jobs while the job handler returns False."""
+        self.jobs_handler.return_value = False
+        self.job_scaler.jobs_limit = 4
+
+        await self.job_scaler.run()
+
+        self.assertEqual(self.jobs_handler.await_count, 4)
+
+    async def test_backoff_on_too_many_requests(self):
+        """A 429 backs off for the Retry-After the server asked for."""
+        throttled = TooManyRequests(
+            request_info=None, history=(), status=429, headers={"Retry-After": "2"}
+        )
+        self.jobs_fetcher.side_effect = [throttled, [], *[[job] for job in self.jobs]]
+        self.job_scaler.jobs_limit = 1
+
+        with patch.object(self.job_scaler, "_backoff", AsyncMock()) as backoff:
+            await self.job_scaler.run()
+
+        delay = backoff.await_args.args[0]
+        self.assertTrue(2 <= delay <= 2.5)
+        self.assertEqual(self.job_scaler.jobs_fetcher_backoff.attempts, 0)
+
+    async def test_backoff_on_error(self):
+        """Other errors back off exponentially."""
+        self.jobs_fetcher.side_effect = [
+            ConnectionError("down"),
+            ConnectionError("down"),
+            [self.jobs[0]],
+        ]
+        self.job_scaler.jobs_limit = 1
+        self.job_scaler.jobs_fetcher_backoff = Backoff(base=1, factor=4)
+
+        with patch.object(self.job_scaler, "_backoff", AsyncMock()) as backoff:
+            await self.job_scaler.run()
+
+        first, second = (call.args[0] for call in backoff.await_args_list)
+        self.assertTrue(0.5 <= first <= 1)
+        self.assertTrue(2 <= second <= 4)
+
+    async def test_backoff_returns_on_shutdown(self):
+        """Backing off does not hold up a shut down."""
+        self.job_scaler.kill_worker()
+        await asyncio.wait_for(self.job_scaler._backoff(60), timeout=1)
+
+    async def test_backoff_interrupted_by_shutdown(self):
+        """A shut down while backing off ends the wait."""
+        backoff = asyncio.create_task(self.job_scaler._backoff(60))
+        await asyncio.sleep(0.01)
+        self.job_scaler.kill_worker()
+        await asyncio.wait_for(backoff, timeout=1)
+
+    async def test_backoff_waits(self):
+        """Backing off waits for the delay while the worker is alive."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await self.job_scaler._backoff(0.05)
+        self.assertGreaterEqual(loop.time() - start, 0.05)
+
+    async def test_jobs_fetcher_timeout_in_production(self):
+        """The long poll timeout is configurable outside local tests."""
+        with patch("runpod.serverless.modules.rp_scale.IS_LOCAL_TEST", False):
+            job_scaler = JobScaler({"jobs_fetcher_timeout": 15})
+
+        self.assertEqual(job_scaler.jobs_fetcher_timeout, 15)
+
+    async def test_parallel_job_takes(self):
+        """Parallel job-take requests share the free slots and never over-acquire."""
+        in_flight = {"requests": 0, "jobs": 0, "max_requests": 0, "max_jobs": 0}
+        job_ids = (f"job-{i}" for i in range(1000))
+
+        async def fetch(session, num_jobs):  # pylint: disable=unused-argument
+            in_flight["requests"] += 1
+            in_flight["jobs"] += num_jobs
+            in_flight["max_requests"] = max(in_flight["max_requests"], in_flight["requests"])
+            occupied = in_flight["jobs"] + JobsProgress().get_job_count()
+            in_flight["max_jobs"] = max(in_flight["max_jobs"], occupied)
+
+            await asyncio.sleep(0.01)
+
+            in_flight["requests"] -= 1
+            in_flight["jobs"] -= num_jobs
+            return [{"id": next(job_ids), "input": {}} for _ in range(num_jobs)]
+
+        async def handle(session, config, job):  # pylint: disable=unused-argument
+            await asyncio.sleep(0.005)
+            return False
+
+        with patch("runpod.serverless.modules.rp_scale.IS_LOCAL_TEST", True):
+            job_scaler = JobScaler(
+                {
+                    "concurrency_modifier": lambda current: 8,
+                    "parallel_job_takes": 4,
+                    "jobs_fetcher": fetch,
+                    "jobs_handler": handle,
+                }
+            )
+        job_scaler.jobs_limit = 40
+
+        await asyncio.wait_for(job_scaler.run(), timeout=10)
+
+        self.assertEqual(job_scaler.jobs_taken, 40)
+        self.assertEqual(in_flight["max_requests"], 4)
+        self.assertLessEqual(in_flight["max_jobs"], 8)
+
+    async def test_concurrency_lowered_while_requests_in_flight(self):
+        """A lower concurrency applies to the next requests while others are in flight."""
+        concurrency = {"value": 8}
+        in_flight = {"jobs": 0, "max_jobs": 0}
+        release = asyncio.Event()
+
+        async def fetch(session, num_jobs):  # pylint: disable=unused-argument
+            in_flight["jobs"] += num_jobs
+            if concurrency["value"] == 2:
+                in_flight["max_jobs"] = max(in_flight["max_jobs"], in_flight["jobs"])
+
+            await release.wait()
+            await asyncio.sleep(0.01)
+
+            in_flight["jobs"] -= num_jobs
+            return []
+
+        with patch("runpod.serverless.modules.rp_scale.IS_LOCAL_TEST", True):
+            job_scaler = JobScaler(
+                {
+                    "concurrency_modifier": lambda current: concurrency["value"],
+                    "parallel_job_takes": 4,
+                    "jobs_fetcher": fetch,
+                    "jobs_handler": self.jobs_handler,
+                }
+            )
+
+        run = asyncio.create_task(job_scaler.run())
+        while in_flight["jobs"] < 8:
+            await asyncio.sleep(0.01)
+
+        concurrency["value"] = 2
+        job_scaler._capacity_changed.set()
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(job_scaler.current_concurrency, 2)
+        self.assertEqual(in_flight["jobs"], 8)
+
+        release.set()
+        await asyncio.sleep(0.1)
+
+        job_scaler.kill_worker()
+        await asyncio.wait_for(run, timeout=5)
+
+        self.assertGreater(in_flight["max_jobs"], 0)
+        self.assertLessEqual(in_flight["max_jobs"], 2)
+
+    async def test_full_queue_waits_for_a_free_slot(self):
+        """A finished job lets the next request start without waiting for a poll interval."""
+        self.job_scaler.jobs_limit = 5
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        await self.job_scaler.run()
+
+        self.assertEqual(self.job_scaler.jobs_handled, 5)
+        self.assertLess(loop.time() - start, 1)
+
+    async def test_job_tokens_released(self):
+        """Jobs get a deadline when taken and their token is released when handled."""
+        self.job_scaler.config["execution_timeout"] = 60
+        self.job_scaler.jobs_limit = 5
+        deadlines = []
+
+        async def handle(session, config, job):  # pylint: disable=unused-argument
+            deadlines.append(rp_cancel.get_cancellation_token(job["id"]).remaining())
+            return False
+
+        self.job_scaler.jobs_handler = handle
+        await self.job_scaler.run()
+
+        self.assertEqual(len(deadlines), 5)
+        self.assertTrue(all(0 < deadline <= 60 for deadline in deadlines))
+        self.assertEqual(rp_cancel._tokens, {})
+
+    async def _drain(self, grace_period, handler_duration):
+        """Runs a worker with 2 jobs in progress and 3 queued and drains it."""
+        started, sent = [], {}
+
+        async def handler(job):
+            started.append(job["id"])
+            await asyncio.sleep(handler_duration)
+            return {"done": True}
+
+        async def send_result(session, job_data, job, is_stream=False):  # pylint: disable=unused-argument
+            sent[job["id"]] = job_data
+
+        async def fetch(session, num_jobs):  # pylint: disable=unused-argument
+            # More jobs than asked for, the extra jobs stay queued.
+            jobs, self.jobs = self.jobs[:5], self.jobs[5:]
+            return jobs
+
+        config = {
+            "handler": handler,
+            "rp_args": {},
+            "concurrency_modifier": lambda current: 2,
+            "jobs_fetcher": fetch,
+            "shutdown_grace_period": grace_period,
+        }
+        with patch("runpod.serverless.modules.rp_scale.IS_LOCAL_TEST", True):
+            job_scaler = JobScaler(config)
+
+        with patch("runpod.serverless.modules.rp_job.send_result", send_result):
+            run = asyncio.create_task(job_scaler.run())
+            while len(started) < 2:
+                await asyncio.sleep(0.01)
+
+            job_scaler.handle_shutdown(15, None)
+            await asyncio.wait_for(run, timeout=5)
+
+        self.assertEqual(started, ["job-0", "job-1"])
+        self.assertEqual(JobsProgress().get_job_count(), 0)
+        self.assertEqual(rp_cancel._tokens, {})
+        return sent
+
+    async def test_drain_cancels_after_grace_period(self):
+        """Queued jobs are released and jobs past the grace period report an error."""
+        sent = await self._drain(grace_period=0.1, handler_duration=10)
+
+        self.assertEqual(set(sent), {"job-0", "job-1"})
+        self.assertTrue(all("error" in result for result in sent.values()))
+
+    async def test_drain_finishes_jobs_in_progress(self):
+        """Jobs in progress finish within the grace period."""
+        sent = await self._drain(grace_period=None, handler_duration=0.1)
+
+        self.assertEqual(sent, {"job-0": {"output": {"done": True}}, "job-1": {"output": {"done": True}}})
+
+    async def test_drain_released_jobs_not_sent(self):
+        """Jobs released over the job API get no job-done call, they are handed out again."""
+        sent = await self._drain(grace_period=0.1, handler_duration=10)
+
+        for job_id in ("job-2", "job-3", "job-4"):
+            self.assertNotIn(job_id, sent)
+
+    async def test_concurrency_modifier_telemetry(self):
+        """A modifier with a keyword-only telemetry parameter gets a telemetry snapshot."""
+        snapshots = []
+
+        def modifier(current, *, telemetry):
+            snapshots.append(telemetry)
+            return 2
+
+        self.job_scaler.concurrency_modifier = modifier
+        self.job_scaler.jobs_limit = 5
+        await self.job_scaler.run()
+
+        self.assertTrue(snapshots)
+        self.assertTrue(all(isinstance(s, TelemetrySnapshot) for s in snapshots))
+        self.assertTrue(all(s.in_flight + s.queue_depth <= 2 for s in snapshots))
+
+    async def test_concurrency_modifier_default_argument(self):
+        """A second positional parameter is not a telemetry opt-in."""
+        currents = []
+
+        def modifier(current, step=1):
+            currents.append(current)
+            return 1 + step
+
+        self.job_scaler.concurrency_modifier = modifier
+        self.job_scaler.jobs_limit = 5
+        await self.job_scaler.run()
+
+        self.assertEqual(self.job_scaler.current_concurrency, 2)
+        self.assertTrue(all(isinstance(current, int) for current in currents))
+
+    async def test_async_concurrency_modifier(self):
+        """Async modifiers run on their own timer, not before every request."""
+        snapshots = []
+
+        async def modifier(current, *, telemetry):  # pylint: disable=unused-argument
+            snapshots.append(telemetry)
+            return 3
+
+        self.job_scaler.concurrency_modifier = modifier
+        self.job_scaler.concurrency_modifier_interval = 0.05
+
+        async def handle(session, config, job):  # pylint: disable=unused-argument
+            await asyncio.sleep(0.1)
+            return False
+
+        self.job_scaler.jobs_handler = handle
+        self.job_scaler.jobs_limit = 5
+        await asyncio.wait_for(self.job_scaler.run(), timeout=5)
+
+        self.assertEqual(self.job_scaler.current_concurrency, 3)
+        self.assertEqual(self.job_scaler.jobs_handled, 5)
+        self.assertLess(len(snapshots), 10)
+        self.assertIsInstance(snapshots[-1], TelemetrySnapshot)
+
+    async def test_resize_while_jobs_in_progress(self):
+        """The concurrency grows without waiting for the jobs in progress."""
+        concurrency = {"value": 1}
+        started = []
+
+        async def handle(session, config, job):  # pylint: disable=unused-argument
+            started.append(job["id"])
+            await asyncio.sleep(10 if job["id"] == "job-0" else 0)
+            return False
+
+        self.job_scaler.concurrency_modifier = lambda current: concurrency["value"]
+        self.job_scaler.jobs_handler = handle
+
+        run = asyncio.create_task(self.job_scaler.run())
+        while not started:
+            await asyncio.sleep(0.01)
+
+        concurrency["value"] = 3
+        self.job_scaler._capacity_changed.set()
+        while len(started) < 5:
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(self.job_scaler.current_concurrency, 3)
+        self.job_scaler.kill_worker()
+        run.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await run
+
+    def test_get_shutdown_grace_period(self):
+        self.assertIsNone(get_shutdown_grace_period({}))
+        self.assertEqual(get_shutdown_grace_period({"shutdown_grace_period": 0}), 0)
+
+        with patch.dict(os.environ, {"RUNPOD_SHUTDOWN_GRACE_PERIOD": "20"}):
+            self.assertEqual(get_shutdown_grace_period({}), 20)
+
+    def test_get_parallel_job_takes(self):
+        self.assertEqual(get_parallel_job_takes({}), 1)
+        self.assertEqual(get_parallel_job_takes({"parallel_job_takes": 4}), 4)
+        self.assertEqual(get_parallel_job_takes({"parallel_job_takes": -1}), 1)
+
+        with patch.dict(os.environ, {"RUNPOD_PARALLEL_JOB_TAKES": "3"}):
+            self.assertEqual(get_parallel_job_takes({}), 3)
+
+
+class TestJobScalerOwnLoop(unittest.TestCase):
+    """The JobScaler is created outside of the event loop it runs in, like start() does."""
+
+    def setUp(self):
+        JobsProgress().clear()
+        # The main thread's default loop, which asyncio.run() does not use.
+        self.default_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.default_loop)
+        with patch("runpod.serverless.modules.rp_scale.IS_LOCAL_TEST", True):
+            self.job_scaler = JobScaler({"jobs_fetcher": AsyncMock(return_value=[])})
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.default_loop.close()
+
+    def test_backoff(self):
+        rp_loop.run(self.job_scaler._backoff(0.01))
+
+    def test_run(self):
+        jobs = [[{"id": f"job-{index}", "input": {}}] for index in range(3)]
+        self.job_scaler.jobs_fetcher.side_effect = [*jobs, []]
+        handled = []
+
+        async def handle(session, config, job):  # pylint: disable=unused-argument
+            # Slow enough that the scaler waits on its events.
+            await asyncio.sleep(0.02)
+            handled.append(job["id"])
+            return False
+
+        self.job_scaler.jobs_handler = handle
+        self.job_scaler.jobs_limit = 3
+
+        with patch("runpod.serverless.modules.rp_scale.log") as mock_log:
+            rp_loop.run(self.job_scaler.run())
+
+        self.assertEqual(handled, ["job-0", "job-1", "job-2"])
+        # get_jobs waits for a free slot instead of spinning.
+        waits = [
+            call for call in mock_log.debug.call_args_list if "Waiting" in call.args[0]
+        ]
+        self.assertLess(len(waits), 10)
@@ -0,0 +1,230 @@
+"""
+Tests for runpod.serverless.modules.rp_sls_local
+"""
+
+import asyncio
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from runpod.serverless import core
+from runpod.serverless.modules.rp_sls_local import HTTPHook, LocalHook, SlsLocalError, _BaseHook
+
+JOB_TAKE_URL = "http://api/job-take/$ID?gpu=fake"
+JOB_DONE_URL = "http://api/job-done/$RUNPOD_POD_ID/$ID?gpu=fake"
+JOB_STREAM_URL = "http://api/stream/$RUNPOD_POD_ID/$ID?gpu=fake"
+
+
+def make_jobs(count):
+    return [{"id": f"job-{index}", "input": {"index": index}} for index in range(count)]
+
+
+class TestBaseHook(unittest.TestCase):
+    """Tests for the _BaseHook interface"""
+
+    def test_abstract(self):
+        class PartialHook(_BaseHook):  # pylint: disable=abstract-method
+            def get_jobs(self, max_concurrency, max_jobs):
+                return []
+
+        with self.assertRaises(TypeError):
+            PartialHook()
+
+
+class TestLocalHook(unittest.TestCase):
+    """Tests for LocalHook"""
+
+    def test_get_jobs(self):
+        hook = LocalHook(make_jobs(5))
+
+        self.assertEqual([job["id"] for job in hook.get_jobs(10, 2)], ["job-0", "job-1"])
+        self.assertEqual(hook.jobs_left, 3)
+        self.assertEqual(hook.in_progress, 2)
+
+    def test_get_jobs_max_concurrency(self):
+        hook = LocalHook(make_jobs(5))
+
+        self.assertEqual(len(hook.get_jobs(3, 10)), 3)
+        self.assertEqual(hook.get_jobs(3, 10), [])
+
+        hook.post_output("job-0", {"done": True})
+        self.assertEqual([job["id"] for job in hook.get_jobs(3, 10)], ["job-3"])
+
+    def test_get_jobs_empty(self):
+        hook = LocalHook()
+        self.assertEqual(hook.get_jobs(1, 1), [])
+
+        hook.add_jobs(make_jobs(1))
+        self.assertEqual(len(hook.get_jobs(1, 1)), 1)
+
+    def test_outputs(self):
+        hook = LocalHook(make_jobs(1))
+        hook.get_jobs(1, 1)
+
+        self.assertTrue(hook.progress_update("job-0", b'{"step": 1}'))
+        self.assertTrue(hook.send_stream_output("job-0", {"output": "a"}))
+        self.assertTrue(asyncio.run(hook.stream_output("job-0", {"output": "b"})))
+        self.assertTrue(hook.finish_stream("job-0"))
+        self.assertTrue(hook.post_output("job-0", ["a", "b"]))
+
+        self.assertEqual(hook.progress, {"job-0": [{"step": 1}]})
+        self.assertEqual(hook.streams, {"job-0": [{"output": "a"}, {"output": "b"}]})
+        self.assertEqual(hook.finished_streams, {"job-0"})
+        self.assertEqual(hook.outputs, {"job-0": ["a", "b"]})
+        self.assertEqual(hook.in_progress, 0)
+
+    def test_output_not_serializable(self):
+        hook = LocalHook(make_jobs(1))
+        with self.assertRaises(TypeError):
+            hook.post_output("job-0", {"output": object()})
+
+    def test_join(self):
+        hook = LocalHook(make_jobs(1))
+        self.assertFalse(hook.join(timeout=0.01))
+
+        hook.get_jobs(1, 1)
+        hook.post_output("job-0", None)
+        self.assertTrue(hook.join(timeout=0.01))
+
+
+class TestHTTPHook(unittest.TestCase):
+    """Tests for HTTPHook"""
+
+    def setUp(self):
+        self.hook = HTTPHook(JOB_TAKE_URL, JOB_DONE_URL, JOB_STREAM_URL, worker_id="worker")
+        self.session = MagicMock()
+        self.hook._local.session = self.session
+
+    def _response(self, status_code=200, body=None):
+        response = MagicMock()
+        response.status_code = status_code
+        response.ok = status_code < 400
+        response.content = json.dumps(body).encode() if body is not None else b""
+        response.json.return_value = body
+        return response
+
+    def test_urls_from_env(self):
+        env = {
+            "RUNPOD_POD_ID": "pod",
+            "RUNPOD_WEBHOOK_GET_JOB": JOB_TAKE_URL,
+            "RUNPOD_WEBHOOK_POST_OUTPUT": JOB_DONE_URL,
+            "RUNPOD_WEBHOOK_POST_STREAM": JOB_STREAM_URL,
+        }
+        with patch.dict("os.environ", env):
+            hook = HTTPHook()
+
+        self.assertEqual(hook.job_take_url, "http://api/job-take/pod?gpu=fake")
+        self.assertEqual(hook.job_done_url, "http://api/job-done/pod/$ID?gpu=fake")
+
+    def test_get_jobs(self):
+        self.session.get.return_value = self._response(body={"id": "job-0", "input": {}})
+
+        self.assertEqual(self.hook.get_jobs(1, 1), [{"id": "job-0", "input": {}}])
+        self.session.get.assert_called_once_with(
+            "http://api/job-take/worker?gpu=fake&job_in_progress=0", timeout=30
+        )
+
+        # The only slot is taken until the output is posted.
+        self.assertEqual(self.hook.get_jobs(1, 1), [])
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_get_jobs_batch(self):
+        self.session.get.return_value = self._response(body=make_jobs(2))
+
+        self.assertEqual(len(self.hook.get_jobs(4, 2)), 2)
+        self.session.get.assert_called_once_with(
+            "http://api/job-take-batch/worker?gpu=fake&batch_size=2&job_in_progress=0",
+            timeout=30,
+        )
+
+    def test_get_jobs_no_jobs(self):
+        self.session.get.return_value = self._response(status_code=204)
+        self.assertEqual(self.hook.get_jobs(1, 1), [])
+
+    def test_get_jobs_error(self):
+        self.session.get.return_value = self._response(status_code=500, body="error")
+        with self.assertRaises(SlsLocalError):
+            self.hook.get_jobs(1, 1)
+
+    def test_post_output(self):
+        self.session.get.return_value = self._response(body={"id": "job-0", "input": {}})
+        self.session.post.return_value = self._response()
+        self.hook.get_jobs(1, 1)
+
+        self.assertTrue(self.hook.post_output("job-0", {"result": 1}))
+        url, = self.session.post.call_args.args
+        self.assertEqual(url, "http://api/job-done/worker/job-0?gpu=fake&isStream=false")
+        self.assertEqual(
+            json.loads(self.session.post.call_args.kwargs["data"]), {"output": {"result": 1}}
+        )
+
+        self.assertTrue(self.hook.post_output("job-1", {"error": "failed"}))
+        self.assertEqual(
+            json.loads(self.session.post.call_args.kwargs["data"]), {"error": "failed"}
+        )
+
+    def test_stream_output(self):
+        self.session.post.return_value = self._response()
+
+        self.assertTrue(self.hook.send_stream_output("job-0", {"output": "a"}))
+        self.assertEqual(
+            self.session.post.call_args.args[0],
+            "http://api/stream/worker/job-0?gpu=fake&isStream=false",
+        )
+        self.assertTrue(self.hook.finish_stream("job-0"))
+
+        self.hook.post_output("job-0", ["a"])
+        self.assertTrue(self.session.post.call_args.args[0].endswith("isStream=true"))
+
+    def test_post_failed(self):
+        self.session.post.side_effect = requests.ConnectionError("refused")
+        self.assertFalse(self.hook.post_output("job-0", None))
+
+
+class TestCoreWithLocalHook(unittest.IsolatedAsyncioTestCase):
+    """The sls-core worker against a LocalHook"""
+
+    async def _run(self, config, hook):
+        serverless_hook = core.AsyncHook(hook)
+        scaler = core._job_scaler(
+            {"rp_args": {}, "sls_poll_interval": 0.01, **config}, serverless_hook
+        )
+        worker = asyncio.create_task(scaler.run())
+        try:
+            done = await asyncio.get_running_loop().run_in_executor(None, hook.join, 10)
+            self.assertTrue(done)
+        finally:
+            scaler.kill_worker()
+            await asyncio.wait_for(worker, 10)
+            serverless_hook.shutdown()
+
+    async def test_jobs(self):
+        running, peak = 0, 0
+
+        async def handler(job):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"index": job["input"]["index"]}
+
+        hook = LocalHook(make_jobs(20))
+        await self._run({"handler": handler, "max_concurrency": 4, "max_jobs": 2}, hook)
+
+        self.assertEqual(hook.outputs["job-7"], {"index": 7})
+        self.assertEqual(len(hook.outputs), 20)
+        self.assertLessEqual(peak, 4)
+
+    async def test_generator_jobs(self):
+        def handler(job):
+            yield from range(3)
+
+        hook = LocalHook(make_jobs(2))
+        await self._run({"handler": handler, "return_aggregate_stream": True}, hook)
+
+        self.assertEqual([part["output"] for part in hook.streams["job-1"]], [0, 1, 2])
+        self.assertEqual(hook.finished_streams, {"job-0", "job-1"})
+        self.assertEqual(hook.outputs["job-1"], {"output": [0, 1, 2]})
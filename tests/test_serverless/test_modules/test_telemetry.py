@@ -0,0 +1,67 @@
+""" Tests for runpod.serverless.modules.rp_telemetry """
+
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock
+
+from runpod.serverless.modules.rp_telemetry import JobTelemetry, accepts_telemetry
+
+
+class TestJobTelemetry(IsolatedAsyncioTestCase):
+    """Tests for the JobTelemetry class."""
+
+    def setUp(self):
+        self.telemetry = JobTelemetry()
+        self.telemetry.clear(window=10)
+
+    def tearDown(self):
+        self.telemetry.clear()
+
+    def test_singleton(self):
+        self.assertIs(JobTelemetry(), self.telemetry)
+
+    def test_empty_snapshot(self):
+        snapshot = self.telemetry.snapshot(concurrency=4, queue_depth=1, in_flight=2)
+
+        self.assertEqual((snapshot.concurrency, snapshot.queue_depth, snapshot.in_flight), (4, 1, 2))
+        self.assertIsNone(snapshot.latency_p50_ms)
+        self.assertEqual(snapshot.error_rate, 0.0)
+        self.assertGreater(snapshot.rss_mb, 0)
+        self.assertGreaterEqual(snapshot.cpu_percent, 0)
+
+    def test_latencies_and_errors(self):
+        """Latencies and the error rate cover the last `window` jobs."""
+        for index in range(20):
+            self.telemetry.record_job((index + 1) / 1000, failed=index >= 15)
+
+        snapshot = self.telemetry.snapshot(concurrency=1, queue_depth=0, in_flight=0)
+
+        self.assertEqual(snapshot.jobs_completed, 20)
+        self.assertEqual(snapshot.latency_p50_ms, 15)
+        self.assertEqual(snapshot.latency_p90_ms, 19)
+        self.assertEqual(snapshot.latency_p99_ms, 20)
+        self.assertEqual(snapshot.error_rate, 0.5)
+
+    async def test_loop_lag(self):
+        """A blocked event loop shows up as lag in the next snapshot only."""
+        monitor = asyncio.create_task(self.telemetry.monitor_loop_lag(interval=0.01))
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)  # Blocks the event loop.
+        await asyncio.sleep(0.02)
+        monitor.cancel()
+
+        first = self.telemetry.snapshot(concurrency=1, queue_depth=0, in_flight=0)
+        second = self.telemetry.snapshot(concurrency=1, queue_depth=0, in_flight=0)
+
+        self.assertGreaterEqual(first.loop_lag_ms, 50)
+        self.assertEqual(second.loop_lag_ms, 0)
+
+    def test_accepts_telemetry(self):
+        self.assertFalse(accepts_telemetry(lambda current: current))
+        self.assertFalse(accepts_telemetry(lambda current, step=2: current + step))
+        self.assertFalse(accepts_telemetry(lambda current, telemetry: current))
+        self.assertFalse(accepts_telemetry(lambda *args, **kwargs: args[0]))
+        self.assertFalse(accepts_telemetry(MagicMock()))
+        self.assertTrue(accepts_telemetry(lambda current, *, telemetry: current))
+        self.assertTrue(accepts_telemetry(lambda current, *, telemetry=None: current))
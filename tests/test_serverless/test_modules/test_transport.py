@@ -0,0 +1,234 @@
+""" Tests for runpod.serverless.modules.rp_transport """
+
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from runpod.serverless import core
+from runpod.serverless.modules import rp_job
+from runpod.serverless.modules.rp_progress import progress_update
+from runpod.serverless.modules.rp_scale import JobScaler, JobsProgress
+from runpod.serverless.modules.rp_sls_local import LocalHook
+from runpod.serverless.modules.rp_transport import RELEASED_JOB_ERROR, InMemoryTransport, Transport
+
+
+def make_jobs(count):
+    return [{"id": f"job-{index}", "input": {"index": index}} for index in range(count)]
+
+
+def echo_handler(job):
+    return {"index": job["input"]["index"]}
+
+
+def generator_handler(job):
+    yield from range(3)
+
+
+class TestInMemoryTransport(IsolatedAsyncioTestCase):
+    """Tests for the InMemoryTransport."""
+
+    async def test_acquire(self):
+        transport = InMemoryTransport(make_jobs(3))
+
+        self.assertEqual(len(await transport.acquire(None, 2)), 2)
+        self.assertEqual(len(await transport.acquire(None, 2)), 1)
+        self.assertEqual(await transport.acquire(None, 2), [])
+
+    async def test_acquire_waits(self):
+        transport = InMemoryTransport(wait=1)
+
+        acquire = asyncio.create_task(transport.acquire(None, 1))
+        await asyncio.sleep(0)
+        await transport.add_jobs(make_jobs(1))
+
+        self.assertEqual(await acquire, make_jobs(1))
+
+    async def test_acquire_wait_times_out(self):
+        transport = InMemoryTransport(wait=0.01)
+        self.assertEqual(await transport.acquire(None, 1), [])
+
+    async def test_outputs(self):
+        transport = InMemoryTransport(make_jobs(1))
+        job, = await transport.acquire(None, 1)
+
+        await transport.progress(None, job, "half way")
+        await transport.stream(None, job, {"output": 1})
+        await transport.finish_stream(None, job)
+        await transport.post(None, job, {"output": [1]}, is_stream=True)
+        await asyncio.wait_for(transport.join(), 1)
+
+        self.assertEqual(transport.progress_updates, {"job-0": ["half way"]})
+        self.assertEqual(transport.streams, {"job-0": [{"output": 1}]})
+        self.assertEqual(transport.finished_streams, {"job-0"})
+        self.assertEqual(transport.results, {"job-0": {"output": [1]}})
+
+    async def test_interface(self):
+        with self.assertRaises(TypeError):
+            Transport()  # pylint: disable=abstract-class-instantiated
+
+        class AcquireOnly(Transport):  # pylint: disable=abstract-method
+            async def acquire(self, session, num_jobs, on_job=None):
+                return []
+
+        with self.assertRaises(TypeError):
+            AcquireOnly()
+
+        # finish_stream, release and close are optional, HTTPTransport keeps the defaults.
+        transport = rp_job.HTTPTransport()
+        with patch.object(rp_job, "send_result", AsyncMock()) as send_result:
+            await transport.finish_stream(None, {})
+            await transport.release(None, {"id": "job-0"})
+            transport.close()
+        send_result.assert_not_called()
+
+
+class TestHTTPTransport(IsolatedAsyncioTestCase):
+    """Tests for rp_job.HTTPTransport."""
+
+    async def test_calls(self):
+        session, job = MagicMock(), {"id": "job-0"}
+        transport = rp_job.HTTPTransport()
+
+        with patch.object(
+            rp_job, "get_job", AsyncMock(return_value=[job])
+        ) as get_job, patch.object(
+            rp_job, "send_result", AsyncMock()
+        ) as send_result, patch.object(
+            rp_job, "stream_result", AsyncMock()
+        ) as stream_result:
+            self.assertEqual(await transport.acquire(session, 2), [job])
+            get_job.assert_awaited_once_with(session, 2, on_job=None)
+
+            await transport.stream(session, job, {"output": 1})
+            stream_result.assert_awaited_once_with(session, {"output": 1}, job)
+
+            await transport.post(session, job, {"output": 1}, is_stream=True)
+            send_result.assert_awaited_once_with(session, {"output": 1}, job, is_stream=True)
+
+            await transport.progress(session, job, "half way")
+            send_result.assert_awaited_with(
+                session, {"status": "IN_PROGRESS", "output": "half way"}, job
+            )
+
+
+class TestScalerTransports(IsolatedAsyncioTestCase):
+    """The same jobs through the JobScaler on each transport."""
+
+    async def asyncSetUp(self):
+        JobsProgress().clear()
+
+    async def _run(self, transport, handler, done):
+        scaler = JobScaler(
+            {
+                "handler": handler,
+                "rp_args": {},
+                "return_aggregate_stream": True,
+                "concurrency_modifier": lambda current: 4,
+            },
+            transport,
+        )
+        worker = asyncio.create_task(scaler.run())
+        try:
+            await asyncio.wait_for(done(), 10)
+        finally:
+            scaler.kill_worker()
+            await asyncio.wait_for(worker, 10)
+            transport.close()
+
+    async def _run_in_memory(self, handler):
+        transport = InMemoryTransport(make_jobs(10))
+        await self._run(transport, handler, transport.join)
+        return transport
+
+    async def _run_sls(self, handler):
+        hook = LocalHook(make_jobs(10))
+        transport = core.SlsTransport(core.AsyncHook(hook), max_jobs=4, poll_interval=0.01)
+        loop = asyncio.get_running_loop()
+        await self._run(transport, handler, lambda: loop.run_in_executor(None, hook.join))
+        return hook
+
+    async def test_jobs(self):
+        transport = await self._run_in_memory(echo_handler)
+        hook = await self._run_sls(echo_handler)
+
+        self.assertEqual(transport.results["job-3"], {"output": {"index": 3}})
+        self.assertEqual(hook.outputs["job-3"], {"index": 3})
+        self.assertEqual(len(transport.results), len(hook.outputs))
+
+    async def test_generator_jobs(self):
+        transport = await self._run_in_memory(generator_handler)
+        hook = await self._run_sls(generator_handler)
+
+        for streams in (transport.streams, hook.streams):
+            self.assertEqual(streams["job-3"], [{"output": 0}, {"output": 1}, {"output": 2}])
+        self.assertEqual(transport.finished_streams, hook.finished_streams)
+        self.assertEqual(transport.results["job-3"], {"output": [0, 1, 2]})
+        self.assertEqual(hook.outputs["job-3"], {"output": [0, 1, 2]})
+
+    async def test_progress_update(self):
+        """progress_update from a handler goes through the transport of its job."""
+
+        def handler(job):
+            progress_update(job, {"step": 1})
+            time.sleep(0.05)  # The update is sent from its own thread.
+            return job["input"]
+
+        transport = await self._run_in_memory(handler)
+        hook = await self._run_sls(handler)
+
+        self.assertEqual(transport.progress_updates["job-3"], [{"step": 1}])
+        self.assertEqual(hook.progress["job-3"], [{"step": 1}])
+
+    async def test_released_jobs(self):
+        """Jobs released on shut down go back to the queue and are no longer in progress."""
+
+        class GreedyTransport(InMemoryTransport):
+            async def acquire(self, session, num_jobs, on_job=None):
+                # More jobs than asked for, the extra jobs stay queued.
+                return await super().acquire(session, 5, on_job)
+
+        async def handler(job):
+            await asyncio.sleep(0.1)
+            return job["input"]
+
+        transport = GreedyTransport(make_jobs(5))
+        scaler = JobScaler(
+            {"handler": handler, "rp_args": {}, "concurrency_modifier": lambda current: 2},
+            transport,
+        )
+        worker = asyncio.create_task(scaler.run())
+        while not transport._in_progress:
+            await asyncio.sleep(0.01)
+
+        scaler.handle_shutdown(15, None)
+        await asyncio.wait_for(worker, 5)
+
+        self.assertEqual(set(transport.results), {"job-0", "job-1"})
+        self.assertEqual(transport.results["job-0"], {"output": {"index": 0}})
+        self.assertEqual(transport.jobs_left, 3)
+        self.assertEqual(transport._in_progress, set())
+
+    async def test_sls_release(self):
+        """A released sls job gets an error output, sls_core no longer holds it."""
+        hook = LocalHook(make_jobs(1))
+        transport = core.SlsTransport(core.AsyncHook(hook))
+        try:
+            [job] = await transport.acquire(None, 1)
+            await transport.release(None, job)
+        finally:
+            transport.close()
+
+        self.assertEqual(hook.outputs, {"job-0": {"error": RELEASED_JOB_ERROR}})
+        self.assertEqual(hook.in_progress, 0)
+        self.assertEqual(transport._in_progress, set())
+
+    async def test_sls_progress(self):
+        hook = LocalHook(make_jobs(1))
+        transport = core.SlsTransport(core.AsyncHook(hook))
+        try:
+            await transport.progress(None, {"id": "job-0"}, {"step": 1})
+        finally:
+            transport.close()
+
+        self.assertEqual(hook.progress, {"job-0": [{"step": 1}]})
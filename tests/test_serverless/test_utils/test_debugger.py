@@ -24,7 +24,7 @@ class TestDebugger(unittest.TestCase):
         self.checkpoints = Checkpoints()
         self.checkpoints.clear()
 
-    @patch("runpod.serverless.utils.rp_debugger.cpuinfo.get_cpu_info")
+    @patch("cpuinfo.get_cpu_info")
     def test_key_error(self, mock_get_cpu_info):
         """
         Test that a KeyError is raised when an invalid key is used.
@@ -32,9 +32,11 @@ class TestDebugger(unittest.TestCase):
         mock_get_cpu_info.side_effect = KeyError("Test Error")
 
         importlib.reload(rp_debugger)
+        assert not mock_get_cpu_info.called
 
-        assert mock_get_cpu_info.called
         self.assertEqual(rp_debugger.PROCESSOR, "Unable to get processor info.")
+        assert mock_get_cpu_info.called
+        rp_debugger.get_processor.cache_clear()
 
     def test_checkpoints(self):
         """
@@ -11,6 +11,7 @@ from unittest import IsolatedAsyncioTestCase
 import nest_asyncio
 
 import runpod
+from runpod.serverless.modules import rp_fastapi
 from runpod.serverless.modules.rp_logger import RunPodLogger
 from runpod.serverless import _signal_handler
 
@@ -81,14 +82,14 @@ class TestWorker(IsolatedAsyncioTestCase):
 
         with patch(
             "argparse.ArgumentParser.parse_known_args"
-        ) as mock_parse_known_args, patch(
-            "runpod.serverless.rp_fastapi"
-        ) as mock_fastapi:
+        ) as mock_parse_known_args, patch.object(
+            rp_fastapi, "WorkerAPI"
+        ) as mock_worker_api:
 
             mock_parse_known_args.return_value = known_args, []
             runpod.serverless.start({"handler": self.mock_handler})
 
-            assert mock_fastapi.WorkerAPI.called
+            assert mock_worker_api.called
 
     @patch("runpod.serverless.log")
     @patch("runpod.serverless.sys.exit")